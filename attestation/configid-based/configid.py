@@ -0,0 +1,203 @@
+"""
+ConfigID-based attestation verification in Python, for single quotes and in bulk.
+
+Since Dstack v0.5.1 the compose hash is stored in the mr_config_id field of the
+TD report, so an app can be verified from its quote alone: no event log has to
+be replayed. This module decodes mr_config_id and checks the compose hash
+against a set of known app-compose.json files or hashes.
+
+The quote parsing, dcap-qvl verification and attestation policy are shared
+with the RTMR3-based verifier in ../rtmr3-based, as is the deduplication of
+audit.py: identical quotes go through dcap-qvl once and identical measurement
+combinations are evaluated against the policy once. That directory must be on
+the module search path.
+
+Usage:
+    export PYTHONPATH=../rtmr3-based
+    python configid.py --measurement-index index.json --app-compose app-compose.json quote.json
+    python configid.py --policy policy.json --compose-hash <hex> quotes/*.json > audit.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+from typing import Dict, Any, Optional, Union
+
+try:
+    from audit import policy_key, verify_quote_group
+    from bundle import load_bundle
+    from measurement_index import MeasurementIndex
+    from policy import CompiledPolicy
+    from timing import StageTimer
+    from verify import DstackTdxQuote, sha256_hex
+except ModuleNotFoundError as e:
+    sys.exit(f"{e}: configid.py uses the verifier in ../rtmr3-based, add it to PYTHONPATH")
+
+CONFIG_ID_SIZE = 48
+HASH_SIZE = 32
+
+# mr_config_id = 0x01 || sha256(app-compose.json) || zero padding
+CONFIG_ID_COMPOSE_HASH = 0x01
+
+
+def decode_config_id(mr_config_id: str) -> Optional[str]:
+    """
+    Decode the compose hash from an mr_config_id hex string.
+
+    Only the layout written by Dstack is accepted: the 0x01 type byte, the
+    compose hash and zero padding. Returns None if mr_config_id is all zeros
+    (the CVM was not booted with a config ID and must be verified by RTMR3
+    replay instead).
+    """
+    data = bytes.fromhex(mr_config_id)
+    if len(data) != CONFIG_ID_SIZE:
+        raise ValueError(f"mr_config_id must be {CONFIG_ID_SIZE} bytes, got {len(data)}")
+    if not any(data):
+        return None
+    if data[0] == CONFIG_ID_COMPOSE_HASH and not any(data[1 + HASH_SIZE:]):
+        return data[1:1 + HASH_SIZE].hex()
+    raise ValueError(f"Unknown mr_config_id format: {mr_config_id[:4]}...")
+
+
+class ConfigIdQuote(DstackTdxQuote):
+    """
+    A Dstack TDX quote verified through mr_config_id rather than the event log.
+    """
+
+    def __init__(self, quote: Union[str, bytes, bytearray], timer: Optional[StageTimer] = None):
+        """
+        Initialize the ConfigIdQuote object from a hex or already decoded quote.
+        There is no event log to replay; the compose hash comes from the quote.
+        """
+        super().__init__(quote, "[]", timer=timer)
+
+    @property
+    def compose_hash(self) -> Optional[str]:
+        """
+        The compose hash from the verified quote's mr_config_id.
+        """
+        return decode_config_id(self.mrs()["mr_config_id"])
+
+
+def load_quotes(path: str) -> list[tuple[str, Union[str, bytearray]]]:
+    """
+    Load the (entry name, quote) pairs of a raw .hex quote file or of a JSON bundle
+    (quote.json, report.json or attestation.json with several app certificates).
+    """
+    if path.endswith(".hex"):
+        with open(path) as f:
+            return [("", f.read().strip())]
+    return [(entry, quote) for entry, quote, _ in load_bundle(path)]
+
+
+class ConfigIdAudit:
+    def __init__(self, policy: CompiledPolicy):
+        """
+        Initialize a ConfigIdAudit. The policy must list the allowed compose hashes.
+        """
+        self.policy = policy
+        self.stats = {"inputs": 0, "unique_quotes": 0, "policy_evaluations": 0}
+
+    async def run(self, paths: list[str]) -> list[Dict[str, Any]]:
+        """
+        Verify all quotes and return one result per input (path and bundle entry).
+        """
+        # Group identical quotes and run dcap-qvl once per unique quote
+        input_keys: list[tuple[Dict[str, str], bytes]] = []
+        groups: Dict[bytes, list[ConfigIdQuote]] = {}
+        results: Dict[bytes, Dict[str, Any]] = {}
+        for path in paths:
+            try:
+                quotes_data = load_quotes(path)
+            except (ValueError, OSError) as e:
+                key = b"bundle\0" + path.encode()
+                results[key] = {"verified": False, "errors": [f"Invalid bundle: {e}"]}
+                input_keys.append(({"path": path}, key))
+                continue
+            for entry, quote_data in quotes_data:
+                source = {"path": path, "entry": entry} if entry else {"path": path}
+                try:
+                    quote = ConfigIdQuote(quote_data)
+                except ValueError as e:
+                    key = b"quote\0" + path.encode() + b"\0" + entry.encode()
+                    results[key] = {"verified": False, "errors": [f"Invalid quote: {e}"]}
+                    input_keys.append((source, key))
+                    continue
+                key = hashlib.sha256(quote.quote).digest()
+                input_keys.append((source, key))
+                groups.setdefault(key, []).append(quote)
+        self.stats["inputs"] = len(input_keys)
+        self.stats["unique_quotes"] = len(groups)
+
+        # Every quote in a group is identical, so only the first one is needed
+        quotes = {key: group[:1] for key, group in groups.items()}
+        errors = await asyncio.gather(*[verify_quote_group(group) for group in quotes.values()])
+
+        verdicts: Dict[tuple, list[str]] = {}
+        for (key, (quote,)), error in zip(quotes.items(), errors):
+            if error:
+                results[key] = {"verified": False, "errors": [error]}
+                continue
+            try:
+                compose_hash = quote.compose_hash
+            except ValueError as e:
+                results[key] = {"verified": False, "errors": [str(e)]}
+                continue
+            if compose_hash is None:
+                results[key] = {"verified": False, "errors": ["mr_config_id is not set; use RTMR3-based verification"]}
+                continue
+            pkey = policy_key(quote)
+            if pkey not in verdicts:
+                verdicts[pkey] = self.policy.evaluate(quote)
+            results[key] = {
+                "verified": not verdicts[pkey],
+                "errors": list(verdicts[pkey]),
+                "tcb_status": quote.verified_quote["status"],
+                "compose_hash": compose_hash,
+            }
+        self.stats["policy_evaluations"] = len(verdicts)
+
+        # Fan results back out to every input
+        return [dict(results[key], **source) for source, key in input_keys]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify Dstack quotes by their mr_config_id")
+    parser.add_argument("quotes", nargs="+", help="quote.json/report.json files or raw .hex quotes")
+    parser.add_argument("--policy", help="Attestation policy file (see ../rtmr3-based/policy.py)")
+    parser.add_argument("--measurement-index", help="Known-good measurement index (see ../rtmr3-based/"
+                                                    "measurement_index.py); replaces the policy's")
+    parser.add_argument("--app-compose", action="append", default=[], metavar="PATH",
+                        help="Expected app-compose.json; can be given several times")
+    parser.add_argument("--compose-hash", action="append", default=[], metavar="HEX",
+                        help="Expected compose hash; can be given several times")
+    args = parser.parse_args()
+
+    policy = CompiledPolicy.load(args.policy) if args.policy else CompiledPolicy({})
+    expected = set(h.lower() for h in args.compose_hash)
+    for path in args.app_compose:
+        with open(path) as f:
+            expected.add(sha256_hex(f.read()))
+    policy.compose_hashes = policy.compose_hashes | expected
+    if not policy.compose_hashes:
+        parser.error("no compose hashes to check against; use --app-compose, --compose-hash or a policy")
+    if args.measurement_index:
+        policy.measurement_index = MeasurementIndex.load(args.measurement_index)
+    if not policy.has_os_allowlist():
+        parser.error("no OS measurements to check against; use --measurement-index or a policy with "
+                     "measurement_index or os_measurements")
+
+    audit = ConfigIdAudit(policy)
+    results = asyncio.run(audit.run(args.quotes))
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    print(json.dumps(audit.stats), file=sys.stderr)
+    if not all(result["verified"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Fleet attestation audit with quote deduplication.
+
+Many reports in a fleet share the same quote, or at least the same OS
+measurements and compose hash. Before verifying, the inputs are hashed and
+grouped so that every unique quote goes through dcap-qvl once, and every
+unique (MR tuple, compose hash, ...) combination is evaluated against the
+policy once. The results are then fanned back out to all inputs.
+
+Reports are read with the memory-mapped bundle loader, so a file may also be
+an attestation.json bundle with several app certificates; each certificate is
+audited as its own entry, with the event log of the bundle's tcb_info.
+
+Usage:
+    python audit.py --policy policy.json reports/*.json > audit.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+from typing import Dict, Any, Optional
+
+from bundle import load_bundle
+from policy import CompiledPolicy
+from verify import DstackTdxQuote
+
+
+def policy_key(quote: DstackTdxQuote) -> tuple:
+    """
+    Key of everything the policy looks at, used to evaluate each combination once.
+    """
+    mrs = quote.mrs()
+    result = quote.verified_quote
+    return (
+        mrs["mr_td"], mrs["rt_mr0"], mrs["rt_mr1"], mrs["rt_mr2"],
+        getattr(quote, "compose_hash", None),
+        getattr(quote, "app_id", None),
+        getattr(quote, "key_provider", None),
+        result["status"],
+        tuple(sorted(result.get("advisory_ids", []))),
+    )
+
+
+async def verify_quote_group(group: list[DstackTdxQuote]) -> Optional[str]:
+    """
+    Verify the first quote of a group of identical quotes and share the result.
+    Returns an error message on failure.
+    """
+    try:
+        await group[0].averify()
+    except (ValueError, OSError) as e:
+        return str(e)
+    for quote in group[1:]:
+        quote.verified_quote = group[0].verified_quote
+    return None
+
+
+class Audit:
+    def __init__(self, policy: CompiledPolicy):
+        """
+        Initialize an Audit evaluating reports against the given policy.
+        """
+        self.policy = policy
+        self.stats = {"inputs": 0, "unique_reports": 0, "unique_quotes": 0, "policy_evaluations": 0}
+
+    async def run(self, paths: list[str]) -> list[Dict[str, Any]]:
+        """
+        Verify all reports and return one result per input (path and bundle entry).
+        """
+        # Group identical reports (same quote and event log)
+        input_keys: list[tuple[Dict[str, str], bytes]] = []
+        reports: Dict[bytes, tuple[bytes, str]] = {}
+        results: Dict[bytes, Dict[str, Any]] = {}
+        for path in paths:
+            try:
+                bundle = load_bundle(path)
+            except (ValueError, OSError) as e:
+                key = b"bundle\0" + path.encode()
+                results[key] = {"verified": False, "errors": [f"Invalid bundle: {e}"]}
+                input_keys.append(({"path": path}, key))
+                continue
+            for entry, quote, event_log in bundle:
+                source = {"path": path, "entry": entry} if entry else {"path": path}
+                hasher = hashlib.sha256(quote)
+                hasher.update(b"\0")
+                if event_log is None:
+                    key = hasher.digest()
+                    results[key] = {"verified": False, "errors": ["No event log"]}
+                else:
+                    hasher.update(event_log.encode())
+                    key = hasher.digest()
+                    reports.setdefault(key, (quote, event_log))
+                input_keys.append((source, key))
+        self.stats["inputs"] = len(input_keys)
+        self.stats["unique_reports"] = len(reports)
+
+        quotes: Dict[bytes, DstackTdxQuote] = {}
+        parsed = await asyncio.gather(
+            *[DstackTdxQuote.acreate(quote, event_log) for quote, event_log in reports.values()],
+            return_exceptions=True
+        )
+        for key, quote in zip(reports, parsed):
+            if isinstance(quote, ValueError):
+                results[key] = {"verified": False, "errors": [f"Invalid event log: {quote}"]}
+            elif isinstance(quote, BaseException):
+                raise quote
+            else:
+                quotes[key] = quote
+
+        # Group identical quotes and run dcap-qvl once per unique quote
+        quote_groups: Dict[bytes, list[DstackTdxQuote]] = {}
+        for quote in quotes.values():
+            quote_groups.setdefault(hashlib.sha256(quote.quote).digest(), []).append(quote)
+        self.stats["unique_quotes"] = len(quote_groups)
+        errors = await asyncio.gather(*[verify_quote_group(group) for group in quote_groups.values()])
+        failed = {id(quote): error for group, error in zip(quote_groups.values(), errors) if error
+                  for quote in group}
+
+        verdicts: Dict[tuple, list[str]] = {}
+        for key, quote in quotes.items():
+            if id(quote) in failed:
+                results[key] = {"verified": False, "errors": [failed[id(quote)]]}
+                continue
+            try:
+                pkey = policy_key(quote)
+                if pkey not in verdicts:
+                    verdicts[pkey] = self.policy.evaluate(quote)
+                rt_mr3 = quote.mrs()["rt_mr3"]
+            except ValueError as e:
+                results[key] = {"verified": False, "errors": [str(e)]}
+                continue
+            except KeyError as e:
+                results[key] = {"verified": False, "errors": [f"Invalid dcap-qvl result: missing {e}"]}
+                continue
+            violations = list(verdicts[pkey])
+            if quote.replay_rtmrs()[3] != rt_mr3:
+                violations.append("RTMR3 does not match the replayed event log")
+            results[key] = {
+                "verified": not violations,
+                "errors": violations,
+                "tcb_status": quote.verified_quote["status"],
+                "app_id": getattr(quote, "app_id", None),
+                "compose_hash": getattr(quote, "compose_hash", None),
+                "instance_id": getattr(quote, "instance_id", None),
+            }
+        self.stats["policy_evaluations"] = len(verdicts)
+
+        # Fan results back out to every input
+        return [dict(results[key], **source) for source, key in input_keys]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit a fleet of Dstack attestation reports")
+    parser.add_argument("reports", nargs="+", help="report.json files (quote and event_log) or attestation bundles")
+    parser.add_argument("--policy", required=True, help="Attestation policy file (see policy.py) with an OS allowlist")
+    args = parser.parse_args()
+
+    policy = CompiledPolicy.load(args.policy)
+    # Without one, any OS measurements would be reported as verified
+    if not policy.has_os_allowlist():
+        parser.error(f"{args.policy} has no OS allowlist; add a measurement_index or os_measurements")
+    audit = Audit(policy)
+    results = asyncio.run(audit.run(args.reports))
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    print(json.dumps(audit.stats), file=sys.stderr)
+    if not all(result["verified"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark event log validation and RTMR replay over synthetic event logs.
+
+Compares the original implementation (json.loads of the whole log, hex
+decoding on every validation and extend, one pass per RTMR) against the
+single-pass replay in eventlog.py, with the event log given as a string and
+as a text stream (decoded event by event).
+
+Usage:
+    python bench_eventlog.py                      # 1k, 10k and 100k events
+    python bench_eventlog.py --sizes 1000000      # 1M events
+    python bench_eventlog.py --payload-size 4096
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+
+from eventlog import RtmrReplayer, iter_event_dicts
+
+
+def synthetic_event_log(count: int, payload_size: int) -> str:
+    """
+    Generate an event log with a few boot-time events and count-8 valid runtime events.
+    """
+    events = []
+    for idx in range(count):
+        imr = idx % 3 if idx < 8 else 3
+        event_type = 0x08000001 if imr == 3 else 0x80000001
+        name = f"event-{idx % 16}" if imr == 3 else ""
+        payload = os.urandom(payload_size)
+        if imr == 3:
+            digest = hashlib.sha384(event_type.to_bytes(4, "little") + b":" + name.encode() + b":" + payload).digest()
+        else:
+            digest = os.urandom(48)
+        events.append({
+            "imr": imr,
+            "event_type": event_type,
+            "digest": digest.hex(),
+            "event": name,
+            "event_payload": payload.hex(),
+        })
+    return json.dumps(events)
+
+
+def legacy_replay(event_log: str) -> dict:
+    """
+    The original DstackTdxQuote implementation: parse everything, then replay each
+    RTMR in its own pass, re-decoding hex for every validation and extend.
+    """
+    parsed = json.loads(event_log)
+    rtmrs = {}
+    for idx in range(4):
+        mr = bytes(48)
+        for event in parsed:
+            if event.get("imr") != idx:
+                continue
+            if idx == 3:
+                hasher = hashlib.sha384()
+                hasher.update(event.get("event_type", 0).to_bytes(4, byteorder="little"))
+                hasher.update(b":")
+                hasher.update(event.get("event", "").encode())
+                hasher.update(b":")
+                hasher.update(bytes.fromhex(event.get("event_payload", "")))
+                if hasher.digest().hex() != event.get("digest"):
+                    raise ValueError(f"Invalid event digest found in IMR {idx}")
+            content = bytes.fromhex(event["digest"])
+            if len(content) < 48:
+                content = content.ljust(48, b"\0")
+            mr = hashlib.sha384(mr + content).digest()
+        rtmrs[idx] = mr.hex()
+    return rtmrs
+
+
+def replay(event_log: str) -> dict:
+    """
+    Replay as DstackTdxQuote does, with the event log given as a string.
+    """
+    replayer = RtmrReplayer()
+    for _ in replayer.extend_all(iter_event_dicts(event_log)):
+        pass
+    return replayer.rtmrs()
+
+
+def streaming_replay(event_log: str) -> dict:
+    """
+    Replay as DstackTdxQuote does, with the event log given as a text stream.
+    """
+    replayer = RtmrReplayer()
+    for _ in replayer.extend_all(iter_event_dicts(io.StringIO(event_log))):
+        pass
+    return replayer.rtmrs()
+
+
+def measure(func, *args, repeat: int = 3) -> tuple[float, dict]:
+    """
+    Run func repeat times and return the best wall time and the result.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event log replay")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Event counts")
+    parser.add_argument("--payload-size", type=int, default=32, help="Payload bytes per event")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'events':>10} {'implementation':>16} {'seconds':>10} {'events/s':>12}")
+    for count in args.sizes:
+        event_log = synthetic_event_log(count, args.payload_size)
+        expected = None
+        for name, func in (
+            ("legacy", legacy_replay),
+            ("string", replay),
+            ("stream", streaming_replay),
+        ):
+            elapsed, result = measure(func, event_log, repeat=args.repeat)
+            if expected is None:
+                expected = result
+            elif result != expected:
+                raise AssertionError(f"{name} replay differs from legacy replay")
+            print(f"{count:>10} {name:>16} {elapsed:>10.3f} {count / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Memory-mapped loader for attestation bundles.
+
+Bundles such as report.json ({"quote": ..., "event_log": ...}) or the
+attestation.json of the Phala Cloud API (several app_certificates, each with
+its own quote) can be several megabytes. Instead of json.load()-ing the whole
+document, the file is memory-mapped and scanned for its structure only:
+strings are skipped by a regular expression without being copied, and only the
+quote and event log fields of each entry are extracted. Quotes are hex-decoded
+straight from the mapping into a preallocated buffer.
+
+An entry without its own event_log uses the one in the nearest enclosing
+tcb_info, which is where attestation.json stores the event log of the CVM.
+"""
+
+import binascii
+import json
+import mmap
+import os
+import re
+from typing import Dict, Iterator, Optional, Union
+
+# Bytes of hex decoded per step, bounding the temporary copies in decode_hex_into
+HEX_CHUNK_SIZE = 64 * 1024
+
+# Start of a string or a structural character; numbers and literals are skipped
+_TOKEN = re.compile(rb'[{}\[\],"]')
+_QUOTE = ord('"')
+_BACKSLASH = ord("\\")
+
+# Keys longer than this are never decoded while scanning
+_MAX_KEY_SIZE = 64
+
+Span = tuple[int, int]
+
+
+def decode_hex_into(buf: Union[bytes, mmap.mmap, memoryview], start: int, end: int,
+                    out: Optional[bytearray] = None) -> bytearray:
+    """
+    Decode the hex digits buf[start:end] into out, which is allocated if not given.
+    The input is read through a memoryview in fixed-size chunks, so the hex text
+    is never copied as a whole.
+    """
+    if (end - start) % 2:
+        raise ValueError("Hex string has an odd number of digits")
+    size = (end - start) // 2
+    if out is None:
+        out = bytearray(size)
+    elif len(out) != size:
+        raise ValueError(f"Output buffer is {len(out)} bytes, expected {size}")
+    view = memoryview(buf)
+    pos = 0
+    try:
+        for offset in range(start, end, HEX_CHUNK_SIZE * 2):
+            chunk = binascii.a2b_hex(view[offset:min(offset + HEX_CHUNK_SIZE * 2, end)])
+            out[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid hex string: {e}") from None
+    finally:
+        view.release()
+    return out
+
+
+class BundleEntry:
+    """
+    A quote in a bundle, with the location of its sibling fields.
+    """
+    __slots__ = ("name", "fields", "_buf")
+
+    def __init__(self, name: str, fields: Dict[str, Span], buf):
+        self.name = name
+        self.fields = fields
+        self._buf = buf
+
+    def quote(self) -> bytearray:
+        """
+        Decode the quote.
+        """
+        start, end = self.fields["quote"]
+        if self._buf[start] != ord('"'):
+            raise ValueError(f"{self.name or 'quote'}: quote is not a string")
+        return decode_hex_into(self._buf, start + 1, end - 1)
+
+    def event_log(self) -> Optional[str]:
+        """
+        Get the event log as JSON text, or None if the entry has none. Only the
+        event log field is copied out of the mapping.
+        """
+        span = self.fields.get("event_log")
+        if span is None:
+            return None
+        start, end = span
+        text = self._buf[start:end].decode()
+        if text.startswith('"'):
+            # The event log is usually stored as a JSON-encoded string
+            text = json.loads(text)
+        return text
+
+
+def _string_end(buf, start: int) -> int:
+    """
+    Find the end of the JSON string starting at buf[start]. Uses find(), which
+    skips long hex strings at memchr speed.
+    """
+    pos = start + 1
+    while True:
+        end = buf.find(b'"', pos)
+        if end < 0:
+            raise ValueError("Malformed bundle: unterminated string")
+        backslashes = 0
+        while buf[end - 1 - backslashes] == _BACKSLASH:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+        pos = end + 1
+
+
+def scan_bundle(buf, wanted: frozenset[str]) -> Iterator[tuple[str, Dict[str, Span]]]:
+    """
+    Walk the structure of a JSON document and yield, for every object having any
+    of the wanted keys, its path and the spans of those keys' values.
+    """
+    # One frame per open container: [is_object, label, wanted fields, key, array index, start]
+    stack: list[list] = []
+    key = None
+    pos = 0
+    while True:
+        match = _TOKEN.search(buf, pos)
+        if match is None:
+            break
+        start = pos = match.start()
+        pos += 1
+        char = buf[start]
+        frame = stack[-1] if stack else None
+        if char == _QUOTE:
+            end = pos = _string_end(buf, start)
+            if frame is not None and frame[0] and key is None:
+                # A string in key position; decode it only if short enough to be wanted
+                if end - start - 2 > _MAX_KEY_SIZE:
+                    key = ""
+                else:
+                    key = buf[start + 1:end - 1].decode()
+                    if "\\" in key:
+                        key = json.loads(buf[start:end])
+            elif frame is not None and frame[0] and key in wanted:
+                frame[2][key] = (start, end)
+        elif char == ord(','):
+            if frame is not None:
+                if frame[0]:
+                    key = None
+                else:
+                    frame[4] += 1
+        elif char in b"{[":
+            if frame is None:
+                label = ""
+            elif frame[0]:
+                label = f"{frame[1]}.{key}" if frame[1] else key
+            else:
+                label = f"{frame[1]}[{frame[4]}]"
+            stack.append([char == ord("{"), label, {}, key if frame is not None and frame[0] else None, 0, start])
+            key = None
+        elif char in b"}]":
+            if not stack:
+                raise ValueError("Malformed bundle: unbalanced brackets")
+            is_object, label, fields, parent_key, _, container_start = stack.pop()
+            if is_object != (char == ord("}")):
+                raise ValueError("Malformed bundle: mismatched brackets")
+            if is_object and fields:
+                yield label, fields
+            key = parent_key
+            if stack and stack[-1][0] and parent_key in wanted:
+                stack[-1][2][parent_key] = (container_start, pos)
+    if stack:
+        raise ValueError("Malformed bundle: truncated document")
+
+
+def _tcb_info_event_log(objects: Dict[str, Dict[str, Span]], name: str) -> Optional[Span]:
+    """
+    Find the event log of the nearest tcb_info at or above the object at path name.
+    """
+    while True:
+        span = objects.get(f"{name}.tcb_info" if name else "tcb_info", {}).get("event_log")
+        if span is not None or not name:
+            return span
+        # Go up one level by stripping the last ".key" or "[index]"; top-level keys have neither
+        parent = re.sub(r"(\.[^.\[]*|\[\d+\])$", "", name)
+        name = "" if parent == name else parent
+
+
+class Bundle:
+    """
+    A memory-mapped attestation bundle.
+    """
+
+    def __init__(self, path: str):
+        """
+        Map the bundle at path. Use as a context manager, or call close().
+        """
+        with open(path, "rb") as f:
+            # mmap cannot map an empty file
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"Empty bundle: {path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+
+    def entries(self) -> list[BundleEntry]:
+        """
+        Locate every object with a quote, e.g. the report itself or each app certificate.
+        """
+        objects = dict(scan_bundle(self._mmap, frozenset(("quote", "event_log"))))
+        entries = []
+        for name, fields in objects.items():
+            if "quote" not in fields:
+                continue
+            if "event_log" not in fields:
+                span = _tcb_info_event_log(objects, name)
+                if span is not None:
+                    fields = dict(fields, event_log=span)
+            entries.append(BundleEntry(name, fields, self._mmap))
+        return entries
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self) -> "Bundle":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_bundle(path: str) -> list[tuple[str, bytearray, Optional[str]]]:
+    """
+    Load the (entry name, quote, event log) of every quote in a bundle file.
+    Raises ValueError if the file contains no quote.
+    """
+    with Bundle(path) as bundle:
+        entries = bundle.entries()
+        if not entries:
+            raise ValueError(f"No quote found in bundle: {path}")
+        return [(entry.name, entry.quote(), entry.event_log()) for entry in entries]
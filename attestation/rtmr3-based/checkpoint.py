@@ -0,0 +1,76 @@
+"""
+Checkpoints for incremental re-attestation of long-running CVMs.
+
+RTMR3 is a hash chain, so once a quote has been verified against the replayed
+event log, the running register values at that point are trusted. A checkpoint
+stores those values together with the number of events consumed and the
+character offset in the event log just past the last of them. The next
+verification resumes decoding at that offset, so only the events appended since
+then are parsed and folded in.
+"""
+
+import json
+import os
+from typing import Dict, Any, Optional
+
+from eventlog import RTMR_COUNT, RtmrReplayer
+
+CHECKPOINT_VERSION = 2
+
+
+class Checkpoint:
+    event_count: int
+    rtmrs: list[bytes]
+    counts: list[int]
+    info: Dict[str, Any]
+    offset: int
+
+    def __init__(self, rtmrs: list[bytes], counts: list[int], info: Dict[str, Any], offset: int):
+        """
+        Initialize a Checkpoint from running RTMR values, per-IMR event counts, the
+        app information extracted from the already verified events and the event
+        log offset just past the last of them.
+        """
+        if len(rtmrs) != RTMR_COUNT or len(counts) != RTMR_COUNT:
+            raise ValueError(f"Checkpoint must cover {RTMR_COUNT} RTMRs")
+        self.rtmrs = list(rtmrs)
+        self.counts = list(counts)
+        self.event_count = sum(counts)
+        self.info = dict(info)
+        self.offset = offset
+
+    def replayer(self) -> RtmrReplayer:
+        """
+        Create a replayer resuming from this checkpoint.
+        """
+        return RtmrReplayer(self.rtmrs, self.counts)
+
+    def save(self, path: str):
+        """
+        Atomically write the checkpoint as JSON.
+        """
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "event_count": self.event_count,
+            "rtmrs": [mr.hex() for mr in self.rtmrs],
+            "counts": self.counts,
+            "info": self.info,
+            "offset": self.offset,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Checkpoint"]:
+        """
+        Load a checkpoint, returning None if the file does not exist.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {data.get('version')}")
+        return cls([bytes.fromhex(mr) for mr in data["rtmrs"]], data["counts"], data["info"], data["offset"])
@@ -0,0 +1,330 @@
+"""
+Streaming parser for Dstack event logs.
+
+The event log is a JSON array of events. Events are decoded into compact Event
+objects holding raw bytes, so hex strings are decoded only once, and IMR3
+digests are validated and every digest is folded into its RTMR in a single
+pass. Event logs given as text streams, or as strings longer than
+JSON_LOADS_LIMIT, are decoded one event at a time, so memory stays bounded
+for long runtime logs and replay can start before the whole log has been read.
+Decoding can also resume at a character offset, skipping the events before it.
+"""
+
+import functools
+import hashlib
+import json
+import re
+from typing import Any, Container, Dict, Iterable, Iterator, Optional, TextIO, Union
+
+RTMR_COUNT = 4
+MR_SIZE = 48
+INIT_MR = bytes(MR_SIZE)
+
+_scan_once = json.JSONDecoder().scan_once
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that may continue a number, e.g. "1.5" in a buffer ending with "1.5e"
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+# Event logs given as strings up to this many characters are decoded with
+# json.loads, which is faster than scanning them event by event
+JSON_LOADS_LIMIT = 32 * 1024 * 1024
+
+# JSON types of the optional event fields, and their defaults
+EVENT_FIELDS = (("event_type", int, 0), ("digest", str, ""), ("event", str, ""), ("event_payload", str, ""))
+
+
+@functools.lru_cache(maxsize=1024)
+def _digest_prefix(event_type: int, event: str) -> bytes:
+    """
+    The "type:event:" prefix of the digest input; event types and names repeat a lot.
+    """
+    return event_type.to_bytes(4, byteorder="little") + b":" + event.encode() + b":"
+
+
+def check_event(data: Any):
+    """
+    Check that a decoded event is an object whose fields have the right JSON types.
+    Raises ValueError otherwise; the IMR index is checked when the event is replayed.
+    """
+    if data.__class__ is not dict:
+        raise ValueError(f"Malformed event log: event is a {type(data).__name__}, not an object")
+    for field, field_type, default in EVENT_FIELDS:
+        value = data.get(field, default)
+        if value.__class__ is not field_type:
+            raise ValueError(f"Malformed event log: {field} must be a {field_type.__name__}, got {value!r}")
+
+
+class Event:
+    """
+    A single event log entry with digest and payload decoded to bytes.
+    """
+    __slots__ = ("imr", "event_type", "digest", "event", "event_payload")
+
+    def __init__(self, imr: int, event_type: int, digest: bytes, event: str, event_payload: bytes):
+        self.imr = imr
+        self.event_type = event_type
+        self.digest = digest
+        self.event = event
+        self.event_payload = event_payload
+
+    @classmethod
+    def from_dict(cls, data: Dict, _fromhex=bytes.fromhex) -> "Event":
+        """
+        Create an Event from a decoded event. Raises ValueError if it is malformed.
+        """
+        check_event(data)
+        get = data.get
+        return cls(
+            get("imr"),
+            get("event_type", 0),
+            _fromhex(get("digest", "")),
+            get("event", ""),
+            _fromhex(get("event_payload", "")),
+        )
+
+    def calculate_digest(self) -> bytes:
+        """
+        Calculate the event digest as sha384(type:event:payload).
+        """
+        return hashlib.sha384(_digest_prefix(self.event_type, self.event) + self.event_payload).digest()
+
+    def is_valid(self) -> bool:
+        """
+        Validate the event's digest. Only IMR3 (runtime) events can be checked.
+        """
+        if self.imr != 3:
+            return True
+        return self.calculate_digest() == self.digest
+
+
+def extend_mr(mr: bytes, digest: bytes) -> bytes:
+    """
+    Extend a measurement register with a digest: mr = sha384(mr || digest).
+    Digests shorter than 48 bytes are padded with zeros.
+    """
+    if len(digest) < MR_SIZE:
+        digest = digest.ljust(MR_SIZE, b"\0")
+    return hashlib.sha384(mr + digest).digest()
+
+
+class JsonArrayReader:
+    """
+    Incremental decoder for the elements of a top-level JSON array in a string or
+    a text stream. Strings are scanned in place without copying.
+
+    Input is as strict as json.loads: elements must be separated by exactly one
+    comma, and nothing but whitespace may follow the closing bracket.
+
+    offset is the character offset just past the last element decoded, or 0 if
+    there was none. A reader created with a nonzero offset resumes right after
+    the element ending there: the characters before it are skipped, not decoded.
+    """
+
+    def __init__(self, source: Union[str, TextIO], chunk_size: int = 64 * 1024, offset: int = 0):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.offset = offset
+
+    def __iter__(self) -> Iterator[Any]:
+        source = self.source
+        chunk_size = self.chunk_size
+        if isinstance(source, str):
+            buf, stream, eof = source, None, True
+            if self.offset > len(buf):
+                raise ValueError(f"Event log ends before offset {self.offset}")
+        else:
+            buf, stream, eof = "", source, False
+            _skip_chars(stream, self.offset, chunk_size)
+        # Absolute offset of buf[0], and the position in buf
+        base = 0 if stream is None else self.offset
+        pos = self.offset - base
+        started = self.offset > 0
+        # What may come next inside the array: "first" (a value or "]"), "value"
+        # (after a comma) or "separator" (a comma or "]", after a value)
+        expect = "separator" if started else "first"
+        read_size = chunk_size
+
+        while True:
+            end = len(buf)
+            while started:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos >= end:
+                    break
+                char = buf[pos]
+                if char == "]" and expect != "value":
+                    _check_trailing(buf[pos + 1:], stream, eof, chunk_size)
+                    return
+                if expect == "separator":
+                    if char != ",":
+                        raise ValueError("Malformed event log: expected ',' or ']' between events")
+                    pos += 1
+                    expect = "value"
+                    continue
+                if char == "]":
+                    raise ValueError("Malformed event log: trailing comma")
+                try:
+                    value, value_end = _scan_once(buf, pos)
+                except (StopIteration, ValueError):
+                    break
+                # A value ending at the buffer boundary may continue in the next chunk
+                if not eof and (value_end == end or (value.__class__ in (int, float)
+                                                     and _NUMBER_TAIL.fullmatch(buf, value_end))):
+                    break
+                self.offset = base + value_end
+                yield value
+                pos = value_end
+                expect = "separator"
+                read_size = chunk_size
+
+            if not started:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf):
+                    if buf[pos] != "[":
+                        raise ValueError("Event log is not a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+
+            if eof:
+                raise ValueError("Truncated or malformed event log")
+            chunk = stream.read(read_size)
+            eof = not chunk
+            base += pos
+            buf = buf[pos:] + chunk
+            pos = 0
+            # Grow the read size while a single value spans several chunks, so that
+            # large values are not rescanned once per chunk
+            read_size = max(read_size, len(buf))
+
+
+def iter_json_array(source: Union[str, TextIO], chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    Incrementally decode the elements of a top-level JSON array from a string or a
+    text stream (see JsonArrayReader).
+    """
+    return iter(JsonArrayReader(source, chunk_size))
+
+
+def json_array_end(text: str) -> int:
+    """
+    Get the offset just past the last element of a well-formed JSON array, or 0
+    if it is empty: where a JsonArrayReader over the same array would stop.
+    """
+    end = len(text)
+    while end > 0 and text[end - 1] in " \t\n\r":
+        end -= 1
+    # Skip the closing bracket and the whitespace before it
+    end -= 1
+    while end > 0 and text[end - 1] in " \t\n\r":
+        end -= 1
+    return 0 if text[end - 1] == "[" else end
+
+
+def _skip_chars(stream: TextIO, offset: int, chunk_size: int):
+    """
+    Read and discard the first offset characters of a stream.
+    """
+    count = offset
+    while count > 0:
+        chunk = stream.read(min(count, chunk_size))
+        if not chunk:
+            raise ValueError(f"Event log ends before offset {offset}")
+        count -= len(chunk)
+
+
+def _check_trailing(rest: str, stream: Optional[TextIO], eof: bool, chunk_size: int):
+    """
+    Reject anything but whitespace after the closing bracket, reading the rest of the stream.
+    """
+    while True:
+        if rest.strip(" \t\n\r"):
+            raise ValueError("Malformed event log: data after the closing bracket")
+        if stream is None or eof:
+            return
+        rest = stream.read(chunk_size)
+        eof = not rest
+
+
+class RtmrReplayer:
+    """
+    Running RTMR values, extended one event at a time.
+    """
+    __slots__ = ("mrs", "counts")
+
+    def __init__(self, mrs: Optional[list[bytes]] = None, counts: Optional[list[int]] = None):
+        self.mrs = list(mrs) if mrs else [INIT_MR] * RTMR_COUNT
+        self.counts = list(counts) if counts else [0] * RTMR_COUNT
+
+    def extend(self, event: Event):
+        """
+        Validate an event and fold its digest into the corresponding RTMR.
+        """
+        imr = event.imr
+        if imr.__class__ is not int or not 0 <= imr < RTMR_COUNT:
+            raise ValueError(f"Invalid IMR index in event: {imr!r}")
+        if not event.is_valid():
+            raise ValueError(f"Invalid event digest found in IMR {imr}")
+        self.mrs[imr] = extend_mr(self.mrs[imr], event.digest)
+        self.counts[imr] += 1
+
+    def extend_all(self, events: Iterable[Dict], keep: Container[str] = ()) -> Iterator[Event]:
+        """
+        Validate decoded event dicts and fold them into the RTMRs, yielding Event
+        objects only for the events named in keep. Raises ValueError for a
+        malformed event.
+
+        Replaying straight from the dicts, without an Event object per event, is
+        what makes replay faster than hashing the hex strings event by event.
+        """
+        sha384 = hashlib.sha384
+        prefix = _digest_prefix
+        fromhex = bytes.fromhex
+        mrs = self.mrs
+        counts = self.counts
+        for data in events:
+            if data.__class__ is not dict:
+                check_event(data)
+            get = data.get
+            imr = get("imr")
+            if imr.__class__ is not int or not 0 <= imr < RTMR_COUNT:
+                raise ValueError(f"Invalid IMR index in event: {imr!r}")
+            digest = get("digest", "")
+            event_type = get("event_type", 0)
+            event = get("event", "")
+            payload = get("event_payload", "")
+            # Inline type checks; check_event() only runs to report the bad field
+            if (digest.__class__ is not str or event_type.__class__ is not int
+                    or event.__class__ is not str or payload.__class__ is not str):
+                check_event(data)
+            digest = fromhex(digest)
+            if imr == 3:
+                if sha384(prefix(event_type, event) + fromhex(payload)).digest() != digest:
+                    raise ValueError(f"Invalid event digest found in IMR {imr}")
+            if len(digest) < MR_SIZE:
+                digest = digest.ljust(MR_SIZE, b"\0")
+            mrs[imr] = sha384(mrs[imr] + digest).digest()
+            counts[imr] += 1
+            if event in keep:
+                yield Event.from_dict(data)
+
+    def rtmrs(self) -> Dict[int, str]:
+        return {idx: mr.hex() for idx, mr in enumerate(self.mrs)}
+
+
+def iter_event_dicts(event_log: Union[str, TextIO]) -> Iterator[Dict]:
+    """
+    Iterate over the decoded events of an event log given as a JSON string or a text stream.
+    """
+    if isinstance(event_log, str) and len(event_log) <= JSON_LOADS_LIMIT:
+        events = json.loads(event_log)
+        if not isinstance(events, list):
+            raise ValueError("Event log is not a JSON array")
+        return iter(events)
+    return iter_json_array(event_log)
+
+
+def iter_events(event_log: Union[str, TextIO]) -> Iterator[Event]:
+    """
+    Iterate over the Event objects of an event log given as a JSON string or a text stream.
+    """
+    return map(Event.from_dict, iter_event_dicts(event_log))
@@ -0,0 +1,169 @@
+"""
+Known-good measurement index for fleet-wide OS verification.
+
+Instead of running dstack-mr for every CVM we verify, the expected
+(MRTD, RTMR0, RTMR1, RTMR2) tuples of every supported image version and
+instance size are computed once and stored as a set of SHA-256 keys.
+Checking a quote is then a single dictionary lookup that also reports which
+image/size combination matched.
+
+Build an index:
+    python measurement_index.py build -o index.json \
+        --image images/dstack-0.5.5 --size 1:2G --size 4:8G
+
+Look up a set of measurements:
+    python measurement_index.py lookup index.json <mrtd> <rtmr0> <rtmr1> <rtmr2>
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any, Optional
+
+INDEX_VERSION = 1
+
+# Field names used by dstack-mr output and by the dcap-qvl TD report.
+DSTACK_MR_FIELDS = ("mrtd", "rtmr0", "rtmr1", "rtmr2")
+QUOTE_REPORT_FIELDS = ("mr_td", "rt_mr0", "rt_mr1", "rt_mr2")
+
+
+def measurement_key(mrtd: str, rtmr0: str, rtmr1: str, rtmr2: str) -> bytes:
+    """
+    Calculate the index key of an OS measurement tuple.
+    """
+    hasher = hashlib.sha256()
+    for mr in (mrtd, rtmr0, rtmr1, rtmr2):
+        hasher.update(bytes.fromhex(mr))
+    return hasher.digest()
+
+
+def os_measurements(mrs: Dict[str, str]) -> tuple[str, str, str, str]:
+    """
+    Extract the (MRTD, RTMR0, RTMR1, RTMR2) tuple from either a dstack-mr result
+    or a verified TD report.
+    """
+    fields = QUOTE_REPORT_FIELDS if "mr_td" in mrs else DSTACK_MR_FIELDS
+    return tuple(mrs[field].lower() for field in fields)
+
+
+class MeasurementIndex:
+    entries: Dict[bytes, Dict[str, Any]]
+
+    def __init__(self):
+        """
+        Initialize an empty MeasurementIndex.
+        """
+        self.entries = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, mrs: Dict[str, str], image: str, vcpus: str, memory: str):
+        """
+        Add the measurements of an image version and instance size to the index.
+        """
+        key = measurement_key(*os_measurements(mrs))
+        self.entries[key] = {"image": image, "vcpus": vcpus, "memory": memory}
+
+    def lookup(self, mrs: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Look up measurements in the index.
+        Returns the matching image/size entry, or None if the measurements are unknown.
+        """
+        return self.entries.get(measurement_key(*os_measurements(mrs)))
+
+    def save(self, path: str):
+        """
+        Save the index as JSON.
+        """
+        data = {
+            "version": INDEX_VERSION,
+            "entries": {key.hex(): entry for key, entry in self.entries.items()},
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> "MeasurementIndex":
+        """
+        Load an index previously written by save().
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported measurement index version: {data.get('version')}")
+        index = cls()
+        index.entries = {bytes.fromhex(key): entry for key, entry in data["entries"].items()}
+        return index
+
+
+def calculate_measurements(image_folder: str, vcpus: str, memory: str) -> Dict[str, str]:
+    """
+    Calculate expected measurements of an image/size combination using dstack-mr.
+    """
+    result = subprocess.run(
+        ["dstack-mr", "-cpu", vcpus, "-memory", memory, "-json",
+         "-metadata", os.path.join(image_folder, "metadata.json")],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise ValueError(f"dstack-mr failed with return code {result.returncode}: {result.stderr}")
+    return json.loads(result.stdout)
+
+
+def build_index(image_folders: list[str], sizes: list[tuple[str, str]]) -> MeasurementIndex:
+    """
+    Build an index covering every image folder and instance size combination.
+    """
+    index = MeasurementIndex()
+    for image_folder in image_folders:
+        image = os.path.basename(os.path.normpath(image_folder))
+        for vcpus, memory in sizes:
+            print(f"Calculating measurements for {image} ({vcpus} vCPU, {memory})", file=sys.stderr)
+            mrs = calculate_measurements(image_folder, vcpus, memory)
+            index.add(mrs, image, vcpus, memory)
+    return index
+
+
+def parse_size(value: str) -> tuple[str, str]:
+    vcpus, sep, memory = value.partition(":")
+    if not sep or not vcpus or not memory:
+        raise argparse.ArgumentTypeError(f"Invalid size {value!r}, expected VCPUS:MEMORY (e.g. 2:4G)")
+    return vcpus, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Known-good OS measurement index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build an index with dstack-mr")
+    build.add_argument("-o", "--output", required=True, help="Index file to write")
+    build.add_argument("--image", action="append", required=True, help="dstack image folder (repeatable)")
+    build.add_argument("--size", action="append", required=True, type=parse_size,
+                       help="Instance size as VCPUS:MEMORY (repeatable)")
+
+    lookup = subparsers.add_parser("lookup", help="Look up measurements in an index")
+    lookup.add_argument("index", help="Index file")
+    lookup.add_argument("mrs", nargs=4, metavar="MR", help="MRTD RTMR0 RTMR1 RTMR2")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = build_index(args.image, args.size)
+        index.save(args.output)
+        print(f"Wrote {len(index)} entries to {args.output}")
+    else:
+        index = MeasurementIndex.load(args.index)
+        entry = index.lookup(dict(zip(DSTACK_MR_FIELDS, args.mrs)))
+        if entry is None:
+            print("No matching image/size found")
+            sys.exit(1)
+        print(json.dumps(entry, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Declarative attestation policy.
+
+A policy file lists what a verified quote is allowed to contain:
+
+    {
+      "tcb_statuses": ["UpToDate", "SWHardeningNeeded"],
+      "advisories": {"allow": [], "block": ["INTEL-SA-00837"]},
+      "measurement_index": "measurement-index.json",
+      "os_measurements": [{"mrtd": "...", "rtmr0": "...", "rtmr1": "...", "rtmr2": "..."}],
+      "compose_hashes": ["..."],
+      "app_ids": ["..."],
+      "key_providers": ["kms"]
+    }
+
+Every field is optional; an omitted or empty allowlist does not constrain that
+field. An advisory allowlist, if given, must contain every advisory of the
+quote. OS measurements are accepted if they are in the measurement index or in
+os_measurements. Key providers are matched against the provider name or ID.
+
+The file is compiled once into set and dict lookups, so evaluating a quote
+does not depend on the size of the policy. The same compiled policy is used
+by verify.py and verifier_daemon.py.
+"""
+
+import json
+import os
+from typing import Dict, Any, Optional
+
+from measurement_index import MeasurementIndex, measurement_key, os_measurements
+
+DEFAULT_TCB_STATUSES = ("UpToDate", "SWHardeningNeeded")
+
+
+class CompiledPolicy:
+    tcb_statuses: frozenset[str]
+    allowed_advisories: frozenset[str]
+    blocked_advisories: frozenset[str]
+    os_measurement_keys: frozenset[bytes]
+    measurement_index: Optional[MeasurementIndex]
+    compose_hashes: frozenset[str]
+    app_ids: frozenset[str]
+    key_providers: frozenset[str]
+
+    def __init__(self, policy: Dict[str, Any], base_dir: str = "."):
+        """
+        Compile a policy dictionary. Relative paths are resolved against base_dir.
+        """
+        advisories = policy.get("advisories", {})
+        self.tcb_statuses = frozenset(policy.get("tcb_statuses", DEFAULT_TCB_STATUSES))
+        self.allowed_advisories = frozenset(advisories.get("allow", []))
+        self.blocked_advisories = frozenset(advisories.get("block", []))
+        self.os_measurement_keys = frozenset(
+            measurement_key(*os_measurements(mrs)) for mrs in policy.get("os_measurements", [])
+        )
+        self.measurement_index = None
+        if policy.get("measurement_index"):
+            self.measurement_index = MeasurementIndex.load(os.path.join(base_dir, policy["measurement_index"]))
+        self.compose_hashes = frozenset(h.lower() for h in policy.get("compose_hashes", []))
+        self.app_ids = frozenset(a.lower() for a in policy.get("app_ids", []))
+        self.key_providers = frozenset(policy.get("key_providers", []))
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledPolicy":
+        """
+        Load and compile a policy file.
+        """
+        with open(path) as f:
+            policy = json.load(f)
+        return cls(policy, os.path.dirname(os.path.abspath(path)))
+
+    def has_os_allowlist(self) -> bool:
+        """
+        Check whether the policy constrains MRTD and RTMR0-2 at all. A policy
+        without a measurement index or os_measurements accepts any OS.
+        """
+        return self.measurement_index is not None or bool(self.os_measurement_keys)
+
+    def match_os(self, mrs: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Check MRTD and RTMR0-2 against the policy.
+        Returns the matching index entry (or an empty dict for an os_measurements
+        match), or None if the measurements are not allowed.
+        """
+        if self.measurement_index is not None:
+            entry = self.measurement_index.lookup(mrs)
+            if entry is not None:
+                return entry
+        if measurement_key(*os_measurements(mrs)) in self.os_measurement_keys:
+            return {}
+        return None
+
+    def tcb_violations(self, result: Dict[str, Any]) -> list[str]:
+        """
+        Check the TCB status and advisories of a dcap-qvl result against the policy.
+        Returns a list of violations.
+        """
+        violations = []
+        if result["status"] not in self.tcb_statuses:
+            violations.append(f"TCB status {result['status']} is not allowed")
+        for advisory in result.get("advisory_ids", []):
+            if advisory in self.blocked_advisories:
+                violations.append(f"Advisory {advisory} is blocked")
+            elif self.allowed_advisories and advisory not in self.allowed_advisories:
+                violations.append(f"Advisory {advisory} is not allowed")
+        return violations
+
+    def allows_compose_hash(self, compose_hash: Optional[str]) -> bool:
+        """
+        Check a compose hash against the policy's allowlist, if it has one.
+        """
+        return not self.compose_hashes or (compose_hash or "").lower() in self.compose_hashes
+
+    def evaluate(self, quote) -> list[str]:
+        """
+        Evaluate a verified DstackTdxQuote against the policy.
+        Returns a list of violations; an empty list means the quote is accepted.
+        """
+        violations = self.tcb_violations(quote.verified_quote)
+
+        if self.has_os_allowlist() and self.match_os(quote.mrs()) is None:
+            violations.append("MRTD/RTMR0-2 are not allowed")
+
+        compose_hash = getattr(quote, "compose_hash", None)
+        if not self.allows_compose_hash(compose_hash):
+            violations.append(f"Compose hash {compose_hash} is not allowed")
+
+        app_id = getattr(quote, "app_id", None)
+        if self.app_ids and (app_id or "").lower() not in self.app_ids:
+            violations.append(f"App ID {app_id} is not allowed")
+
+        if self.key_providers:
+            provider = self._key_provider(getattr(quote, "key_provider", None))
+            if not provider & self.key_providers:
+                violations.append("Key provider is not allowed")
+
+        return violations
+
+    @staticmethod
+    def _key_provider(key_provider: Optional[str]) -> set[str]:
+        """
+        Get the identifiers (name and ID) of a key-provider event payload.
+        """
+        if not key_provider:
+            return set()
+        try:
+            provider = json.loads(key_provider)
+        except ValueError:
+            return {key_provider}
+        if not isinstance(provider, dict):
+            return {key_provider}
+        return {str(provider[field]) for field in ("name", "id") if provider.get(field)}
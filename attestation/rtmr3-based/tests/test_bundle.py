@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+# Tests of the memory-mapped attestation bundle loader.
+# Run from the rtmr3-based directory: python3 -m unittest discover -s tests
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+import bundle  # noqa: E402
+from bundle import Bundle, decode_hex_into, load_bundle, scan_bundle  # noqa: E402
+
+WANTED = frozenset(("quote", "event_log"))
+EVENT_LOG = json.dumps([{"imr": 3, "event": "app-id", "event_payload": "00"}])
+
+
+def scan(document) -> dict:
+    """Scan a document, returning the decoded JSON value of every wanted field."""
+    buf = document.encode() if isinstance(document, str) else document
+    return {
+        label: {key: json.loads(buf[start:end]) for key, (start, end) in fields.items()}
+        for label, fields in scan_bundle(buf, WANTED)
+    }
+
+
+class BundleFileTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write(self, content, name="bundle.json") -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, "w" if isinstance(content, str) else "wb") as f:
+            f.write(content)
+        return path
+
+
+class ScanBundleTest(unittest.TestCase):
+    def test_top_level_report(self):
+        document = json.dumps({"quote": "abcd", "event_log": EVENT_LOG, "other": 1})
+        self.assertEqual(scan(document), {"": {"quote": "abcd", "event_log": EVENT_LOG}})
+
+    def test_nested_objects_and_arrays(self):
+        document = json.dumps({
+            "app_certificates": [
+                {"quote": "01", "cert": {"quote": "02"}},
+                {"name": "no quote"},
+                [{"quote": "03"}],
+            ],
+            "tcb_info": {"event_log": [{"imr": 0}], "nested": {"a": [1, {"b": 2}]}},
+        })
+        self.assertEqual(scan(document), {
+            "app_certificates[0]": {"quote": "01"},
+            "app_certificates[0].cert": {"quote": "02"},
+            "app_certificates[2][0]": {"quote": "03"},
+            "tcb_info": {"event_log": [{"imr": 0}]},
+        })
+
+    def test_string_escapes(self):
+        tricky = 'a"b\\\\c\\"{}[],:'
+        document = json.dumps({
+            "note": tricky,
+            "quote": "ab\\",
+            'x"quote': "not a quote",
+            "list": ["\\", '"', "]", "}", "{"],
+            "event_log": tricky,
+        })
+        self.assertEqual(scan(document), {"": {"quote": "ab\\", "event_log": tricky}})
+
+    def test_escaped_keys(self):
+        document = '{"quo\\u0074e": "ab", "event\\u005flog": "[]"}'
+        self.assertEqual(scan(document), {"": {"quote": "ab", "event_log": "[]"}})
+
+    def test_long_keys_are_not_decoded(self):
+        document = json.dumps({"k" * 1000: "v", "quote": "ab"})
+        self.assertEqual(scan(document), {"": {"quote": "ab"}})
+
+    def test_whitespace_and_literals(self):
+        document = '{ "n" : null , "t" : true , "x" : -1.5e3 ,\n "quote" : "ab" }'
+        self.assertEqual(scan(document), {"": {"quote": "ab"}})
+
+    def test_malformed(self):
+        for document in (
+            '{"quote": "ab"',
+            '{"quote": "ab',
+            '{"quote": "ab\\"}',
+            '[{"quote": "ab"}',
+            '{"quote": "ab"}}',
+            '{"quote": "ab"]',
+            '[{"quote": "ab"}}',
+            "]",
+        ):
+            with self.subTest(document=document):
+                with self.assertRaises(ValueError):
+                    scan(document)
+
+    def test_truncated(self):
+        document = json.dumps({"app_certificates": [{"quote": "ab" * 20}],
+                               "tcb_info": {"event_log": EVENT_LOG}})
+        for end in range(1, len(document)):
+            with self.subTest(end=end):
+                with self.assertRaises(ValueError):
+                    scan(document[:end])
+
+
+class TcbInfoEventLogTest(BundleFileTestCase):
+    def entries(self, document) -> dict:
+        with Bundle(self.write(json.dumps(document))) as b:
+            return {entry.name: entry.event_log() for entry in b.entries()}
+
+    def test_event_log_of_the_nearest_tcb_info(self):
+        document = {
+            "app_certificates": [
+                {"quote": "01"},
+                {"quote": "02", "event_log": "[1]"},
+            ],
+            "tcb_info": {"event_log": EVENT_LOG},
+            "instances": {
+                "a": {"quote": "03", "tcb_info": {"event_log": "[2]"}},
+                "b": {"certs": [{"quote": "04"}], "tcb_info": {"event_log": "[3]"}},
+            },
+        }
+        self.assertEqual(self.entries(document), {
+            "app_certificates[0]": EVENT_LOG,
+            "app_certificates[1]": "[1]",
+            "instances.a": "[2]",
+            "instances.b.certs[0]": "[3]",
+        })
+
+    def test_no_event_log(self):
+        document = {"quote": "01", "tcb_info": {"app_compose": "{}"}}
+        self.assertEqual(self.entries(document), {"": None})
+
+    def test_event_log_as_array(self):
+        events = [{"imr": 0, "digest": "00"}]
+        entries = self.entries({"quote": "01", "event_log": events})
+        self.assertEqual(json.loads(entries[""]), events)
+
+
+class LoadBundleTest(BundleFileTestCase):
+    def test_report(self):
+        with open(os.path.join(HERE, "report.json")) as f:
+            report = json.load(f)
+        ((name, quote, event_log),) = load_bundle(os.path.join(HERE, "report.json"))
+        self.assertEqual(name, "")
+        self.assertEqual(bytes(quote), bytes.fromhex(report["quote"]))
+        self.assertEqual(event_log, report["event_log"])
+
+    def test_attestation_bundle(self):
+        document = {
+            "app_certificates": [{"quote": "0a0B"}, {"quote": ""}],
+            "tcb_info": {"event_log": EVENT_LOG},
+        }
+        entries = load_bundle(self.write(json.dumps(document, indent=2)))
+        self.assertEqual(
+            [(name, bytes(quote), log) for name, quote, log in entries],
+            [
+                ("app_certificates[0]", b"\x0a\x0b", EVENT_LOG),
+                ("app_certificates[1]", b"", EVENT_LOG),
+            ],
+        )
+
+    def test_malformed_files(self):
+        for content in (
+            "",
+            "not json",
+            "{}",
+            '{"quote": 12}',
+            '{"quote": "abc"}',
+            '{"quote": "zz"}',
+            '{"quote": ["ab"]}',
+            '{"quote": "ab", "event_log": "[1"',
+        ):
+            with self.subTest(content=content):
+                with self.assertRaises(ValueError):
+                    load_bundle(self.write(content))
+
+
+class DecodeHexIntoTest(unittest.TestCase):
+    def test_chunked_decoding(self):
+        data = bytes(range(256)) * 3
+        text = b'"' + data.hex().encode() + b'"'
+        for chunk_size in (1, 7, 64 * 1024):
+            with mock.patch.object(bundle, "HEX_CHUNK_SIZE", chunk_size):
+                self.assertEqual(bytes(decode_hex_into(text, 1, len(text) - 1)), data)
+
+    def test_output_buffer(self):
+        out = bytearray(2)
+        self.assertIs(decode_hex_into(b"abcd", 0, 4, out), out)
+        self.assertEqual(out, b"\xab\xcd")
+        with self.assertRaises(ValueError):
+            decode_hex_into(b"abcd", 0, 4, bytearray(3))
+
+    def test_invalid_hex(self):
+        for text in (b"abc", b"zz", b"a b "):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    decode_hex_into(text, 0, len(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
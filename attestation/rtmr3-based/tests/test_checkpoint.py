@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Tests of incremental RTMR replay from checkpoints.
+# Run from the rtmr3-based directory: python3 -m unittest discover -s tests
+
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+from bench_eventlog import synthetic_event_log  # noqa: E402
+from checkpoint import Checkpoint  # noqa: E402
+from eventlog import JsonArrayReader, json_array_end  # noqa: E402
+from verify import DstackTdxQuote  # noqa: E402
+
+INFO = ("app_id", "compose_hash", "instance_id", "key_provider")
+
+
+def load_report_events() -> list:
+    with open(os.path.join(HERE, "report.json")) as f:
+        return json.loads(json.load(f)["event_log"])
+
+
+def replayed_quote(event_log, checkpoint=None) -> DstackTdxQuote:
+    quote = DstackTdxQuote(b"", event_log, checkpoint)
+    # Stands in for dcap-qvl: the quote's RTMR3 is the replayed one
+    quote.verified_quote = {"report": {"TD10": {"rt_mr3": quote.replay_rtmrs()[3]}}}
+    return quote
+
+
+def info(quote: DstackTdxQuote) -> dict:
+    return {name: getattr(quote, name, None) for name in INFO}
+
+
+class IncrementalReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.events = load_report_events()
+
+    def assert_incremental_matches_full(self, events, split, dumps, stream=False):
+        prefix_log = dumps(events[:split])
+        full_log = dumps(events)
+        self.assertTrue(full_log.startswith(prefix_log[:json_array_end(prefix_log)]))
+        wrap = io.StringIO if stream else str
+
+        checkpoint = replayed_quote(wrap(prefix_log)).checkpoint()
+        self.assertEqual(checkpoint.event_count, split)
+        incremental = replayed_quote(wrap(full_log), checkpoint)
+        full = replayed_quote(full_log)
+        self.assertEqual(incremental.replay_rtmrs(), full.replay_rtmrs())
+        self.assertEqual(incremental.replayer.counts, full.replayer.counts)
+        self.assertEqual(info(incremental), info(full))
+        self.assertEqual(incremental.event_log_offset, json_array_end(full_log))
+
+    def test_incremental_replay_matches_full_replay(self):
+        for dumps in (json.dumps, lambda events: json.dumps(events, indent=2)):
+            for stream in (False, True):
+                for split in (0, 1, 20, 23, 27, 28):
+                    with self.subTest(split=split, stream=stream):
+                        self.assert_incremental_matches_full(
+                            self.events, split, dumps, stream
+                        )
+
+    def test_chained_checkpoints(self):
+        events = json.loads(synthetic_event_log(100, 16))
+        full = replayed_quote(json.dumps(events))
+        checkpoint = None
+        for split in (10, 40, 41, 100):
+            quote = replayed_quote(json.dumps(events[:split]), checkpoint)
+            checkpoint = quote.checkpoint()
+        self.assertEqual(quote.replay_rtmrs(), full.replay_rtmrs())
+        self.assertEqual(checkpoint.event_count, 100)
+
+    def test_checkpointed_events_are_not_decoded(self):
+        prefix_log = json.dumps(self.events[:25])
+        checkpoint = replayed_quote(prefix_log).checkpoint()
+        full_log = json.dumps(self.events)
+        garbage = "x" * checkpoint.offset + full_log[checkpoint.offset:]
+        for event_log in (garbage, io.StringIO(garbage)):
+            quote = replayed_quote(event_log, checkpoint)
+            expected = replayed_quote(full_log).replay_rtmrs()
+            self.assertEqual(quote.replay_rtmrs(), expected)
+
+    def test_save_and_load(self):
+        checkpoint = replayed_quote(json.dumps(self.events[:24])).checkpoint()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "checkpoint.json")
+            self.assertIsNone(Checkpoint.load(path))
+            checkpoint.save(path)
+            loaded = Checkpoint.load(path)
+        self.assertEqual(loaded.rtmrs, checkpoint.rtmrs)
+        self.assertEqual(loaded.counts, checkpoint.counts)
+        self.assertEqual(loaded.info, checkpoint.info)
+        self.assertEqual(loaded.offset, checkpoint.offset)
+        full_log = json.dumps(self.events)
+        quote = replayed_quote(full_log, loaded)
+        self.assertEqual(quote.replay_rtmrs(), replayed_quote(full_log).replay_rtmrs())
+
+    def test_event_log_shorter_than_the_checkpoint(self):
+        checkpoint = replayed_quote(json.dumps(self.events)).checkpoint()
+        short_log = json.dumps(self.events[:10])
+        for event_log in (short_log, io.StringIO(short_log)):
+            with self.assertRaises(ValueError):
+                replayed_quote(event_log, checkpoint)
+
+    def test_misaligned_offset(self):
+        checkpoint = replayed_quote(json.dumps(self.events[:5])).checkpoint()
+        # The same events serialized differently do not line up with the offset
+        with self.assertRaises(ValueError):
+            replayed_quote(json.dumps(self.events, indent=2), checkpoint)
+
+
+class JsonArrayReaderOffsetTest(unittest.TestCase):
+    def test_offset_tracks_the_last_element(self):
+        document = '[ 1, {"a": [2]} ,"x" ]  '
+        for source in (document, io.StringIO(document)):
+            reader = JsonArrayReader(source, chunk_size=3)
+            offsets = []
+            for _ in reader:
+                offsets.append(reader.offset)
+            self.assertEqual(offsets, [3, 15, 20])
+        self.assertEqual(json_array_end(document), 20)
+
+    def test_resume_at_offset(self):
+        document = '[ 1, {"a": [2]} ,"x" ]  '
+        for offset, expected in ((3, [{"a": [2]}, "x"]), (15, ["x"]), (20, [])):
+            for source in (document, io.StringIO(document)):
+                reader = JsonArrayReader(source, chunk_size=4, offset=offset)
+                self.assertEqual(list(reader), expected)
+
+    def test_empty_array(self):
+        self.assertEqual(json_array_end(" [ ]\n"), 0)
+        reader = JsonArrayReader("[]")
+        self.assertEqual(list(reader), [])
+        self.assertEqual(reader.offset, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+# Tests of the streaming event log parser and the RTMR replayer.
+# Run from the rtmr3-based directory: python3 -m unittest discover -s tests
+
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+import eventlog  # noqa: E402
+from bench_eventlog import legacy_replay, synthetic_event_log  # noqa: E402
+from eventlog import Event, RtmrReplayer, iter_event_dicts, iter_json_array  # noqa: E402
+
+
+def load_report_event_log() -> str:
+    with open(os.path.join(HERE, "report.json")) as f:
+        return json.load(f)["event_log"]
+
+
+def replay(events) -> dict:
+    replayer = RtmrReplayer()
+    for _ in replayer.extend_all(events):
+        pass
+    return replayer.rtmrs()
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    DOCUMENTS = [
+        "[]",
+        " [ ] \n",
+        '[1, "two", {"three": [3, "]", ","]}, null, true, 1.5e3]',
+        '[\n  {"a": "\\"]\\\\"},\n  [[], {}]\n]\n',
+    ]
+
+    def test_string_and_stream_match_json_loads(self):
+        for document in self.DOCUMENTS:
+            expected = json.loads(document)
+            self.assertEqual(list(iter_json_array(document)), expected)
+            for chunk_size in (1, 2, 5, 64 * 1024):
+                stream = io.StringIO(document)
+                self.assertEqual(list(iter_json_array(stream, chunk_size)), expected)
+
+    def test_values_split_across_chunks(self):
+        document = json.dumps([{"digest": "ab" * 48}, 12345678, "x" * 100])
+        for chunk_size in (1, 3, 7, 16):
+            result = list(iter_json_array(io.StringIO(document), chunk_size))
+            self.assertEqual(result, json.loads(document))
+
+    def test_malformed(self):
+        for document in (
+            "",
+            "{}",
+            '"events"',
+            "[1 2]",
+            "[1,,2]",
+            "[,1]",
+            "[1,]",
+            "[1] x",
+            "[1]]",
+            "[1, 2",
+            '[{"imr": 0',
+            '["unterminated',
+        ):
+            with self.subTest(document=document):
+                with self.assertRaises(ValueError):
+                    list(iter_json_array(document))
+                with self.assertRaises(ValueError):
+                    list(iter_json_array(io.StringIO(document), 2))
+
+    def test_events_are_yielded_before_the_end_of_the_stream(self):
+        events = iter_json_array(io.StringIO('[{"imr": 0}, {"imr": 1}, oops'), 4)
+        self.assertEqual(next(events), {"imr": 0})
+        self.assertEqual(next(events), {"imr": 1})
+        with self.assertRaises(ValueError):
+            next(events)
+
+
+class ReplayTest(unittest.TestCase):
+    def test_report_matches_legacy_replay(self):
+        event_log = load_report_event_log()
+        expected = legacy_replay(event_log)
+        self.assertEqual(replay(iter_event_dicts(event_log)), expected)
+        self.assertEqual(replay(iter_event_dicts(io.StringIO(event_log))), expected)
+        self.assertEqual(replay(iter_json_array(io.StringIO(event_log), 16)), expected)
+        # Long strings are scanned event by event instead of with json.loads
+        with mock.patch.object(eventlog, "JSON_LOADS_LIMIT", 0):
+            self.assertEqual(replay(iter_event_dicts(event_log)), expected)
+
+    def test_synthetic_log_matches_legacy_replay(self):
+        event_log = synthetic_event_log(200, 64)
+        expected = legacy_replay(event_log)
+        self.assertEqual(replay(iter_event_dicts(event_log)), expected)
+        self.assertEqual(replay(iter_event_dicts(io.StringIO(event_log))), expected)
+
+    def test_extend_matches_extend_all(self):
+        event_log = load_report_event_log()
+        replayer = RtmrReplayer()
+        for event in eventlog.iter_events(event_log):
+            replayer.extend(event)
+        self.assertEqual(replayer.rtmrs(), legacy_replay(event_log))
+        self.assertEqual(sum(replayer.counts), len(json.loads(event_log)))
+
+    def test_kept_events(self):
+        event_log = load_report_event_log()
+        kept = list(RtmrReplayer().extend_all(iter_event_dicts(event_log), {"compose-hash"}))
+        expected = [e for e in json.loads(event_log) if e.get("event") == "compose-hash"]
+        self.assertEqual(len(kept), len(expected))
+        for event, data in zip(kept, expected):
+            self.assertIsInstance(event, Event)
+            self.assertEqual(event.event_payload.hex(), data["event_payload"])
+
+
+class MalformedEventTest(unittest.TestCase):
+    def runtime_event(self, **fields) -> dict:
+        data = json.loads(synthetic_event_log(9, 8))[8]
+        data.update(fields)
+        return data
+
+    def assert_rejected(self, data):
+        with self.assertRaises(ValueError):
+            replay([data])
+        with self.assertRaises(ValueError):
+            replay(iter_event_dicts(io.StringIO(json.dumps([data]))))
+
+    def test_valid_runtime_event(self):
+        data = self.runtime_event()
+        self.assertEqual(replay([data]), legacy_replay(json.dumps([data])))
+        self.assertTrue(Event.from_dict(data).is_valid())
+
+    def test_event_is_not_an_object(self):
+        for data in ("event", 3, None, [1, 2]):
+            with self.subTest(data=data):
+                self.assert_rejected(data)
+                with self.assertRaises(ValueError):
+                    Event.from_dict(data)
+
+    def test_fields_of_the_wrong_type(self):
+        for fields in (
+            {"digest": None},
+            {"digest": 12},
+            {"event_type": "1"},
+            {"event_type": None},
+            {"event_type": True},
+            {"event": 5},
+            {"event": ["compose-hash"]},
+            {"event_payload": None},
+        ):
+            for imr in (0, 3):
+                data = self.runtime_event(imr=imr, **fields)
+                with self.subTest(fields=fields, imr=imr):
+                    self.assert_rejected(data)
+                    with self.assertRaises(ValueError):
+                        Event.from_dict(data)
+
+    def test_invalid_values(self):
+        for fields in (
+            {"imr": 4},
+            {"imr": -1},
+            {"imr": "3"},
+            {"imr": None},
+            {"digest": "zz"},
+            {"event_payload": "0"},
+            {"digest": "00" * 48},
+        ):
+            with self.subTest(fields=fields):
+                self.assert_rejected(self.runtime_event(**fields))
+
+    def test_missing_optional_fields(self):
+        data = {"imr": 0, "digest": "11" * 48}
+        self.assertEqual(replay([data]), legacy_replay(json.dumps([data])))
+
+
+if __name__ == "__main__":
+    unittest.main()
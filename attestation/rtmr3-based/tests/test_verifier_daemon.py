@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Tests of the verification daemon's verdict caching and startup checks.
+# Run from the rtmr3-based directory: python3 -m unittest discover -s tests
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+import verifier_daemon  # noqa: E402
+from policy import CompiledPolicy  # noqa: E402
+from verifier_daemon import InvalidInput, Verifier  # noqa: E402
+from verify import DstackTdxQuote  # noqa: E402
+
+OS_MR = "cd" * 48
+OS_MEASUREMENTS = {"mrtd": OS_MR, "rtmr0": OS_MR, "rtmr1": OS_MR, "rtmr2": OS_MR}
+
+
+def load_fixtures() -> tuple[str, str]:
+    with open(os.path.join(HERE, "report.json")) as f:
+        event_log = json.load(f)["event_log"]
+    with open(os.path.join(HERE, "app-compose.json")) as f:
+        app_compose = f.read()
+    return event_log, app_compose
+
+
+class FakeDcapQvl:
+    """Stands in for DstackTdxQuote.verify(): fails until told to succeed."""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+
+    def __call__(self, quote):
+        self.calls += 1
+        if self.failing:
+            raise ValueError("dcap-qvl verify failed with return code 1")
+        report = {
+            "mr_td": OS_MR,
+            "rt_mr0": OS_MR,
+            "rt_mr1": OS_MR,
+            "rt_mr2": OS_MR,
+            "rt_mr3": quote.replay_rtmrs()[3],
+        }
+        quote.verified_quote = {"status": "UpToDate", "report": {"TD10": report}}
+
+
+class VerifierTest(unittest.TestCase):
+    def setUp(self):
+        self.event_log, self.app_compose = load_fixtures()
+        self.dcap_qvl = FakeDcapQvl()
+        # A function, unlike the FakeDcapQvl instance, is bound to the quote
+        patcher = mock.patch.object(
+            DstackTdxQuote, "verify", lambda quote: self.dcap_qvl(quote)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        policy = CompiledPolicy({"os_measurements": [OS_MEASUREMENTS]})
+        self.verifier = Verifier(2, 3600, policy)
+
+    def verify(self, quote_hex="00" * 64, event_log=None):
+        event_log = event_log or self.event_log
+        return self.verifier.verify(quote_hex, event_log, self.app_compose)
+
+    def test_verdicts_are_cached(self):
+        verdict = self.verify()
+        self.assertTrue(verdict["verified"], verdict["errors"])
+        self.assertFalse(verdict["cached"])
+        verdict = self.verify()
+        self.assertTrue(verdict["verified"])
+        self.assertTrue(verdict["cached"])
+        self.assertEqual(self.dcap_qvl.calls, 1)
+
+    def test_dcap_qvl_failures_are_not_cached(self):
+        self.dcap_qvl.failing = True
+        verdict = self.verify()
+        self.assertFalse(verdict["verified"])
+        self.assertIn("dcap-qvl", verdict["errors"][0])
+        self.dcap_qvl.failing = False
+        verdict = self.verify()
+        self.assertTrue(verdict["verified"], verdict["errors"])
+        self.assertFalse(verdict["cached"])
+        self.assertEqual(self.dcap_qvl.calls, 2)
+
+    def test_failed_checks_are_cached(self):
+        verdict = self.verifier.verify("00" * 64, self.event_log, "{}")
+        self.assertFalse(verdict["verified"])
+        verdict = self.verifier.verify("00" * 64, self.event_log, "{}")
+        self.assertTrue(verdict["cached"])
+        self.assertEqual(self.dcap_qvl.calls, 1)
+
+    def test_malformed_input(self):
+        for quote_hex, event_log in (
+            ("zz", self.event_log),
+            ("00", '["event"]'),
+            ("00", '[{"imr": 3, "digest": null}]'),
+            ("00", '[{"imr": 3, "event_type": "1"}]'),
+            ("00", "{}"),
+        ):
+            with self.subTest(event_log=event_log):
+                with self.assertRaises(InvalidInput):
+                    self.verify(quote_hex, event_log)
+
+
+class MainTest(unittest.TestCase):
+    def run_main(self, *args):
+        argv = ["verifier_daemon.py", *args]
+        stderr = io.StringIO()
+        with mock.patch.object(sys, "argv", argv), contextlib.redirect_stderr(stderr):
+            with self.assertRaises(SystemExit):
+                verifier_daemon.main()
+        return stderr.getvalue()
+
+    def test_os_allowlist_is_required(self):
+        self.assertIn("--policy or --measurement-index", self.run_main())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "policy.json")
+            with open(path, "w") as f:
+                json.dump({"compose_hashes": ["00" * 32]}, f)
+            self.assertIn("no OS allowlist", self.run_main("--policy", path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Per-stage timing and optional cProfile output for the attestation verifiers.
+
+Wall time and CPU time of the calling thread are recorded for every stage
+(dcap-qvl, dstack-mr, event log parsing and replay, ...) and emitted as JSON,
+so verification latency can be tracked on dashboards and regressions caught.
+"""
+
+import contextlib
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from typing import Callable, Dict, Any, Iterator, Optional
+
+
+class StageTimer:
+    stages: list[Dict[str, Any]]
+    profiles: Optional[list[cProfile.Profile]]
+
+    def __init__(self, profile: bool = False):
+        """
+        Initialize an empty StageTimer. With profile, every stage is also run under
+        its own cProfile profiler, so stages running in different threads are
+        profiled too (see dump_profile()).
+        """
+        self.stages = []
+        self.profiles = [] if profile else None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, cpu: bool = True) -> Iterator[None]:
+        """
+        Time a stage. CPU time is measured for the current thread, so it should be
+        disabled for stages that await, where other tasks share the thread.
+        """
+        profiler = cProfile.Profile() if self.profiles is not None else None
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            record = {
+                "stage": name,
+                "wall_ms": round((time.perf_counter() - wall_start) * 1000, 3),
+                "cpu_ms": round((time.thread_time() - cpu_start) * 1000, 3) if cpu else None,
+            }
+            with self._lock:
+                self.stages.append(record)
+                if profiler:
+                    self.profiles.append(profiler)
+
+    def run(self, name: str, func: Callable, *args) -> Any:
+        """
+        Call func(*args) as a stage and return its result.
+        """
+        with self.stage(name):
+            return func(*args)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = list(self.stages)
+        return {
+            "stages": stages,
+            "total_wall_ms": round((time.perf_counter() - self.started) * 1000, 3),
+        }
+
+    def write(self, path: str):
+        """
+        Write the timings as JSON to a file, or to stderr if path is "-".
+        """
+        data = json.dumps(self.report(), indent=2)
+        if path == "-":
+            print(data, file=sys.stderr)
+        else:
+            with open(path, "w") as f:
+                f.write(data + "\n")
+
+    def dump_profile(self, path: str):
+        """
+        Merge the stage profiles and dump them in pstats format.
+        Does nothing unless the timer was created with profile.
+        """
+        with self._lock:
+            profiles = list(self.profiles or ())
+        if profiles:
+            pstats.Stats(*profiles).dump_stats(path)
+
+
+@contextlib.contextmanager
+def profiled(path: Optional[str]) -> Iterator[None]:
+    """
+    Run the enclosed block under cProfile and dump the stats to path.
+    Does nothing if path is None.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,235 @@
+"""
+Long-running attestation verification daemon.
+
+Wraps DstackTdxQuote in an HTTP service so that verifications do not pay for
+interpreter startup, index loading and repeated dcap-qvl runs. Verified quotes
+and final verdicts are kept in in-memory TTL caches (except verdicts of failed
+dcap-qvl runs), and the number of concurrent verifications is bounded by a
+worker pool.
+
+Run:
+    python verifier_daemon.py --port 8080 --policy policy.json
+
+Request:
+    POST /verify
+    {"quote": "<hex>", "event_log": "<json string>", "app_compose": "<app-compose.json contents>"}
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+from policy import CompiledPolicy
+from verify import DstackTdxQuote, sha256_hex
+
+
+class InvalidInput(ValueError):
+    """
+    The request cannot be verified because the quote or event log is malformed.
+    """
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed time.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class Verifier:
+    """
+    Verification logic shared by all requests, with warm caches.
+    """
+
+    def __init__(self, workers: int, cache_ttl: float, policy: CompiledPolicy):
+        self.policy = policy
+        self.quotes = TTLCache(cache_ttl)
+        self.verdicts = TTLCache(cache_ttl)
+        self.pool = threading.BoundedSemaphore(workers)
+
+    def verified_quote(self, quote: DstackTdxQuote) -> Dict[str, Any]:
+        """
+        Get the dcap-qvl result for a quote, running dcap-qvl only on a cache miss.
+        """
+        key = hashlib.sha256(quote.quote).digest()
+        result = self.quotes.get(key)
+        if result is None:
+            quote.verify()
+            result = quote.verified_quote
+            self.quotes.put(key, result)
+        quote.verified_quote = result
+        return result
+
+    def verify(self, quote_hex: str, event_log: str, app_compose: str) -> Dict[str, Any]:
+        """
+        Verify a quote, its event log and the expected app compose.
+        Returns a verdict dictionary; "verified" is True only if every check passed.
+        Raises InvalidInput if the quote or event log is malformed.
+        """
+        hasher = hashlib.sha256()
+        for part in (quote_hex, event_log, app_compose):
+            hasher.update(part.encode())
+            hasher.update(b"\0")
+        key = hasher.digest()
+        verdict = self.verdicts.get(key)
+        if verdict is not None:
+            return dict(verdict, cached=True)
+
+        with self.pool:
+            verdict, cacheable = self._verify(quote_hex, event_log, app_compose)
+        if cacheable:
+            self.verdicts.put(key, verdict)
+        return dict(verdict, cached=False)
+
+    def _verify(self, quote_hex: str, event_log: str, app_compose: str) -> tuple[Dict[str, Any], bool]:
+        """
+        Verify a request. Returns the verdict and whether it may be cached: a
+        verdict that failed because dcap-qvl could not run must not outlive the
+        failure.
+        """
+        errors = []
+        verdict: Dict[str, Any] = {"verified": False, "errors": errors}
+
+        try:
+            quote_bytes = bytes.fromhex(quote_hex)
+        except ValueError as e:
+            raise InvalidInput(f"Invalid quote: {e}")
+        try:
+            quote = DstackTdxQuote(quote_bytes, event_log)
+        except ValueError as e:
+            raise InvalidInput(f"Invalid event log: {e}")
+        verdict.update({
+            "app_id": getattr(quote, "app_id", None),
+            "compose_hash": getattr(quote, "compose_hash", None),
+            "instance_id": getattr(quote, "instance_id", None),
+            "key_provider": getattr(quote, "key_provider", None),
+        })
+
+        try:
+            result = self.verified_quote(quote)
+        except ValueError as e:
+            errors.append(str(e))
+            return verdict, False
+        try:
+            mrs = quote.mrs()
+        except ValueError as e:
+            raise InvalidInput(f"Invalid quote: {e}")
+        verdict["tcb_status"] = result["status"]
+        verdict["advisory_ids"] = result.get("advisory_ids", [])
+        verdict["os_image"] = self.policy.match_os(mrs)
+        errors.extend(self.policy.evaluate(quote))
+
+        if quote.replay_rtmrs()[3] != mrs["rt_mr3"]:
+            errors.append("RTMR3 does not match the replayed event log")
+
+        if verdict["compose_hash"] != sha256_hex(app_compose):
+            errors.append("Compose hash does not match the expected app compose")
+
+        verdict["verified"] = not errors
+        return verdict, True
+
+
+class VerifierHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    verifier: Verifier
+
+    def do_POST(self):
+        if self.path != "/verify":
+            self.send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            request = json.loads(self.rfile.read(length))
+            quote_hex = request["quote"]
+            event_log = request["event_log"]
+            app_compose = request["app_compose"]
+            if not isinstance(event_log, str):
+                event_log = json.dumps(event_log)
+            if not isinstance(quote_hex, str) or not isinstance(app_compose, str):
+                raise TypeError("quote and app_compose must be strings")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        try:
+            verdict = self.verifier.verify(quote_hex, event_log, app_compose)
+        except InvalidInput as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, verdict)
+
+    def send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dstack attestation verification daemon")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum concurrent verifications")
+    parser.add_argument("--cache-ttl", type=float, default=3600, help="Seconds to cache quote results and verdicts")
+    parser.add_argument("--policy", help="Attestation policy file (see policy.py); must have an OS allowlist")
+    parser.add_argument("--measurement-index", help="Known-good measurement index for OS verification, "
+                                                    "used when no policy is given")
+    args = parser.parse_args()
+    # Without either, any OS measurement would be accepted
+    if not args.policy and not args.measurement_index:
+        parser.error("--policy or --measurement-index is required")
+
+    if args.policy:
+        policy = CompiledPolicy.load(args.policy)
+        if not policy.has_os_allowlist():
+            parser.error(f"{args.policy} has no OS allowlist; add a measurement_index or os_measurements")
+    else:
+        policy = CompiledPolicy({"measurement_index": args.measurement_index})
+    VerifierHandler.verifier = Verifier(args.workers, args.cache_ttl, policy)
+
+    server = ThreadingHTTPServer((args.host, args.port), VerifierHandler)
+    print(f"Verifier listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,34 @@ Dependencies:
 - dcap-qvl: Phala's TDX/SGX Quote Verification tool (install with `cargo install dcap-qvl-cli`)
 - dstack-mr: Tool for calculating expected measurement values for Dstack Base Images, install with `go install github.com/kvinwang/dstack-mr@latest`
 
-Example usage is provided in the __main__ section.
+Example usage is provided in main().
 """
 
+import argparse
+import asyncio
+import contextlib
 import hashlib
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional, TextIO, Union
 import tempfile
 import subprocess
 import os
+import weakref
+
+from bundle import load_bundle
+from checkpoint import Checkpoint
+from eventlog import Event, JsonArrayReader, RtmrReplayer, extend_mr, iter_event_dicts, json_array_end
+from measurement_index import MeasurementIndex
+from policy import CompiledPolicy
+from timing import StageTimer, profiled
+
+# Maximum number of dcap-qvl processes run concurrently by averify() per event loop
+MAX_CONCURRENT_VERIFICATIONS = int(os.environ.get("DCAP_QVL_CONCURRENCY", "16"))
+
+_verify_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+# Events carrying the app information extracted by DstackTdxQuote
+INFO_EVENTS = frozenset({'app-id', 'compose-hash', 'instance-id', 'key-provider'})
 
 INIT_MR = "000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000"
 
@@ -22,52 +41,113 @@ def replay_rtmr(history: list[str]):
     """
     Replay the RTMR history to calculate the final RTMR value.
     """
-    if len(history) == 0:
-        return INIT_MR
     mr = bytes.fromhex(INIT_MR)
     for content in history:
-        # mr = sha384(concat(mr, content))
-        # if content is shorter than 48 bytes, pad it with zeros
-        content = bytes.fromhex(content)
-        if len(content) < 48:
-            content = content.ljust(48, b'\0')
-        mr = hashlib.sha384(mr + content).digest()
+        mr = extend_mr(mr, bytes.fromhex(content))
     return mr.hex()
 
 
+@contextlib.contextmanager
+def quote_file(quote: bytes) -> Iterator[tuple[str, tuple[int, ...]]]:
+    """
+    Provide the quote to a child process as a file path without touching the disk.
+
+    On Linux the quote is written to an anonymous memfd that the child opens via
+    /dev/fd; yields the path and the file descriptors to pass to the child.
+    Elsewhere it falls back to a temporary file.
+    """
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("quote")
+        try:
+            with open(fd, "wb", closefd=False) as f:
+                f.write(quote)
+            yield f"/dev/fd/{fd}", (fd,)
+        finally:
+            os.close(fd)
+    else:
+        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+            temp_file.write(quote)
+            temp_path = temp_file.name
+        try:
+            yield temp_path, ()
+        finally:
+            os.unlink(temp_path)
+
+
+def _verify_semaphore() -> asyncio.Semaphore:
+    """
+    Get the semaphore limiting concurrent dcap-qvl runs on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _verify_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_VERIFICATIONS)
+        _verify_semaphores[loop] = semaphore
+    return semaphore
+
+
 class DstackTdxQuote:
-    quote: str
-    event_log: str
+    quote: bytes
     verified_quote: Dict[str, Any]
-    parsed_event_log: list[Dict[str, Any]]
+    replayer: RtmrReplayer
+    event_log_offset: int
+    timer: StageTimer
     app_id: str
     compose_hash: str
     instance_id: str
     key_provider: str
 
-    def __init__(self, quote: str, event_log: str):
-        """
-        Initialize the DstackTdxQuote object.
-        """
-        self.quote = bytes.fromhex(quote)
-        self.event_log = event_log
-        self.parsed_event_log = json.loads(self.event_log)
-        self.extract_info_from_event_log()
-    
-    def extract_info_from_event_log(self):
-        """
-        Extract the app ID, compose hash, instance ID, and key provider from the event log.
-        """
-        for event in self.parsed_event_log:
-            if event.get('event') == 'app-id':
-                self.app_id = event.get('event_payload', '')
-            elif event.get('event') == 'compose-hash':
-                self.compose_hash = event.get('event_payload', '')
-            elif event.get('event') == 'instance-id':
-                self.instance_id = event.get('event_payload', '')
-            elif event.get('event') == 'key-provider':
-                self.key_provider = bytes.fromhex(event.get('event_payload', '')).decode('utf-8')
-    
+    def __init__(self, quote: Union[str, bytes, bytearray], event_log: Union[str, TextIO],
+                 checkpoint: Optional[Checkpoint] = None, timer: Optional[StageTimer] = None):
+        """
+        Initialize the DstackTdxQuote object from a hex or already decoded quote.
+
+        The event log can be a JSON string or a text stream. Events are validated
+        and folded into the RTMRs in a single pass; streams (and very long
+        strings) are parsed incrementally, so their events are not kept in memory.
+
+        If a checkpoint from a previous verification of the same CVM is given,
+        decoding starts at the checkpointed event log offset, so the events it
+        covers are neither parsed nor hashed, and replay resumes from the
+        checkpointed RTMR values.
+
+        Stage timings are recorded in the given timer, or in a new one.
+        """
+        self.timer = timer if timer is not None else StageTimer()
+        self.quote = bytes.fromhex(quote) if isinstance(quote, str) else quote
+        if checkpoint is None:
+            self.replayer = RtmrReplayer()
+            offset = 0
+        else:
+            self.replayer = checkpoint.replayer()
+            for name, value in checkpoint.info.items():
+                setattr(self, name, value)
+            offset = checkpoint.offset
+        # The offset reached in a stream is only known to the reader
+        reader = None
+        if isinstance(event_log, str) and not offset:
+            events = iter_event_dicts(event_log)
+        else:
+            reader = JsonArrayReader(event_log, offset=offset)
+            events = iter(reader)
+        with self.timer.stage("event_log_replay"):
+            for event in self.replayer.extend_all(events, INFO_EVENTS):
+                self.extract_info_from_event(event)
+        self.event_log_offset = reader.offset if reader else json_array_end(event_log)
+
+    def extract_info_from_event(self, event: Event):
+        """
+        Extract the app ID, compose hash, instance ID, and key provider from an event.
+        """
+        if event.event == 'app-id':
+            self.app_id = event.event_payload.hex()
+        elif event.event == 'compose-hash':
+            self.compose_hash = event.event_payload.hex()
+        elif event.event == 'instance-id':
+            self.instance_id = event.event_payload.hex()
+        elif event.event == 'key-provider':
+            self.key_provider = event.event_payload.decode('utf-8')
+
     def mrs(self) -> Dict[str, str]:
         """
         Get the MRs from the verified quote.
@@ -80,68 +160,93 @@ class DstackTdxQuote:
         else:
             raise ValueError("No TD10 or TD15 report found in the quote")
 
+    def match_measurement_index(self, index: MeasurementIndex) -> Optional[Dict[str, Any]]:
+        """
+        Check the verified MRTD and RTMR0-2 against a known-good measurement index.
+        Returns the matching image/size entry, or None if the OS measurements are unknown.
+        """
+        return index.lookup(self.mrs())
+
     def verify(self):
         """
         Verify the TDX quote using dcap-qvl command.
         Returns True if verification succeeds, False otherwise.
         """
 
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(self.quote)
-            temp_path = temp_file.name
-
-        try:
+        with self.timer.stage("dcap_qvl"), quote_file(self.quote) as (quote_path, pass_fds):
             result = subprocess.run(
-                ["dcap-qvl", "verify", temp_path],
+                ["dcap-qvl", "verify", quote_path],
                 capture_output=True,
-                text=True
+                text=True,
+                pass_fds=pass_fds
             )
-            if result.returncode != 0:
-                raise ValueError(f"dcap-qvl verify failed with return code {result.returncode}")
-            self.verified_quote = json.loads(result.stdout)
-        finally:
-            os.unlink(temp_path)
+        if result.returncode != 0:
+            raise ValueError(f"dcap-qvl verify failed with return code {result.returncode}")
+        self.verified_quote = json.loads(result.stdout)
+
+    async def averify(self):
+        """
+        Verify the TDX quote using dcap-qvl without blocking the event loop.
+        At most MAX_CONCURRENT_VERIFICATIONS dcap-qvl processes run at once.
+        """
+        async with _verify_semaphore():
+            with self.timer.stage("dcap_qvl", cpu=False), quote_file(self.quote) as (quote_path, pass_fds):
+                process = await asyncio.create_subprocess_exec(
+                    "dcap-qvl", "verify", quote_path,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    pass_fds=pass_fds
+                )
+                stdout, _ = await process.communicate()
+
+        if process.returncode != 0:
+            raise ValueError(f"dcap-qvl verify failed with return code {process.returncode}")
+        self.verified_quote = json.loads(stdout)
+
+    @classmethod
+    async def acreate(cls, quote: Union[str, bytes, bytearray], event_log: Union[str, TextIO],
+                      checkpoint: Optional[Checkpoint] = None,
+                      timer: Optional[StageTimer] = None) -> "DstackTdxQuote":
+        """
+        Create a DstackTdxQuote in the default thread pool executor, so that event
+        log parsing and RTMR hashing do not block the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, cls, quote, event_log, checkpoint, timer)
+
+    async def areplay_rtmrs(self) -> Dict[int, str]:
+        """
+        Async counterpart of replay_rtmrs(), run in a worker thread so that it does
+        not block the event loop.
+        """
+        return await asyncio.to_thread(self.replay_rtmrs)
 
     def validate_event(self, event: Dict[str, Any]) -> bool:
         """
         Validate an event's digest according to the Rust implementation.
         Returns True if the event is valid, False otherwise.
         """
-        # Skip validation for non-IMR3 events for now
-        if event.get('imr') != 3:
-            return True
-            
-        # Calculate digest using sha384(type:event:payload)
-        event_type = event.get('event_type', 0)
-        event_name = event.get('event', '')
-        event_payload = bytes.fromhex(event.get('event_payload', ''))
-        
-        if isinstance(event_payload, str):
-            event_payload = event_payload.encode()
-            
-        hasher = hashlib.sha384()
-        hasher.update(event_type.to_bytes(4, byteorder='little'))
-        hasher.update(b':')
-        hasher.update(event_name.encode())
-        hasher.update(b':')
-        hasher.update(event_payload)
-        
-        calculated_digest = hasher.digest().hex()
-        return calculated_digest == event.get('digest')
+        return Event.from_dict(event).is_valid()
+
+    def checkpoint(self) -> Checkpoint:
+        """
+        Create a checkpoint of the replayed RTMRs for incremental re-attestation.
+        Only allowed once the quote is verified and its RTMR3 matches the replay.
+        """
+        if self.replay_rtmrs()[3] != self.mrs()['rt_mr3']:
+            raise ValueError("Cannot checkpoint: replayed RTMR3 does not match the verified quote")
+        info = {
+            name: getattr(self, name)
+            for name in ('app_id', 'compose_hash', 'instance_id', 'key_provider')
+            if hasattr(self, name)
+        }
+        return Checkpoint(self.replayer.mrs, self.replayer.counts, info, self.event_log_offset)
 
     def replay_rtmrs(self) -> Dict[int, str]:
-        rtmrs = {}
-        for idx in range(4):
-            history = []
-            for event in self.parsed_event_log:
-                if event.get('imr') == idx:
-                    # Only add digest to history if event is valid
-                    if self.validate_event(event):
-                        history.append(event['digest'])
-                    else:
-                        raise ValueError(f"Invalid event digest found in IMR {idx}")
-            rtmrs[idx] = replay_rtmr(history)
-        return rtmrs
+        """
+        Get the RTMR values replayed from the event log.
+        """
+        return self.replayer.rtmrs()
 
 
 def sha256_hex(data: str) -> str:
@@ -151,23 +256,56 @@ def sha256_hex(data: str) -> str:
     return hashlib.sha256(data.encode()).hexdigest()
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Verify a Dstack application report")
+    parser.add_argument("--measurement-index", help="Known-good measurement index (see measurement_index.py) "
+                                                    "to use instead of running dstack-mr")
+    parser.add_argument("--checkpoint", help="RTMR3 checkpoint file; only events appended since the last "
+                                             "verification are replayed, and the file is updated on success")
+    parser.add_argument("--policy", help="Attestation policy file (see policy.py); its OS allowlist replaces the "
+                                         "dstack-mr comparison, which still runs if the policy has none")
+    parser.add_argument("--timings", metavar="PATH", help="Write per-stage wall/CPU timings as JSON ('-' for stderr)")
+    parser.add_argument("--profile", metavar="PATH", help="Write cProfile stats of the whole verification to PATH")
+    args = parser.parse_args()
+
+    timer = StageTimer()
+    with profiled(args.profile):
+        verify_report(args, timer)
+    if args.timings:
+        timer.write(args.timings)
+
+
+def verify_report(args: argparse.Namespace, timer: StageTimer):
+    """
+    Verify report.json against app-compose.json and the expected OS measurements.
+    """
     vcpus = '1'
     memory = '1G'
 
-    print('Pre-calculated RTMRs')
-    result = subprocess.run(
-        ["dstack-mr", "-cpu", vcpus, "-memory", memory, "-json", "-metadata", "images/dstack-dev-0.4.0/metadata.json"],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        raise ValueError(f"dstack-mr failed with return code {result.returncode}: {result.stdout}")
-    expected_mrs = json.loads(result.stdout)
-    print(json.dumps(expected_mrs, indent=2))
-
-    report = json.load(open('report.json'))
-    quote = DstackTdxQuote(report['quote'], report['event_log'])
+    expected_mrs = None
+    policy = None
+    if args.policy:
+        with timer.stage("load_policy"):
+            policy = CompiledPolicy.load(args.policy)
+    # A policy without an OS allowlist would accept any MRTD/RTMR0-2
+    check_os = policy is None or not policy.has_os_allowlist()
+    if check_os and not args.measurement_index:
+        print('Pre-calculated RTMRs')
+        with timer.stage("dstack_mr"):
+            result = subprocess.run(
+                ["dstack-mr", "-cpu", vcpus, "-memory", memory, "-json", "-metadata", "images/dstack-dev-0.4.0/metadata.json"],
+                capture_output=True,
+                text=True
+            )
+        if result.returncode != 0:
+            raise ValueError(f"dstack-mr failed with return code {result.returncode}: {result.stdout}")
+        expected_mrs = json.loads(result.stdout)
+        print(json.dumps(expected_mrs, indent=2))
+
+    with timer.stage("load_report"):
+        _, quote_bytes, event_log = load_bundle('report.json')[0]
+        checkpoint = Checkpoint.load(args.checkpoint) if args.checkpoint else None
+    quote = DstackTdxQuote(quote_bytes, event_log, checkpoint, timer)
     quote.verify()
 
     print("Quote verified")
@@ -184,10 +322,23 @@ if __name__ == "__main__":
     }
     print(json.dumps(show_mrs, indent=2))
 
-    assert verified_mrs['mr_td'] == expected_mrs['mrtd'], f"MRTD mismatch: {verified_mrs['mr_td']} != {expected_mrs['mrtd']}"
-    assert verified_mrs['rt_mr0'] == expected_mrs['rtmr0'], f"RTMR0 mismatch: {verified_mrs['rt_mr0']} != {expected_mrs['rtmr0']}"
-    assert verified_mrs['rt_mr1'] == expected_mrs['rtmr1'], f"RTMR1 mismatch: {verified_mrs['rt_mr1']} != {expected_mrs['rtmr1']}"
-    assert verified_mrs['rt_mr2'] == expected_mrs['rtmr2'], f"RTMR2 mismatch: {verified_mrs['rt_mr2']} != {expected_mrs['rtmr2']}"
+    if policy:
+        with timer.stage("policy"):
+            violations = policy.evaluate(quote)
+        for violation in violations:
+            print(f"Policy violation: {violation}")
+        assert not violations, "Quote does not satisfy the attestation policy"
+        print("Quote satisfies the attestation policy")
+    if check_os and args.measurement_index:
+        with timer.stage("measurement_index"):
+            matched = quote.match_measurement_index(MeasurementIndex.load(args.measurement_index))
+        assert matched is not None, "MRTD/RTMR0-2 not found in measurement index"
+        print(f"OS measurements match {matched['image']} ({matched['vcpus']} vCPU, {matched['memory']})")
+    elif check_os:
+        assert verified_mrs['mr_td'] == expected_mrs['mrtd'], f"MRTD mismatch: {verified_mrs['mr_td']} != {expected_mrs['mrtd']}"
+        assert verified_mrs['rt_mr0'] == expected_mrs['rtmr0'], f"RTMR0 mismatch: {verified_mrs['rt_mr0']} != {expected_mrs['rtmr0']}"
+        assert verified_mrs['rt_mr1'] == expected_mrs['rtmr1'], f"RTMR1 mismatch: {verified_mrs['rt_mr1']} != {expected_mrs['rtmr1']}"
+        assert verified_mrs['rt_mr2'] == expected_mrs['rtmr2'], f"RTMR2 mismatch: {verified_mrs['rt_mr2']} != {expected_mrs['rtmr2']}"
 
     replayed_mrs = quote.replay_rtmrs()
     print("Replay RTMRs")
@@ -195,10 +346,20 @@ if __name__ == "__main__":
 
     assert replayed_mrs[3] == verified_mrs['rt_mr3'], f"RTMR3 mismatch: {replayed_mrs[3]} != {verified_mrs['rt_mr3']}"
 
-    expected_compose_hash = sha256_hex(open('app-compose.json').read())
+    with timer.stage("compose_hash"):
+        expected_compose_hash = sha256_hex(open('app-compose.json').read())
     assert quote.compose_hash == expected_compose_hash, f"Compose hash mismatch: {quote.compose_hash} != {expected_compose_hash}"
 
     print(f"App ID: {quote.app_id}")
     print(f"Compose Hash: {quote.compose_hash}")
     print(f"Instance ID: {quote.instance_id}")
     print(f"Key Provider: {quote.key_provider}")
+
+    # Only a fully verified quote may leave a checkpoint that later runs resume from
+    if args.checkpoint:
+        quote.checkpoint().save(args.checkpoint)
+        print(f"Checkpoint saved after {quote.replayer.counts[3]} RTMR3 events")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,9 @@
 from dns_providers import DNSProviderFactory
 import argparse
 import os
+import re
 import subprocess
 import sys
-import pkg_resources
 from typing import List, Optional, Tuple
 
 # Add script directory to path to import dns_providers
@@ -97,11 +97,15 @@ class CertManager:
             certbot_cmd = self._get_certbot_command()
             print(f"Using certbot: {' '.join(certbot_cmd)}")
 
+            from importlib import metadata
+
             try:
-                dist = pkg_resources.get_distribution(
-                    self.provider.CERTBOT_PACKAGE)
-                print(f"Package version: {dist.version} at {dist.location}")
-            except pkg_resources.DistributionNotFound:
+                package_name = re.split(
+                    r"[<>=!~\[; ]", self.provider.CERTBOT_PACKAGE)[0]
+                dist = metadata.distribution(package_name)
+                print(
+                    f"Package version: {dist.version} at {dist.locate_file('')}")
+            except metadata.PackageNotFoundError:
                 print("Warning: Package not found in current environment")
         except Exception as diag_error:
             print(f"Diagnostic error: {diag_error}")
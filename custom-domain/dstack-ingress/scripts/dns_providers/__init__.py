@@ -1,4 +1,21 @@
-from .base import DNSProvider, DNSRecord, RecordType, CAARecord
+from .base import (
+    DNSProvider,
+    DNSRecord,
+    RecordType,
+    CAARecord,
+    ChangeAction,
+    RecordChange,
+)
 from .factory import DNSProviderFactory
+from .reconcile import DNSReconciler
 
-__all__ = ["DNSProvider", "DNSRecord", "RecordType", "CAARecord", "DNSProviderFactory"]
+__all__ = [
+    "DNSProvider",
+    "DNSRecord",
+    "RecordType",
+    "CAARecord",
+    "ChangeAction",
+    "RecordChange",
+    "DNSProviderFactory",
+    "DNSReconciler",
+]
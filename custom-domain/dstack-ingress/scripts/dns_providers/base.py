@@ -1,12 +1,30 @@
 #!/usr/bin/env python3
 
+import hashlib
+import json
 import os
+import random
+import re
+import sys
+import threading
+import time
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 
+# On-disk zone index cache, shared by all dnsman.py/certman.py invocations
+ZONE_CACHE_DIR = os.environ.get(
+    "DNS_ZONE_CACHE_DIR", os.path.expanduser("~/.cache/dstack-ingress")
+)
+ZONE_CACHE_TTL = int(os.environ.get("DNS_ZONE_CACHE_TTL", "3600"))
+
+# Retries of throttled or failed DNS API requests, and backoff between them in seconds
+HTTP_MAX_RETRIES = int(os.environ.get("DNS_HTTP_MAX_RETRIES", "5"))
+HTTP_BACKOFF_BASE = float(os.environ.get("DNS_HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.environ.get("DNS_HTTP_BACKOFF_MAX", "60"))
+
 
 class RecordType(Enum):
     A = "A"
@@ -45,11 +63,211 @@ class CAARecord:
     ttl: int = 60
 
 
+class ChangeAction(Enum):
+    CREATE = "CREATE"
+    UPSERT = "UPSERT"
+    DELETE = "DELETE"
+
+
+@dataclass
+class RecordChange:
+    """A record change for DNSProvider.apply_changes().
+
+    record_id is the existing record to replace (UPSERT) or remove (DELETE),
+    as returned by get_dns_records().
+    """
+
+    action: ChangeAction
+    record: Union[DNSRecord, CAARecord]
+    record_id: Optional[str] = None
+
+
+class ZoneIndex:
+    """Zones of an account, indexed for longest-suffix lookup.
+
+    Zone names are stored in a trie keyed by their labels in reverse order
+    (com -> example -> sub), so finding the most specific zone for a domain
+    takes one step per label of the domain, regardless of the number of zones.
+    """
+
+    VERSION = 1
+    _ZONE = ""  # Trie key holding the zone of a node; labels are never empty
+
+    def __init__(self, zones: Dict[str, str], fetched_at: Optional[float] = None):
+        """Build the index from a mapping of zone name to zone ID."""
+        self.zones = dict(zones)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self._trie: Dict[str, Any] = {}
+        for name, zone_id in self.zones.items():
+            node = self._trie
+            for label in reversed(self._labels(name)):
+                node = node.setdefault(label, {})
+            node[self._ZONE] = (zone_id, name)
+
+    @staticmethod
+    def _labels(name: str) -> List[str]:
+        return name.rstrip(".").lower().split(".")
+
+    def longest_match(self, domain: str) -> Optional[Tuple[str, str]]:
+        """Find the (zone ID, zone name) of the most specific zone containing domain."""
+        node = self._trie
+        match = None
+        for label in reversed(self._labels(domain)):
+            node = node.get(label)
+            if node is None:
+                break
+            match = node.get(self._ZONE, match)
+        return match
+
+    def save(self, path: str):
+        """Write the index to path atomically."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"version": self.VERSION, "fetched_at": self.fetched_at, "zones": self.zones},
+                f,
+            )
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, ttl: float) -> Optional["ZoneIndex"]:
+        """Load an index saved less than ttl seconds ago, or return None."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != cls.VERSION:
+            return None
+        fetched_at = data.get("fetched_at", 0)
+        if time.time() - fetched_at > ttl:
+            return None
+        return cls(data.get("zones", {}), fetched_at)
+
+
+class RateLimiter:
+    """Thread-safe token bucket pacing requests to a sustained rate with bursts.
+
+    The bucket can also be paused, e.g. until the reset time announced by the
+    API once its quota is exhausted.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                delay = self.paused_until - now
+                if delay <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Let no request through for the given number of seconds."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+# One rate limiter per provider class, shared by all its instances and threads
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def _retry_after(response: Any) -> Optional[float]:
+    """Seconds to wait before retrying, from the Retry-After or rate limit reset headers."""
+    headers = response.headers
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            from email.utils import parsedate_to_datetime
+
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    # IETF draft headers, e.g. Cloudflare's 'Ratelimit: "default";r=0;t=30'
+    value = headers.get("RateLimit") or headers.get("RateLimit-Reset")
+    if value:
+        for part in value.replace(",", ";").split(";"):
+            key, _, number = part.strip().partition("=")
+            if not number and key.isdigit():
+                return float(key)
+            if key == "t" and number.isdigit():
+                return float(number)
+    # X-RateLimit-Reset is an epoch timestamp (Linode) or a delay in seconds
+    value = headers.get("X-RateLimit-Reset")
+    if value:
+        try:
+            reset = float(value)
+        except ValueError:
+            return None
+        return max(reset - time.time(), 0.0) if reset > 1e9 else reset
+    return None
+
+
+def _quota_exhausted(response: Any) -> bool:
+    """Whether the rate limit headers of a response say no request is left in the window."""
+    headers = response.headers
+    remaining = headers.get("X-RateLimit-Remaining") or headers.get("RateLimit-Remaining")
+    if remaining is None:
+        value = headers.get("RateLimit") or ""
+        remaining = next(
+            (
+                part.strip()[2:]
+                for part in value.replace(",", ";").split(";")
+                if part.strip().startswith("r=")
+            ),
+            None,
+        )
+    return remaining is not None and remaining.strip() == "0"
+
+
 class DNSProvider(ABC):
     """Abstract base class for DNS providers."""
 
     DETECT_ENV = ""
 
+    # Whether upsert_record() replaces records natively, without a delete first
+    SUPPORTS_UPSERT = False
+    # Whether CAA records are merged into the record set of their name, never
+    # replacing the values already there
+    MERGES_CAA = False
+
+    # HTTP client configuration for providers with a REST API
+    HTTP_POOL_SIZE = int(os.environ.get("DNS_HTTP_POOL_SIZE", "10"))
+    HTTP_TIMEOUT = (
+        float(os.environ.get("DNS_HTTP_CONNECT_TIMEOUT", "10")),
+        float(os.environ.get("DNS_HTTP_READ_TIMEOUT", "30")),
+    )
+    # Sustained requests per second and burst allowed by the provider's API;
+    # None disables pacing. DNS_HTTP_RATE overrides the rate of every provider.
+    RATE_LIMIT: Optional[float] = None
+    RATE_BURST = 10
+    # Methods that are safe to retry after a server error or a lost connection
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
     # Certbot configuration - override in subclasses
     CERTBOT_PLUGIN = ""
     CERTBOT_PLUGIN_MODULE = ""
@@ -59,7 +277,212 @@ class DNSProvider(ABC):
 
     def __init__(self):
         """Initialize the DNS provider."""
-        pass
+        self._session = None
+        self._zone_index: Optional[ZoneIndex] = None
+        self._zone_index_fresh = False
+        # Old zone ID -> new ID, for zones recreated since the cached index was saved
+        self._replaced_zone_ids: Dict[str, str] = {}
+        self._zone_lock = threading.RLock()
+        # Request, throttling and retry counters of the HTTP client
+        self.http_stats = {"requests": 0, "throttled": 0, "retries": 0, "wait_seconds": 0.0}
+        self._http_stats_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Pooled HTTP session with keep-alive, created on first use.
+
+        Reusing one session lets consecutive API calls share TCP/TLS connections
+        instead of opening a new one per request.
+        """
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            adapter = HTTPAdapter(
+                pool_connections=self.HTTP_POOL_SIZE, pool_maxsize=self.HTTP_POOL_SIZE
+            )
+            self._session = requests.Session()
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+        return self._session
+
+    def _rate_limiter(self) -> Optional[RateLimiter]:
+        rate = float(os.environ.get("DNS_HTTP_RATE", self.RATE_LIMIT or 0))
+        if rate <= 0:
+            return None
+        key = type(self).__name__
+        with _rate_limiters_lock:
+            if key not in _rate_limiters:
+                _rate_limiters[key] = RateLimiter(rate, self.RATE_BURST)
+            return _rate_limiters[key]
+
+    def _count(self, stat: str, amount: float = 1):
+        with self._http_stats_lock:
+            self.http_stats[stat] += amount
+
+    def _send(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs):
+        """Send an HTTP request through the pooled session, paced and retried.
+
+        Requests are paced by the provider's token bucket. Throttled requests
+        (429) were not processed and are always retried, after the delay the API
+        asks for (Retry-After or rate limit reset headers), and the bucket is
+        paused for everyone meanwhile. Server errors (5xx) and connection errors
+        are retried with jittered exponential backoff, for idempotent requests
+        only. Returns the last response, or raises the last connection error.
+        """
+        import requests
+
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in self.IDEMPOTENT_METHODS
+        limiter = self._rate_limiter()
+        kwargs.setdefault("timeout", self.HTTP_TIMEOUT)
+
+        attempt = 0
+        while True:
+            if limiter:
+                waited = limiter.acquire()
+                if waited:
+                    self._count("wait_seconds", waited)
+            self._count("requests")
+            delay = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not idempotent or attempt >= HTTP_MAX_RETRIES:
+                    raise
+            else:
+                if response.status_code == 429:
+                    self._count("throttled")
+                    delay = _retry_after(response)
+                    if delay is not None and limiter:
+                        limiter.pause(delay)
+                elif not (idempotent and response.status_code in (500, 502, 503, 504)):
+                    # Slow down before the API starts throttling
+                    if limiter and _quota_exhausted(response):
+                        reset = _retry_after(response)
+                        if reset:
+                            limiter.pause(min(reset, HTTP_BACKOFF_MAX))
+                    return response
+                elif response.status_code == 503:
+                    delay = _retry_after(response)
+                if attempt >= HTTP_MAX_RETRIES:
+                    return response
+                response.close()
+
+            if delay is None:
+                # Full jitter, so that concurrent clients do not retry in lockstep
+                delay = random.uniform(
+                    0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2**attempt)
+                )
+            delay = min(delay, HTTP_BACKOFF_MAX)
+            attempt += 1
+            self._count("retries")
+            print(
+                f"Retrying {method} {url.split('?')[0]} in {delay:.1f}s "
+                f"(attempt {attempt}/{HTTP_MAX_RETRIES})",
+                file=sys.stderr,
+            )
+            time.sleep(delay)
+            self._count("wait_seconds", delay)
+
+    def close(self):
+        """Close pooled connections."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _list_zones(self) -> Optional[Dict[str, str]]:
+        """List all zones of the account as {zone name: zone ID}.
+
+        Override in providers that have zones; returns None on failure.
+        """
+        return None
+
+    def _zone_cache_key(self) -> str:
+        """Identify the account, so that different accounts never share a cached zone index.
+
+        Override in subclasses to include a digest of the credentials.
+        """
+        return type(self).__name__
+
+    @staticmethod
+    def _credential_digest(credential: str) -> str:
+        return hashlib.sha256(credential.encode()).hexdigest()[:16]
+
+    def _zone_cache_path(self) -> str:
+        return os.path.join(ZONE_CACHE_DIR, f"zones-{self._zone_cache_key()}.json")
+
+    def find_zone(self, domain: str) -> Optional[Tuple[str, str]]:
+        """Find the (zone ID, zone name) of the most specific zone containing domain.
+
+        The zone list is fetched once and cached in memory and on disk for
+        ZONE_CACHE_TTL seconds. A domain missing from a cached index triggers
+        one refetch, in case its zone was added since.
+        """
+        with self._zone_lock:
+            if self._zone_index is None and ZONE_CACHE_TTL > 0:
+                self._zone_index = ZoneIndex.load(self._zone_cache_path(), ZONE_CACHE_TTL)
+            if self._zone_index is not None:
+                match = self._zone_index.longest_match(domain)
+                if match or self._zone_index_fresh:
+                    return match
+
+            if not self._refresh_zone_index():
+                return None
+            return self._zone_index.longest_match(domain)
+
+    def _refresh_zone_index(self) -> bool:
+        """Rebuild the zone index from the API and cache it on disk."""
+        zones = self._list_zones()
+        if zones is None:
+            return False
+        if self._zone_index is not None:
+            for name, old_id in self._zone_index.zones.items():
+                if zones.get(name, old_id) != old_id:
+                    self._replaced_zone_ids[old_id] = zones[name]
+        self._zone_index = ZoneIndex(zones)
+        self._zone_index_fresh = True
+        if ZONE_CACHE_TTL > 0:
+            try:
+                self._zone_index.save(self._zone_cache_path())
+            except OSError as e:
+                print(f"Warning: Could not cache zone index: {e}", file=sys.stderr)
+        return True
+
+    def _refreshed_zone_endpoint(
+        self, endpoint: str, pattern: "re.Pattern"
+    ) -> Optional[str]:
+        """Rewrite an API endpoint whose zone ID (group 1 of pattern) is stale, or return None."""
+        match = pattern.match(endpoint)
+        if not match:
+            return None
+        new_zone_id = self._refresh_zone_id(match.group(1))
+        if new_zone_id is None:
+            return None
+        print(
+            f"Zone ID {match.group(1)} no longer exists, retrying with {new_zone_id}",
+            file=sys.stderr,
+        )
+        return endpoint[: match.start(1)] + new_zone_id + endpoint[match.end(1) :]
+
+    def _refresh_zone_id(self, zone_id: str) -> Optional[str]:
+        """Get the new ID of a zone whose cached ID the API reports as not found.
+
+        A zone deleted and recreated since the zone index was cached has a new
+        ID. If zone_id comes from a cached index, the index is rebuilt from the
+        API once; returns the zone's new ID for the caller to retry with, or
+        None if the ID did not change.
+        """
+        with self._zone_lock:
+            if (
+                zone_id not in self._replaced_zone_ids
+                and not self._zone_index_fresh
+                and self._zone_index is not None
+                and zone_id in self._zone_index.zones.values()
+            ):
+                self._refresh_zone_index()
+            return self._replaced_zone_ids.get(zone_id)
 
     def setup_certbot_credentials(self) -> bool:
         """Setup credentials file for certbot. Override in subclasses if needed."""
@@ -126,10 +549,129 @@ class DNSProvider(ABC):
         """
         pass
 
+    def upsert_record(
+        self, record: Union[DNSRecord, CAARecord], record_id: Optional[str] = None
+    ) -> bool:
+        """Create a record, or replace the record with ID record_id.
+
+        Providers that set SUPPORTS_UPSERT override this to replace the record
+        in place, in a single API call and without a window in which the name
+        does not resolve. The default deletes record_id, then creates record.
+
+        Args:
+            record: The DNS or CAA record to write
+            record_id: The ID of an existing record of the same name and type to replace
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if record_id:
+            self.delete_dns_record(record_id, record.name)
+        if isinstance(record, CAARecord):
+            return self.create_caa_record(record)
+        return self.create_dns_record(record)
+
+    def _replace_records(
+        self, record: Union[DNSRecord, CAARecord], stale_records: List[DNSRecord]
+    ) -> bool:
+        """Write record in place of existing records of the same name and type."""
+        # A record set holding several values is listed as one record per value
+        stale_records = list({r.id: r for r in stale_records if r.id}.values())
+        if self.SUPPORTS_UPSERT:
+            record_id = stale_records[0].id if stale_records else None
+            if not self.upsert_record(record, record_id):
+                return False
+            for stale in stale_records[1:]:
+                self.delete_dns_record(stale.id, record.name)
+            return True
+
+        for stale in stale_records:
+            self.delete_dns_record(stale.id, record.name)
+        if isinstance(record, CAARecord):
+            return self.create_caa_record(record)
+        return self.create_dns_record(record)
+
+    def apply_changes(self, changes: List[RecordChange]) -> bool:
+        """Apply several record changes, with as few API calls as the provider allows.
+
+        Providers with a batch API override this to send the changes of each
+        zone together. The default applies them one by one.
+
+        Args:
+            changes: The changes to apply, possibly spanning several zones
+
+        Returns:
+            True if all changes were applied, False otherwise
+        """
+        success = True
+        for change in changes:
+            success = self._apply_change(change) and success
+        return success
+
+    def _apply_change(self, change: RecordChange) -> bool:
+        """Apply a single change with the per-record API."""
+        record = change.record
+        if change.action == ChangeAction.DELETE:
+            return self.delete_dns_record(change.record_id, record.name)
+        if change.action == ChangeAction.UPSERT:
+            return self.upsert_record(record, change.record_id)
+        if isinstance(record, CAARecord):
+            return self.create_caa_record(record)
+        return self.create_dns_record(record)
+
+    def get_records_by_name(
+        self, names: List[str]
+    ) -> Optional[Dict[str, List[DNSRecord]]]:
+        """Get the records of several names, keyed by lowercase name.
+
+        Providers override this to list each zone once instead of querying
+        every name. Returns None if the records could not be fetched.
+        """
+        return {name.lower(): self.get_dns_records(name) for name in names}
+
+    def alias_record(self, name: str, content: str, ttl: int = 60) -> DNSRecord:
+        """The record set_alias_record() writes for an alias: a CNAME by default."""
+        return DNSRecord(
+            id=None, name=name, type=RecordType.CNAME, content=content, ttl=ttl
+        )
+
+    def caa_records(self, record: CAARecord) -> List[CAARecord]:
+        """The records set_caa_record() writes for a CAA record: the record itself by default."""
+        return [record]
+
+    def _names_by_zone(
+        self, names: List[str]
+    ) -> Optional[Dict[Tuple[str, str], List[str]]]:
+        """Group names by (zone ID, zone name), or return None if a zone is not found."""
+        zones: Dict[Tuple[str, str], List[str]] = {}
+        for name in names:
+            zone_info = self.find_zone(name)
+            if not zone_info:
+                print(f"Error: Could not find zone for domain {name}", file=sys.stderr)
+                return None
+            zones.setdefault(zone_info, []).append(name)
+        return zones
+
+    def _changes_by_zone(
+        self, changes: List[RecordChange]
+    ) -> Optional[Dict[Tuple[str, str], List[RecordChange]]]:
+        """Group changes by (zone ID, zone name), or return None if a zone is not found."""
+        zones: Dict[Tuple[str, str], List[RecordChange]] = {}
+        for change in changes:
+            zone_info = self.find_zone(change.record.name)
+            if not zone_info:
+                print(
+                    f"Error: Could not find zone for domain {change.record.name}",
+                    file=sys.stderr,
+                )
+                return None
+            zones.setdefault(zone_info, []).append(change)
+        return zones
+
     def set_a_record(
         self, name: str, ip_address: str, ttl: int = 60, proxied: bool = False
     ) -> bool:
-        """Set an A record (delete existing and create new).
+        """Set an A record, replacing existing ones.
 
         Args:
             name: The record name
@@ -141,13 +683,10 @@ class DNSProvider(ABC):
             True if successful, False otherwise
         """
         existing_records = self.get_dns_records(name, RecordType.A)
-        for record in existing_records:
-            # Check if record already exists with same IP
-            if record.content == ip_address:
-                print("A record with the same IP already exists")
-                return True
-            if record.id:
-                self.delete_dns_record(record.id, name)
+        # Check if record already exists with same IP
+        if any(record.content == ip_address for record in existing_records):
+            print("A record with the same IP already exists")
+            return True
 
         new_record = DNSRecord(
             id=None,
@@ -157,7 +696,7 @@ class DNSProvider(ABC):
             ttl=ttl,
             proxied=proxied,
         )
-        return self.create_dns_record(new_record)
+        return self._replace_records(new_record, existing_records)
 
     def set_alias_record(
         self,
@@ -166,7 +705,7 @@ class DNSProvider(ABC):
         ttl: int = 60,
         proxied: bool = False,
     ) -> bool:
-        """Set an alias record (delete existing and create new).
+        """Set an alias record, replacing existing ones.
 
         Creates a CNAME record by default. Some providers may override this
         to use A records instead (e.g., Linode to avoid CAA conflicts).
@@ -189,7 +728,7 @@ class DNSProvider(ABC):
         ttl: int = 60,
         proxied: bool = False,
     ) -> bool:
-        """Set an alias record (delete existing and create new).
+        """Set an alias record, replacing existing ones.
 
         Creates a CNAME record by default. Some providers may override this
         to use A records instead (e.g., Linode to avoid CAA conflicts).
@@ -204,13 +743,10 @@ class DNSProvider(ABC):
             True if successful, False otherwise
         """
         existing_records = self.get_dns_records(name, RecordType.CNAME)
-        for record in existing_records:
-            # Check if record already exists with same content
-            if record.content == content:
-                print("CNAME record with the same content already exists")
-                return True
-            if record.id:
-                self.delete_dns_record(record.id, name)
+        # Check if record already exists with same content
+        if any(record.content == content for record in existing_records):
+            print("CNAME record with the same content already exists")
+            return True
 
         new_record = DNSRecord(
             id=None,
@@ -220,10 +756,10 @@ class DNSProvider(ABC):
             ttl=ttl,
             proxied=proxied,
         )
-        return self.create_dns_record(new_record)
+        return self._replace_records(new_record, existing_records)
 
     def set_txt_record(self, name: str, content: str, ttl: int = 60) -> bool:
-        """Set a TXT record (delete existing and create new).
+        """Set a TXT record, replacing existing ones.
 
         Args:
             name: The record name
@@ -234,18 +770,18 @@ class DNSProvider(ABC):
             True if successful, False otherwise
         """
         existing_records = self.get_dns_records(name, RecordType.TXT)
-        for record in existing_records:
-            # Check if record already exists with same content
-            if record.content == content or record.content == f'"{content}"':
-                print("TXT record with the same content already exists")
-                return True
-            if record.id:
-                self.delete_dns_record(record.id, name)
+        # Check if record already exists with same content
+        if any(
+            record.content == content or record.content == f'"{content}"'
+            for record in existing_records
+        ):
+            print("TXT record with the same content already exists")
+            return True
 
         new_record = DNSRecord(
             id=None, name=name, type=RecordType.TXT, content=content, ttl=ttl
         )
-        return self.create_dns_record(new_record)
+        return self._replace_records(new_record, existing_records)
 
     def set_caa_record(
         self,
@@ -255,7 +791,7 @@ class DNSProvider(ABC):
         flags: int = 0,
         ttl: int = 60,
     ) -> bool:
-        """Set a CAA record (delete existing with same tag and create new).
+        """Set a CAA record, replacing existing ones with the same tag.
 
         Args:
             name: The record name
@@ -267,14 +803,14 @@ class DNSProvider(ABC):
         Returns:
             True if successful, False otherwise
         """
-        existing_records = self.get_dns_records(name, RecordType.CAA)
-        for record in existing_records:
-            if record.data and record.data.get("tag") == tag:
-                if record.data.get("value") == value:
-                    print("CAA record with the same content already exists")
-                    return True
-                if record.id:
-                    self.delete_dns_record(record.id, name)
+        existing_records = [
+            record
+            for record in self.get_dns_records(name, RecordType.CAA)
+            if record.data and record.data.get("tag") == tag
+        ]
+        if any(record.data.get("value") == value for record in existing_records):
+            print("CAA record with the same content already exists")
+            return True
 
         caa_record = CAARecord(name=name, flags=flags, tag=tag, value=value, ttl=ttl)
-        return self.create_caa_record(caa_record)
+        return self._replace_records(caa_record, existing_records)
@@ -1,17 +1,37 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
 import json
 import requests
-from typing import Dict, List, Optional
-from .base import DNSProvider, DNSRecord, CAARecord, RecordType
+from typing import Dict, List, Optional, Union
+from .base import (
+    DNSProvider,
+    DNSRecord,
+    CAARecord,
+    RecordType,
+    ChangeAction,
+    RecordChange,
+)
 
 
 class CloudflareDNSProvider(DNSProvider):
     """DNS provider implementation for Cloudflare."""
 
     DETECT_ENV = "CLOUDFLARE_API_TOKEN"
+    SUPPORTS_UPSERT = True
+
+    # Maximum number of changes per dns_records/batch request
+    BATCH_SIZE = 200
+
+    # Endpoints scoped to a zone, and the API error codes of an unknown zone ID
+    ZONE_ENDPOINT = re.compile(r"zones/([^/?]+)/")
+    ZONE_NOT_FOUND_CODES = {7000, 7003}
+
+    # The API allows 1200 requests per 5 minutes per user
+    RATE_LIMIT = 4.0
+    RATE_BURST = 20
 
     # Certbot configuration
     CERTBOT_PLUGIN = "dns-cloudflare"
@@ -67,14 +87,20 @@ class CloudflareDNSProvider(DNSProvider):
         """Make a request to the Cloudflare API with error handling."""
         url = f"{self.base_url}/{endpoint}"
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=self.headers)
-            else:
+            if method.upper() not in ("GET", "POST", "PUT", "PATCH", "DELETE"):
                 raise ValueError(f"Unsupported HTTP method: {method}")
+            response = self._send(
+                method,
+                url,
+                headers=self.headers,
+                json=data if method.upper() != "GET" else None,
+            )
+
+            # The zone may have been recreated since its ID was cached
+            if not response.ok and self._zone_not_found(response):
+                refreshed = self._refreshed_zone_endpoint(endpoint, self.ZONE_ENDPOINT)
+                if refreshed:
+                    return self._make_request(method, refreshed, data)
 
             response.raise_for_status()
             result = response.json()
@@ -108,58 +134,58 @@ class CloudflareDNSProvider(DNSProvider):
             print(f"Unexpected Error: {str(e)}", file=sys.stderr)
             return {"success": False, "errors": [{"message": str(e)}]}
 
-    def _get_zone_info(self, domain: str) -> Optional[tuple[str, str]]:
-        """Get the zone ID and zone name for a domain."""
-        zone_name_len = 0
-        zone_id = None
-        zone_name_found = None
+    def _zone_not_found(self, response: requests.Response) -> bool:
+        if response.status_code == 404:
+            return True
+        try:
+            errors = response.json().get("errors") or []
+        except ValueError:
+            return False
+        return any(error.get("code") in self.ZONE_NOT_FOUND_CODES for error in errors)
 
+    def _zone_cache_key(self) -> str:
+        return f"cloudflare-{self._credential_digest(self.api_token)}"
+
+    def _list_zones(self) -> Optional[Dict[str, str]]:
+        """List all zones accessible with the API token."""
+        zones: Dict[str, str] = {}
         page = 1
         total_pages = 1
 
         while page <= total_pages:
-            result = self._make_request("GET", f"zones?page={page}")
+            result = self._make_request("GET", f"zones?page={page}&per_page=50")
 
             if not result.get("success", False):
                 return None
 
-            zones = result.get("result", [])
-            if not zones and page == 1:
-                print("No zones found for any domain", file=sys.stderr)
-                return None
+            for zone in result.get("result", []):
+                zones[zone.get("name", "")] = zone.get("id")
 
             result_info = result.get("result_info", {})
             if result_info:
                 total_pages = result_info.get("total_pages", total_pages)
 
-            for zone in zones:
-                zone_name = zone.get("name", "")
-                if domain == zone_name:
-                    return (zone.get("id"), zone_name)
-                if domain.endswith(f".{zone_name}") and len(zone_name) > zone_name_len:
-                    zone_name_len = len(zone_name)
-                    zone_id = zone.get("id")
-                    zone_name_found = zone_name
-
             page += 1
 
-        if zone_id and zone_name_found:
-            return (zone_id, zone_name_found)
-        else:
+        if not zones:
+            print("No zones found for any domain", file=sys.stderr)
+        return zones
+
+    def _get_zone_info(self, domain: str) -> Optional[tuple[str, str]]:
+        """Get the zone ID and zone name for a domain."""
+        zone_info = self.find_zone(domain)
+        if not zone_info:
             print(
                 f"Zone ID not found in response for domain: {domain}", file=sys.stderr
             )
-            return None
+        return zone_info
 
     def _ensure_zone_id(self, domain: str) -> Optional[str]:
         """Ensure we have a zone ID for the domain, fetching if necessary."""
-        if self.zone_id and self.zone_domain:
-            if domain == self.zone_domain or domain.endswith(f".{self.zone_domain}"):
-                return self.zone_id
-
         zone_info = self._get_zone_info(domain)
-        if zone_info:
-            self.zone_id, self.zone_domain = zone_info
+        if not zone_info:
+            return None
+        self.zone_id, self.zone_domain = zone_info
         return self.zone_id
 
     def get_dns_records(
@@ -183,28 +209,68 @@ class CloudflareDNSProvider(DNSProvider):
 
         records = []
         for record_data in result.get("result", []):
-            record = DNSRecord(
-                id=record_data.get("id"),
-                name=record_data.get("name"),
-                type=RecordType(record_data.get("type")),
-                content=record_data.get("content"),
-                ttl=record_data.get("ttl", 60),
-                proxied=record_data.get("proxied", False),
-                priority=record_data.get("priority"),
-                data=record_data.get("data"),
-            )
-            records.append(record)
+            records.append(self._parse_record(record_data))
 
         return records
 
-    def create_dns_record(self, record: DNSRecord) -> bool:
-        """Create a DNS record."""
-        zone_id = self._ensure_zone_id(record.name)
-        if not zone_id:
-            print(
-                f"Error: Could not find zone for domain {record.name}", file=sys.stderr
-            )
-            return False
+    def _parse_record(self, record_data: Dict) -> DNSRecord:
+        return DNSRecord(
+            id=record_data.get("id"),
+            name=record_data.get("name"),
+            type=RecordType(record_data.get("type")),
+            content=record_data.get("content"),
+            ttl=record_data.get("ttl", 60),
+            proxied=record_data.get("proxied", False),
+            priority=record_data.get("priority"),
+            data=record_data.get("data"),
+        )
+
+    def get_records_by_name(
+        self, names: List[str]
+    ) -> Optional[Dict[str, List[DNSRecord]]]:
+        """Get the records of several names, listing each zone once."""
+        zones = self._names_by_zone(names)
+        if zones is None:
+            return None
+
+        records: Dict[str, List[DNSRecord]] = {name.lower(): [] for name in names}
+        for (zone_id, zone_name), zone_names in zones.items():
+            print(f"Listing DNS records of zone {zone_name}")
+            page = 1
+            total_pages = 1
+            while page <= total_pages:
+                result = self._make_request(
+                    "GET", f"zones/{zone_id}/dns_records?page={page}&per_page=1000"
+                )
+                if not result.get("success", False):
+                    return None
+
+                for record_data in result.get("result", []):
+                    name = record_data.get("name", "").lower()
+                    # Skip names not asked for, and types this module does not handle
+                    if name in records and record_data.get("type") in RecordType.__members__:
+                        records[name].append(self._parse_record(record_data))
+
+                result_info = result.get("result_info", {})
+                if result_info:
+                    total_pages = result_info.get("total_pages", total_pages)
+                page += 1
+
+        return records
+
+    def _record_data(self, record: Union[DNSRecord, CAARecord]) -> Dict:
+        """Build the API representation of a record."""
+        if isinstance(record, CAARecord):
+            return {
+                "type": "CAA",
+                "name": record.name,
+                "ttl": record.ttl,
+                "data": {
+                    "flags": record.flags,
+                    "tag": record.tag,
+                    "value": record.value.strip('"'),
+                },
+            }
 
         data = {
             "type": record.type.value,
@@ -222,8 +288,45 @@ class CloudflareDNSProvider(DNSProvider):
         if record.priority is not None:
             data["priority"] = record.priority
 
+        return data
+
+    def create_dns_record(self, record: DNSRecord) -> bool:
+        """Create a DNS record."""
+        zone_id = self._ensure_zone_id(record.name)
+        if not zone_id:
+            print(
+                f"Error: Could not find zone for domain {record.name}", file=sys.stderr
+            )
+            return False
+
         print(f"Adding {record.type.value} record for {record.name}")
-        result = self._make_request("POST", f"zones/{zone_id}/dns_records", data)
+        result = self._make_request(
+            "POST", f"zones/{zone_id}/dns_records", self._record_data(record)
+        )
+
+        return result.get("success", False)
+
+    def upsert_record(
+        self, record: Union[DNSRecord, CAARecord], record_id: Optional[str] = None
+    ) -> bool:
+        """Create a record, or overwrite the record with ID record_id with a PUT."""
+        if not record_id:
+            if isinstance(record, CAARecord):
+                return self.create_caa_record(record)
+            return self.create_dns_record(record)
+
+        zone_id = self._ensure_zone_id(record.name)
+        if not zone_id:
+            print(
+                f"Error: Could not find zone for domain {record.name}", file=sys.stderr
+            )
+            return False
+
+        data = self._record_data(record)
+        print(f"Updating {data['type']} record {record_id} for {record.name}")
+        result = self._make_request(
+            "PUT", f"zones/{zone_id}/dns_records/{record_id}", data
+        )
 
         return result.get("success", False)
 
@@ -241,6 +344,40 @@ class CloudflareDNSProvider(DNSProvider):
 
         return result.get("success", False)
 
+    def apply_changes(self, changes: List[RecordChange]) -> bool:
+        """Apply changes with one dns_records/batch request per zone.
+
+        Cloudflare applies a batch atomically, in the order deletes, puts, posts.
+        """
+        zones = self._changes_by_zone(changes)
+        if zones is None:
+            return False
+
+        success = True
+        for (zone_id, zone_name), zone_changes in zones.items():
+            for start in range(0, len(zone_changes), self.BATCH_SIZE):
+                batch = {"deletes": [], "puts": [], "posts": []}
+                for change in zone_changes[start:start + self.BATCH_SIZE]:
+                    if change.action == ChangeAction.DELETE:
+                        batch["deletes"].append({"id": change.record_id})
+                    elif change.action == ChangeAction.UPSERT and change.record_id:
+                        batch["puts"].append(
+                            dict(self._record_data(change.record), id=change.record_id)
+                        )
+                    else:
+                        batch["posts"].append(self._record_data(change.record))
+
+                print(
+                    f"Applying {len(batch['deletes'])} deletions, {len(batch['puts'])} "
+                    f"updates and {len(batch['posts'])} creations in zone {zone_name}"
+                )
+                result = self._make_request(
+                    "POST", f"zones/{zone_id}/dns_records/batch", batch
+                )
+                success = result.get("success", False) and success
+
+        return success
+
     def create_caa_record(self, caa_record: CAARecord) -> bool:
         """Create a CAA record."""
         zone_id = self._ensure_zone_id(caa_record.name)
@@ -251,18 +388,8 @@ class CloudflareDNSProvider(DNSProvider):
             )
             return False
 
-        clean_value = caa_record.value.strip('"')
-
-        data = {
-            "type": "CAA",
-            "name": caa_record.name,
-            "ttl": caa_record.ttl,
-            "data": {
-                "flags": caa_record.flags,
-                "tag": caa_record.tag,
-                "value": clean_value,
-            },
-        }
+        data = self._record_data(caa_record)
+        clean_value = data["data"]["value"]
 
         print(
             f"Adding CAA record for {caa_record.name} with tag {caa_record.tag} and value {clean_value}"
@@ -1,24 +1,29 @@
 #!/usr/bin/env python3
 
+import importlib
 import os
-from typing import Optional
+from typing import Optional, Type
 from .base import DNSProvider
-from .cloudflare import CloudflareDNSProvider
-from .linode import LinodeDNSProvider
-from .namecheap import NamecheapDNSProvider
-from .route53 import Route53DNSProvider
 
 
 class DNSProviderFactory:
     """Factory class for creating DNS provider instances."""
 
+    # Provider modules are only imported when selected, keeping CLI start-up fast
     PROVIDERS = {
-        "cloudflare": CloudflareDNSProvider,
-        "linode": LinodeDNSProvider,
-        "namecheap": NamecheapDNSProvider,
-        "route53": Route53DNSProvider,
+        "cloudflare": ".cloudflare:CloudflareDNSProvider",
+        "linode": ".linode:LinodeDNSProvider",
+        "namecheap": ".namecheap:NamecheapDNSProvider",
+        "route53": ".route53:Route53DNSProvider",
     }
 
+    @classmethod
+    def get_provider_class(cls, provider_type: str) -> Type[DNSProvider]:
+        """Import and return the class of a provider."""
+        module_name, class_name = cls.PROVIDERS[provider_type].split(":")
+        module = importlib.import_module(module_name, __package__)
+        return getattr(module, class_name)
+
     @classmethod
     def create_provider(
         cls,
@@ -48,7 +53,7 @@ class DNSProviderFactory:
             )
 
         # Lazy import the provider class
-        provider_class = cls.PROVIDERS[provider_type]
+        provider_class = cls.get_provider_class(provider_type)
         return provider_class()
 
     @classmethod
@@ -57,8 +62,8 @@ class DNSProviderFactory:
         if os.environ.get("DNS_PROVIDER"):
             return os.environ["DNS_PROVIDER"]
 
-        for name, provider in cls.PROVIDERS.items():
-            if provider.suitable():
+        for name in cls.PROVIDERS:
+            if cls.get_provider_class(name).suitable():
                 return name
 
         raise ValueError(
@@ -1,18 +1,35 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
 import json
 import socket
 import requests
-from typing import Dict, List, Optional
-from .base import DNSProvider, DNSRecord, CAARecord, RecordType
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+from .base import (
+    DNSProvider,
+    DNSRecord,
+    CAARecord,
+    RecordType,
+    ChangeAction,
+    RecordChange,
+)
 
 
 class LinodeDNSProvider(DNSProvider):
     """DNS provider implementation for Linode DNS."""
 
     DETECT_ENV = "LINODE_API_TOKEN"
+    SUPPORTS_UPSERT = True
+
+    # Endpoints scoped to a domain (zone)
+    ZONE_ENDPOINT = re.compile(r"domains/(\d+)(?:/|$)")
+
+    # Stay well below the API's per-user limit, shared with concurrent batches
+    RATE_LIMIT = 10.0
+    RATE_BURST = 20
 
     # Certbot configuration
     CERTBOT_PLUGIN = "dns-linode"
@@ -31,8 +48,6 @@ class LinodeDNSProvider(DNSProvider):
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json",
         }
-        self.zone_id: Optional[str] = None  # Will be set when needed
-        self.zone_domain: Optional[str] = None  # Cache the domain for the zone
 
     def setup_certbot_credentials(self) -> bool:
         """Setup Linode credentials file for certbot."""
@@ -70,18 +85,20 @@ class LinodeDNSProvider(DNSProvider):
         """Make a request to the Linode API with error handling."""
         url = f"{self.base_url}/{endpoint}"
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method.upper() == "PUT":
-                response = requests.put(url, headers=self.headers, json=data)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=self.headers)
-            else:
+            if method.upper() not in ("GET", "POST", "PUT", "DELETE"):
                 raise ValueError(f"Unsupported HTTP method: {method}")
+            response = self._send(
+                method,
+                url,
+                headers=self.headers,
+                json=data if method.upper() != "GET" else None,
+            )
 
             if response.status_code == 404:
+                # The domain may have been recreated since its ID was cached
+                refreshed = self._refreshed_zone_endpoint(endpoint, self.ZONE_ENDPOINT)
+                if refreshed:
+                    return self._make_request(method, refreshed, data)
                 return {
                     "success": False,
                     "errors": [{"field": "not_found", "reason": "Resource not found"}],
@@ -115,43 +132,40 @@ class LinodeDNSProvider(DNSProvider):
             print(f"Unexpected Error: {str(e)}", file=sys.stderr)
             return {"success": False, "errors": [{"reason": str(e)}]}
 
-    def _get_zone_id(self, domain: str) -> Optional[str]:
-        """Get the domain ID for a domain in Linode."""
-        result = self._make_request("GET", "domains")
+    def _zone_cache_key(self) -> str:
+        return f"linode-{self._credential_digest(self.api_token)}"
 
-        if not result.get("success", False):
-            return None
+    def _list_zones(self) -> Optional[Dict[str, str]]:
+        """List all domains of the account."""
+        zones: Dict[str, str] = {}
+        page = 1
+        pages = 1
 
-        domains = result.get("data", {}).get("data", [])
+        while page <= pages:
+            result = self._make_request("GET", f"domains?page={page}&page_size=500")
 
-        best_match_domain = None
-        best_match_length = 0
+            if not result.get("success", False):
+                return None
 
-        for domain_obj in domains:
-            domain_name = domain_obj.get("domain", "")
-            if domain == domain_name:
-                return str(domain_obj.get("id"))
-            if (
-                domain.endswith(f".{domain_name}")
-                and len(domain_name) > best_match_length
-            ):
-                best_match_length = len(domain_name)
-                best_match_domain = domain_obj.get("id")
+            data = result.get("data", {})
+            for domain_obj in data.get("data", []):
+                zones[domain_obj.get("domain", "")] = str(domain_obj.get("id"))
+            pages = data.get("pages", pages)
 
-        if best_match_domain:
-            return str(best_match_domain)
-        else:
-            print(f"Domain not found: {domain}", file=sys.stderr)
-            return None
+            page += 1
+
+        return zones
 
     def _get_subdomain(self, fqdn: str, domain_id: str) -> str:
         """Get the subdomain part for a record."""
-        # First, get the domain name
-        result = self._make_request("GET", f"domains/{domain_id}")
-        if not result.get("success", False):
-            return fqdn
-
-        domain_name = result.get("data", {}).get("domain", "")
+        zone_info = self.find_zone(fqdn)
+        if zone_info and zone_info[0] == domain_id:
+            domain_name = zone_info[1]
+        else:
+            result = self._make_request("GET", f"domains/{domain_id}")
+            if not result.get("success", False):
+                return fqdn
+            domain_name = result.get("data", {}).get("domain", "")
 
         if fqdn == domain_name:
             return ""  # Root domain
@@ -162,20 +176,12 @@ class LinodeDNSProvider(DNSProvider):
 
     def _ensure_zone_id(self, domain: str) -> Optional[str]:
         """Ensure we have a zone ID for the domain, fetching if necessary."""
-        # If we already have a zone_id and it's for a parent domain, reuse it
-        if self.zone_id and self.zone_domain:
-            if domain == self.zone_domain or domain.endswith(f".{self.zone_domain}"):
-                return self.zone_id
-
-        # Otherwise fetch the zone ID
-        self.zone_id = self._get_zone_id(domain)
-        if self.zone_id:
-            # Store the base domain for this zone
-            # For Linode, we need to get the actual domain from the API
-            result = self._make_request("GET", f"domains/{self.zone_id}")
-            if result.get("success", False):
-                self.zone_domain = result.get("data", {}).get("domain", "")
-        return self.zone_id
+        zone_info = self.find_zone(domain)
+        if not zone_info:
+            print(f"Domain not found: {domain}", file=sys.stderr)
+            return None
+        # Not cached on self: apply_changes() calls this from several threads
+        return zone_info[0]
 
     def get_dns_records(
         self, name: str, record_type: Optional[RecordType] = None
@@ -207,43 +213,83 @@ class LinodeDNSProvider(DNSProvider):
                 if record_type and record_type.value != record_type_str:
                     continue
 
-                # Parse CAA record data if applicable
-                data = None
-                if record_type_str == "CAA":
-                    # Linode stores CAA with separate tag and target fields
-                    target = record_data.get("target", "")
-                    tag = record_data.get("tag", "issue")
-
-                    data = {
-                        "flags": 0,  # Linode doesn't support flags (always 0)
-                        "tag": tag,
-                        "value": target.strip('"'),
-                    }
-
-                records.append(
-                    DNSRecord(
-                        id=str(record_data.get("id")),
-                        name=name,
-                        type=RecordType(record_type_str),
-                        content=record_data.get("target", ""),
-                        ttl=record_data.get("ttl_sec", 60),
-                        priority=record_data.get("priority"),
-                        data=data,
-                    )
-                )
+                records.append(self._parse_record(record_data, name))
 
         return records
 
-    def create_dns_record(self, record: DNSRecord) -> bool:
-        """Create a DNS record."""
-        zone_id = self._ensure_zone_id(record.name)
-        if not zone_id:
-            print(
-                f"Error: Could not find zone for domain {record.name}", file=sys.stderr
-            )
-            return False
+    def _parse_record(self, record_data: Dict, name: str) -> DNSRecord:
+        record_type_str = record_data.get("type", "")
 
-        subdomain = self._get_subdomain(record.name, zone_id)
+        # Parse CAA record data if applicable
+        data = None
+        if record_type_str == "CAA":
+            # Linode stores CAA with separate tag and target fields
+            target = record_data.get("target", "")
+            tag = record_data.get("tag", "issue")
+
+            data = {
+                "flags": 0,  # Linode doesn't support flags (always 0)
+                "tag": tag,
+                "value": target.strip('"'),
+            }
+
+        return DNSRecord(
+            id=str(record_data.get("id")),
+            name=name,
+            type=RecordType(record_type_str),
+            content=record_data.get("target", ""),
+            ttl=record_data.get("ttl_sec", 60),
+            priority=record_data.get("priority"),
+            data=data,
+        )
+
+    def get_records_by_name(
+        self, names: List[str]
+    ) -> Optional[Dict[str, List[DNSRecord]]]:
+        """Get the records of several names, listing each domain once."""
+        zones = self._names_by_zone(names)
+        if zones is None:
+            return None
+
+        records: Dict[str, List[DNSRecord]] = {name.lower(): [] for name in names}
+        for (zone_id, zone_name), zone_names in zones.items():
+            print(f"Listing DNS records of domain {zone_name}")
+            page = 1
+            pages = 1
+            while page <= pages:
+                result = self._make_request(
+                    "GET", f"domains/{zone_id}/records?page={page}&page_size=500"
+                )
+                if not result.get("success", False):
+                    return None
+
+                data = result.get("data", {})
+                for record_data in data.get("data", []):
+                    subdomain = record_data.get("name", "")
+                    name = f"{subdomain}.{zone_name}" if subdomain else zone_name
+                    # Skip names not asked for, and types this module does not handle
+                    if (
+                        name.lower() in records
+                        and record_data.get("type") in RecordType.__members__
+                    ):
+                        records[name.lower()].append(self._parse_record(record_data, name))
+                pages = data.get("pages", pages)
+                page += 1
+
+        return records
+
+    def _record_data(self, record: Union[DNSRecord, CAARecord], subdomain: str) -> Dict:
+        """Build the API representation of a record."""
+        if isinstance(record, CAARecord):
+            # Linode CAA format uses separate tag and target fields
+            # The flags are not supported in Linode API (always 0)
+            return {
+                "type": "CAA",
+                "name": subdomain,
+                "tag": record.tag,
+                "target": record.value.strip('"'),
+                "ttl_sec": record.ttl,
+            }
 
         data = {
             "type": record.type.value,
@@ -261,11 +307,68 @@ class LinodeDNSProvider(DNSProvider):
         if record.priority is not None:
             data["priority"] = record.priority
 
+        return data
+
+    def create_dns_record(self, record: DNSRecord) -> bool:
+        """Create a DNS record."""
+        zone_id = self._ensure_zone_id(record.name)
+        if not zone_id:
+            print(
+                f"Error: Could not find zone for domain {record.name}", file=sys.stderr
+            )
+            return False
+
+        subdomain = self._get_subdomain(record.name, zone_id)
+        data = self._record_data(record, subdomain)
+
         print(f"Adding {record.type.value} record for {record.name}")
         result = self._make_request("POST", f"domains/{zone_id}/records", data)
 
         return result.get("success", False)
 
+    def upsert_record(
+        self, record: Union[DNSRecord, CAARecord], record_id: Optional[str] = None
+    ) -> bool:
+        """Create a record, or overwrite the record with ID record_id with a PUT."""
+        if not record_id:
+            if isinstance(record, CAARecord):
+                return self.create_caa_record(record)
+            return self.create_dns_record(record)
+
+        zone_id = self._ensure_zone_id(record.name)
+        if not zone_id:
+            print(
+                f"Error: Could not find zone for domain {record.name}", file=sys.stderr
+            )
+            return False
+
+        subdomain = self._get_subdomain(record.name, zone_id)
+        data = self._record_data(record, subdomain)
+
+        print(f"Updating {data['type']} record {record_id} for {record.name}")
+        result = self._make_request(
+            "PUT", f"domains/{zone_id}/records/{record_id}", data
+        )
+
+        return result.get("success", False)
+
+    def apply_changes(self, changes: List[RecordChange]) -> bool:
+        """Apply changes with concurrent requests, as Linode has no batch API."""
+        # Resolve all zones up front, so the threads only read the zone index
+        if self._changes_by_zone(changes) is None:
+            return False
+        # Create the pooled session before the threads share it
+        self.session
+
+        # Deletes go first, as in a batch: a record created alongside may
+        # conflict with one being deleted (e.g. a CNAME replacing an A record)
+        deletes = [c for c in changes if c.action == ChangeAction.DELETE]
+        writes = [c for c in changes if c.action != ChangeAction.DELETE]
+        with ThreadPoolExecutor(max_workers=self.HTTP_POOL_SIZE) as executor:
+            results = list(executor.map(self._apply_change, deletes))
+            results += executor.map(self._apply_change, writes)
+        return all(results)
+
     def delete_dns_record(self, record_id: str, domain: str) -> bool:
         """Delete a DNS record."""
         zone_id = self._ensure_zone_id(domain)
@@ -278,6 +381,19 @@ class LinodeDNSProvider(DNSProvider):
 
         return result.get("success", False)
 
+    def alias_record(self, name: str, content: str, ttl: int = 60) -> DNSRecord:
+        """Resolve the alias target to an A record (see set_alias_record)."""
+        # Resolve domain to IP
+        domain = content
+        print(f"Trying to resolve: {domain}")
+        ip_address = socket.gethostbyname(domain)
+        print(f"✅ Resolved {domain} to IP: {ip_address}")
+
+        if not ip_address:
+            raise socket.gaierror("Could not resolve any variant of the domain")
+
+        return DNSRecord(id=None, name=name, type=RecordType.A, content=ip_address, ttl=ttl)
+
     def set_alias_record(
         self,
         name: str,
@@ -290,14 +406,7 @@ class LinodeDNSProvider(DNSProvider):
         Linode doesn't allow CAA and CNAME records on the same subdomain.
         Using A records solves this limitation.
         """
-        # Resolve domain to IP
-        domain = content
-        print(f"Trying to resolve: {domain}")
-        ip_address = socket.gethostbyname(domain)
-        print(f"✅ Resolved {domain} to IP: {ip_address}")
-
-        if not ip_address:
-            raise socket.gaierror("Could not resolve any variant of the domain")
+        ip_address = self.alias_record(name, content, ttl).content
 
         # Delete any existing CNAME records for this name (clean transition)
         existing_cname_records = self.get_dns_records(name, RecordType.CNAME)
@@ -323,18 +432,8 @@ class LinodeDNSProvider(DNSProvider):
 
         subdomain = self._get_subdomain(caa_record.name, zone_id)
 
-        # Clean up the value
-        clean_value = caa_record.value.strip('"')
-
-        # Linode CAA format uses separate tag and target fields
-        # The flags are not supported in Linode API (always 0)
-        data = {
-            "type": "CAA",
-            "name": subdomain,
-            "tag": caa_record.tag,
-            "target": clean_value,
-            "ttl_sec": caa_record.ttl,
-        }
+        data = self._record_data(caa_record, subdomain)
+        clean_value = data["target"]
 
         print(
             f"Adding CAA record for {caa_record.name} with tag {caa_record.tag} and value {clean_value}"
@@ -4,13 +4,25 @@ import os
 import requests
 import xml.etree.ElementTree as ET
 from typing import Dict, List, Optional
-from .base import DNSProvider, DNSRecord, CAARecord, RecordType
+from .base import (
+    DNSProvider,
+    DNSRecord,
+    CAARecord,
+    RecordType,
+    ChangeAction,
+    RecordChange,
+)
 
 
 class NamecheapDNSProvider(DNSProvider):
     """Namecheap DNS provider implementation."""
 
     DETECT_ENV = "NAMECHEAP_API_KEY"
+
+    # The API allows 20 requests per minute and 700 per hour
+    RATE_LIMIT = 700 / 3600
+    RATE_BURST = 20
+
     CERTBOT_PLUGIN = "dns-namecheap"
     CERTBOT_PLUGIN_MODULE = "certbot_dns_namecheap"
     CERTBOT_PACKAGE = "certbot-dns-namecheap==1.0.0"
@@ -84,7 +96,10 @@ class NamecheapDNSProvider(DNSProvider):
         request_params.update(params)
         
         try:
-            response = requests.post(self.base_url, data=request_params)
+            # Every command used here reads or replaces state, so it is safe to retry
+            response = self._send(
+                "POST", self.base_url, idempotent=True, data=request_params
+            )
             response.raise_for_status()
             
             # Parse XML response
@@ -142,7 +157,35 @@ class NamecheapDNSProvider(DNSProvider):
         
         sld, tld = domain_info
         print(f"Getting DNS records for {name} (SLD: {sld}, TLD: {tld})")
-        
+        return self._get_hosts(sld, tld, record_type) or []
+
+    def get_records_by_name(
+        self, names: List[str]
+    ) -> Optional[Dict[str, List[DNSRecord]]]:
+        """Get the records of several names with one getHosts call per domain."""
+        records: Dict[str, List[DNSRecord]] = {name.lower(): [] for name in names}
+        domains = set()
+        for name in names:
+            domain_info = self._get_domain_info(name)
+            if not domain_info:
+                print(f"Could not determine domain info from {name}")
+                return None
+            domains.add(domain_info)
+
+        for sld, tld in domains:
+            hosts = self._get_hosts(sld, tld)
+            if hosts is None:
+                return None
+            for record in hosts:
+                if record.name.lower() in records:
+                    records[record.name.lower()].append(record)
+
+        return records
+
+    def _get_hosts(
+        self, sld: str, tld: str, record_type: Optional[RecordType] = None
+    ) -> Optional[List[DNSRecord]]:
+        """Get the host records of a domain, or None if the request failed."""
         result = self._make_request(
             "namecheap.domains.dns.getHosts",
             SLD=sld,
@@ -150,7 +193,7 @@ class NamecheapDNSProvider(DNSProvider):
         )
         
         if not result.get("success", False):
-            return []
+            return None
         
         # Parse the host records from XML response
         records = []
@@ -209,30 +252,15 @@ class NamecheapDNSProvider(DNSProvider):
         # Get existing records
         existing_records = self.get_dns_records(record.name)
         
-        # Extract hostname from domain
-        if record.name == sld + "." + tld:
-            hostname = "@"
-        else:
-            hostname = record.name.replace("." + sld + "." + tld, "")
-        
         # Remove existing records of the same type and name
         filtered_records = [
-            r for r in existing_records 
+            self._host_entry(r, sld, tld)
+            for r in existing_records 
             if not (r.name == record.name and r.type == record.type)
         ]
         
         # Add new record
-        new_record = {
-            "HostName": hostname,
-            "RecordType": record.type.value,
-            "Address": record.content,
-            "TTL": str(record.ttl)
-        }
-        
-        if record.type == RecordType.MX and record.priority:
-            new_record["MXPref"] = str(record.priority)
-        
-        filtered_records.append(new_record)
+        filtered_records.append(self._host_entry(record, sld, tld))
         
         # Set all records
         return self._set_dns_records(sld, tld, filtered_records)
@@ -249,7 +277,9 @@ class NamecheapDNSProvider(DNSProvider):
         existing_records = self.get_dns_records(domain)
         
         # Remove the record with the matching ID
-        filtered_records = [r for r in existing_records if r.id != record_id]
+        filtered_records = [
+            self._host_entry(r, sld, tld) for r in existing_records if r.id != record_id
+        ]
         
         return self._set_dns_records(sld, tld, filtered_records)
 
@@ -261,6 +291,63 @@ class NamecheapDNSProvider(DNSProvider):
         print(f"You need to manually add CAA record for {caa_record.name}")
         return True  # Return True to not break the workflow
 
+    def apply_changes(self, changes: List[RecordChange]) -> bool:
+        """Apply changes with one setHosts call per domain.
+
+        setHosts replaces all host records of a domain, so the current hosts
+        are fetched once, all changes are applied to them, and the result is
+        written back.
+        """
+        domains: Dict[tuple, List[RecordChange]] = {}
+        for change in changes:
+            domain_info = self._get_domain_info(change.record.name)
+            if not domain_info:
+                print(f"Could not determine domain info from {change.record.name}")
+                return False
+            domains.setdefault(domain_info, []).append(change)
+
+        success = True
+        for (sld, tld), domain_changes in domains.items():
+            records = self._get_hosts(sld, tld)
+            if records is None:
+                success = False
+                continue
+
+            for change in domain_changes:
+                if isinstance(change.record, CAARecord):
+                    success = self.create_caa_record(change.record) and success
+                    continue
+                if change.action != ChangeAction.CREATE and change.record_id:
+                    records = [r for r in records if r.id != change.record_id]
+                if change.action != ChangeAction.DELETE:
+                    records.append(change.record)
+
+            success = self._set_dns_records(
+                sld, tld, [self._host_entry(r, sld, tld) for r in records]
+            ) and success
+
+        return success
+
+    def _host_entry(self, record: DNSRecord, sld: str, tld: str) -> Dict:
+        """Convert a record to a setHosts host entry."""
+        # Extract hostname from domain
+        if record.name == sld + "." + tld:
+            hostname = "@"
+        else:
+            hostname = record.name.replace("." + sld + "." + tld, "")
+
+        entry = {
+            "HostName": hostname,
+            "RecordType": record.type.value,
+            "Address": record.content,
+            "TTL": str(record.ttl)
+        }
+
+        if record.type == RecordType.MX and record.priority:
+            entry["MXPref"] = str(record.priority)
+
+        return entry
+
     def _set_dns_records(self, sld: str, tld: str, records: List[Dict]) -> bool:
         """Set DNS records for a domain."""
         # Prepare host records parameters
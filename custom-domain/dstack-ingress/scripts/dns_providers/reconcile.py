@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+from typing import Dict, List, Optional, Tuple, Union
+from .base import (
+    DNSProvider,
+    DNSRecord,
+    CAARecord,
+    RecordType,
+    ChangeAction,
+    RecordChange,
+)
+
+DesiredRecord = Union[DNSRecord, CAARecord]
+
+
+def _record_key(record: DesiredRecord) -> Tuple:
+    """Records with the same key replace each other: same type, and same tag for CAA."""
+    if isinstance(record, CAARecord):
+        return ("CAA", record.tag)
+    if record.type == RecordType.CAA:
+        return ("CAA", (record.data or {}).get("tag"))
+    return (record.type.value,)
+
+
+def _record_value(record: DesiredRecord) -> str:
+    """The value of a record, normalized for comparison across providers."""
+    if isinstance(record, CAARecord):
+        return record.value.strip('"')
+    if record.type == RecordType.CAA:
+        return str((record.data or {}).get("value", "")).strip('"')
+    value = record.content or ""
+    if record.type == RecordType.TXT:
+        return value.strip('"')
+    if record.type == RecordType.CNAME:
+        return value.rstrip(".").lower()
+    return value
+
+
+class DNSReconciler:
+    """Brings the records of a set of names to a desired state.
+
+    The current records of all names are fetched at once (one listing per zone
+    for most providers), compared with the desired records, and only the
+    differences are applied, in one batch per zone. Records of other names, and
+    of other types (or CAA tags) than the desired ones, are left alone.
+
+    Desired alias and CAA records are the ones the provider writes, as returned
+    by alias_record() and caa_records().
+    """
+
+    def __init__(self, provider: DNSProvider):
+        self.provider = provider
+        self.current: Dict[str, List[DNSRecord]] = {}
+
+    def plan(self, desired: List[DesiredRecord]) -> Optional[List[RecordChange]]:
+        """Compute the changes needed to reach the desired records, or None on error."""
+        names = list(dict.fromkeys(record.name.lower() for record in desired))
+        current = self.provider.get_records_by_name(names)
+        if current is None:
+            return None
+        self.current = current
+
+        # Group desired records by name and key
+        wanted: Dict[Tuple[str, Tuple], List[DesiredRecord]] = {}
+        for record in desired:
+            wanted.setdefault((record.name.lower(), _record_key(record)), []).append(record)
+        # An alias resolved to an A record replaces any CNAME of the name
+        for name, key in list(wanted):
+            if key == (RecordType.A.value,) and (name, (RecordType.CNAME.value,)) not in wanted:
+                wanted[(name, (RecordType.CNAME.value,))] = []
+
+        changes: List[RecordChange] = []
+        for (name, key), records in wanted.items():
+            existing = [
+                record
+                for record in current.get(name, [])
+                if _record_key(record) == key and record.id
+            ]
+            existing_values = {_record_value(record) for record in existing}
+            wanted_values = {_record_value(record) for record in records}
+            missing = [
+                record
+                for value, record in {_record_value(r): r for r in records}.items()
+                if value not in existing_values
+            ]
+            stale = [r for r in existing if _record_value(r) not in wanted_values]
+            if key[0] == "CAA" and self.provider.MERGES_CAA:
+                # Values are only ever added to the record set, see caa_records()
+                stale = []
+
+            # Replace stale records in place where possible, then create or delete the rest
+            for record in missing:
+                replaced = stale.pop(0) if stale else None
+                changes.append(
+                    RecordChange(
+                        ChangeAction.UPSERT, record, replaced.id if replaced else None
+                    )
+                )
+            for record in stale:
+                changes.append(RecordChange(ChangeAction.DELETE, record, record.id))
+
+        return changes
+
+    def describe(self, change: RecordChange) -> str:
+        """Describe a planned change in one line."""
+        record = change.record
+        record_type = "CAA" if isinstance(record, CAARecord) else record.type.value
+        if change.action == ChangeAction.DELETE:
+            return f"- {record_type} {record.name} {_record_value(record)}"
+        if change.record_id:
+            previous = next(
+                (
+                    r
+                    for r in self.current.get(record.name.lower(), [])
+                    if r.id == change.record_id
+                ),
+                None,
+            )
+            old_value = _record_value(previous) if previous else change.record_id
+            return f"~ {record_type} {record.name} {old_value} -> {_record_value(record)}"
+        return f"+ {record_type} {record.name} {_record_value(record)}"
+
+    def apply(self, changes: List[RecordChange]) -> bool:
+        """Apply planned changes in batches."""
+        if not changes:
+            return True
+        return self.provider.apply_changes(changes)
@@ -2,8 +2,16 @@
 
 import os
 import sys
-from typing import List, Optional
-from .base import DNSProvider, DNSRecord, CAARecord, RecordType
+from typing import Dict, List, Optional, Union
+from .base import (
+    DNSProvider,
+    DNSRecord,
+    CAARecord,
+    RecordType,
+    ChangeAction,
+    RecordChange,
+    HTTP_MAX_RETRIES,
+)
 
 
 
@@ -11,6 +19,20 @@ class Route53DNSProvider(DNSProvider):
     """DNS provider implementation for AWS Route53."""
 
     DETECT_ENV = "AWS_ACCESS_KEY_ID"
+    SUPPORTS_UPSERT = True
+    MERGES_CAA = True
+
+    # CAA issuers written to the apex for this bridge (Let's Encrypt + AWS ACM)
+    CAA_ISSUERS = [
+        "letsencrypt.org",
+        "amazon.com",
+        "amazontrust.com",
+        "awstrust.com",
+        "amazonaws.com",
+    ]
+
+    # Maximum number of changes per ChangeBatch
+    BATCH_SIZE = 1000
 
     # Certbot configuration
     CERTBOT_PLUGIN = "dns-route53"
@@ -33,13 +55,38 @@ class Route53DNSProvider(DNSProvider):
             )
 
         try:
-            self.client = self.boto3.client("route53")
+            from botocore.config import Config
+
+            # Route53 allows 5 requests per second per account; the adaptive
+            # mode paces requests client-side and backs off when throttled
+            self.client = self.boto3.client(
+                "route53",
+                config=Config(
+                    retries={"max_attempts": HTTP_MAX_RETRIES + 1, "mode": "adaptive"}
+                ),
+            )
         except Exception as e:
             raise ValueError(f"Failed to initialize Route53 client: {e}")
 
         self.hosted_zone_id: Optional[str] = None
         self.hosted_zone_name: Optional[str] = None
 
+    def _zone_call(self, operation, HostedZoneId: str, **params):
+        """Call a zone-scoped API operation, once more if the cached zone ID is stale."""
+        try:
+            return operation(HostedZoneId=HostedZoneId, **params)
+        except Exception as e:
+            error = getattr(e, "response", None) or {}
+            if error.get("Error", {}).get("Code") != "NoSuchHostedZone":
+                raise
+            new_zone_id = self._refresh_zone_id(HostedZoneId)
+            if new_zone_id is None:
+                raise
+            print(
+                f"Hosted zone {HostedZoneId} no longer exists, retrying with {new_zone_id}",
+                file=sys.stderr,
+            )
+            return operation(HostedZoneId=new_zone_id, **params)
 
     def setup_certbot_credentials(self) -> bool:
         """Setup AWS credentials file for certbot.
@@ -76,61 +123,43 @@ class Route53DNSProvider(DNSProvider):
             print(f"✗ AWS Route53 credential validation failed: {e}", file=sys.stderr)
             return False
 
-    def _get_hosted_zone_info(self, domain: str) -> Optional[tuple[str, str]]:
-        """Get the hosted zone ID and name for a domain.
+    def _zone_cache_key(self) -> str:
+        account = os.getenv("AWS_ACCESS_KEY_ID") or os.getenv("AWS_PROFILE", "default")
+        return f"route53-{self._credential_digest(account)}"
 
-        Returns:
-            Tuple of (hosted_zone_id, hosted_zone_name) or None
-        """
+    def _list_zones(self) -> Optional[Dict[str, str]]:
+        """List all hosted zones of the account."""
         try:
-            # List all hosted zones
             paginator = self.client.get_paginator("list_hosted_zones")
-
-            best_match_id = None
-            best_match_name = None
-            best_match_length = 0
-
+            zones: Dict[str, str] = {}
             for page in paginator.paginate():
                 for zone in page["HostedZones"]:
                     zone_name = zone["Name"].rstrip(".")  # Remove trailing dot
                     zone_id = zone["Id"].split("/")[-1]  # Extract ID from full path
-
-                    # Exact match
-                    if domain == zone_name:
-                        return (zone_id, zone_name)
-
-                    # Subdomain match - find the most specific (longest) zone
-                    if (
-                        domain.endswith(f".{zone_name}")
-                        and len(zone_name) > best_match_length
-                    ):
-                        best_match_length = len(zone_name)
-                        best_match_id = zone_id
-                        best_match_name = zone_name
-
-            if best_match_id:
-                return (best_match_id, best_match_name)
-            else:
-                print(f"No hosted zone found for domain: {domain}", file=sys.stderr)
-                return None
-
+                    # Keep the first of several zones with the same name
+                    zones.setdefault(zone_name, zone_id)
+            return zones
         except Exception as e:
-            print(f"Error getting hosted zone: {e}", file=sys.stderr)
+            print(f"Error listing hosted zones: {e}", file=sys.stderr)
             return None
 
+    def _get_hosted_zone_info(self, domain: str) -> Optional[tuple[str, str]]:
+        """Get the hosted zone ID and name for a domain.
+
+        Returns:
+            Tuple of (hosted_zone_id, hosted_zone_name) or None
+        """
+        zone_info = self.find_zone(domain)
+        if not zone_info:
+            print(f"No hosted zone found for domain: {domain}", file=sys.stderr)
+        return zone_info
+
     def _ensure_hosted_zone_id(self, domain: str) -> Optional[str]:
         """Ensure we have a hosted zone ID for the domain, fetching if necessary."""
-        # Check if we can reuse cached zone
-        if self.hosted_zone_id and self.hosted_zone_name:
-            if domain == self.hosted_zone_name or domain.endswith(
-                f".{self.hosted_zone_name}"
-            ):
-                return self.hosted_zone_id
-
-        # Fetch zone info
         zone_info = self._get_hosted_zone_info(domain)
-        if zone_info:
-            self.hosted_zone_id, self.hosted_zone_name = zone_info
+        if not zone_info:
+            return None
+        self.hosted_zone_id, self.hosted_zone_name = zone_info
         return self.hosted_zone_id
 
     def _normalize_record_name(self, name: str) -> str:
@@ -139,6 +168,38 @@ class Route53DNSProvider(DNSProvider):
             return f"{name}."
         return name
 
+    def _list_record_sets(
+        self, hosted_zone_id: str, name: str, record_type: Optional[str] = None
+    ) -> List[Dict]:
+        """List the record sets of a name, optionally of one type only.
+
+        Route53 returns record sets sorted by name and type, so listing starts at
+        the name (and type) and stops at the first record set past it. The cost
+        depends on the number of record sets of the name, not the zone size.
+        """
+        # Route53 returns names in lowercase with "*" escaped as \052
+        normalized_name = self._normalize_record_name(name).lower().replace("\\052", "*")
+        params = {"HostedZoneId": hosted_zone_id, "StartRecordName": normalized_name}
+        if record_type:
+            params["StartRecordType"] = record_type
+
+        record_sets = []
+        while True:
+            response = self._zone_call(self.client.list_resource_record_sets, **params)
+            for record_set in response["ResourceRecordSets"]:
+                record_name = record_set["Name"].replace("\\052", "*")
+                if record_name != normalized_name or (
+                    record_type and record_set["Type"] != record_type
+                ):
+                    return record_sets
+                record_sets.append(record_set)
+            if not response.get("IsTruncated"):
+                return record_sets
+            params["StartRecordName"] = response["NextRecordName"]
+            params["StartRecordType"] = response["NextRecordType"]
+            if "NextRecordIdentifier" in response:
+                params["StartRecordIdentifier"] = response["NextRecordIdentifier"]
+
     def get_dns_records(
         self, name: str, record_type: Optional[RecordType] = None
     ) -> List[DNSRecord]:
@@ -150,59 +211,55 @@ class Route53DNSProvider(DNSProvider):
             )
             return []
 
-        normalized_name = self._normalize_record_name(name)
-
         print(f"Checking for existing DNS records for {name}")
 
         try:
-            # List resource record sets for the hosted zone
-            paginator = self.client.get_paginator("list_resource_record_sets")
             records = []
 
-            for page in paginator.paginate(HostedZoneId=hosted_zone_id):
-                for record_set in page["ResourceRecordSets"]:
-                    record_name = record_set["Name"]
-                    record_type_str = record_set["Type"]
-
-                    # Filter by name
-                    if record_name != normalized_name:
-                        continue
-
-                    # Filter by type if specified
-                    if record_type and record_type_str != record_type.value:
-                        continue
-
-                    # Parse record content
+            for record_set in self._list_record_sets(
+                hosted_zone_id, name, record_type.value if record_type else None
+            ):
+                record_name = record_set["Name"]
+                record_type_str = record_set["Type"]
+
+                # Skip types this module does not handle (e.g. SOA on the apex)
+                if record_type_str not in RecordType.__members__:
+                    continue
+
+                # Parse record content: (content, data) of each record
+                values = []
+
+                if record_type_str == "CAA":
+                    # CAA records have special format, one record per value as
+                    # create_caa_record() merges the issuers into one record set
+                    for rr in record_set.get("ResourceRecords", []):
+                        caa_value = rr["Value"]
+                        # Format: "flags tag value"
+                        parts = caa_value.split(" ", 2)
+                        if len(parts) >= 3:
+                            flags = int(parts[0])
+                            tag = parts[1]
+                            value = parts[2].strip('"')
+                            data = {"flags": flags, "tag": tag, "value": value}
+                            values.append((caa_value, data))
+                else:
+                    # Standard records
                     content = ""
-                    data = None
-
-                    if record_type_str == "CAA":
-                        # CAA records have special format
-                        if "ResourceRecords" in record_set:
-                            caa_value = record_set["ResourceRecords"][0]["Value"]
-                            # Format: "flags tag value"
-                            parts = caa_value.split(" ", 2)
-                            if len(parts) >= 3:
-                                flags = int(parts[0])
-                                tag = parts[1]
-                                value = parts[2].strip('"')
-                                content = caa_value
-                                data = {"flags": flags, "tag": tag, "value": value}
-                    else:
-                        # Standard records
-                        if "ResourceRecords" in record_set:
-                            # Get first record value (multiple values would need separate DNSRecord objects)
-                            content = record_set["ResourceRecords"][0]["Value"]
-                            # Remove quotes from TXT records
-                            if record_type_str == "TXT":
-                                content = content.strip('"')
-                        elif "AliasTarget" in record_set:
-                            # Alias record (Route53 specific)
-                            content = record_set["AliasTarget"]["DNSName"].rstrip(".")
-
-                    # Route53 doesn't have persistent record IDs, use name+type as identifier
-                    record_id = f"{record_name}:{record_type_str}"
-
+                    if "ResourceRecords" in record_set:
+                        # Get first record value (multiple values would need separate DNSRecord objects)
+                        content = record_set["ResourceRecords"][0]["Value"]
+                        # Remove quotes from TXT records
+                        if record_type_str == "TXT":
+                            content = content.strip('"')
+                    elif "AliasTarget" in record_set:
+                        # Alias record (Route53 specific)
+                        content = record_set["AliasTarget"]["DNSName"].rstrip(".")
+                    values.append((content, None))
+
+                # Route53 doesn't have persistent record IDs, use name+type as identifier
+                record_id = f"{record_name}:{record_type_str}"
+
+                for content, data in values:
                     records.append(
                         DNSRecord(
                             id=record_id,
@@ -222,6 +279,13 @@ class Route53DNSProvider(DNSProvider):
             print(f"Error getting DNS records: {e}", file=sys.stderr)
             return []
 
+    def _record_value(self, record: DNSRecord) -> str:
+        """Format the value of a record as Route53 expects it."""
+        if record.type == RecordType.TXT:
+            # TXT records need to be quoted
+            return f'"{record.content}"'
+        return record.content
+
     def create_dns_record(self, record: DNSRecord) -> bool:
         """Create a DNS record."""
         hosted_zone_id = self._ensure_hosted_zone_id(record.name)
@@ -234,12 +298,7 @@ class Route53DNSProvider(DNSProvider):
 
         normalized_name = self._normalize_record_name(record.name)
 
-        # Prepare record value
-        if record.type == RecordType.TXT:
-            # TXT records need to be quoted
-            record_value = f'"{record.content}"'
-        else:
-            record_value = record.content
+        record_value = self._record_value(record)
 
         # Prepare change batch
         change_batch = {
@@ -258,8 +317,10 @@ class Route53DNSProvider(DNSProvider):
 
         try:
             print(f"Adding {record.type.value} record for {record.name}")
-            response = self.client.change_resource_record_sets(
-                HostedZoneId=hosted_zone_id, ChangeBatch=change_batch
+            response = self._zone_call(
+                self.client.change_resource_record_sets,
+                HostedZoneId=hosted_zone_id,
+                ChangeBatch=change_batch,
             )
 
             # Check if change was successful
@@ -277,6 +338,151 @@ class Route53DNSProvider(DNSProvider):
             print(f"Error creating DNS record: {e}", file=sys.stderr)
             return False
 
+    def upsert_record(
+        self, record: Union[DNSRecord, CAARecord], record_id: Optional[str] = None
+    ) -> bool:
+        """Write a record with a Route53 UPSERT change.
+
+        Route53 record sets are identified by name and type, so record_id is not
+        needed: the UPSERT replaces the record set in place. CAA records go
+        through create_caa_record, which merges them into the apex record set,
+        so a CAA record set record_id under another name is deleted.
+        """
+        if isinstance(record, CAARecord):
+            if not self.create_caa_record(record):
+                return False
+            if record_id:
+                stale_name = record_id.split(":", 1)[0]
+                apex_name = self._normalize_record_name(self.hosted_zone_name)
+                if self._normalize_record_name(stale_name).lower() != apex_name.lower():
+                    return self.delete_dns_record(record_id, record.name)
+            return True
+        return self.create_dns_record(record)
+
+    def caa_records(self, record: CAARecord) -> List[CAARecord]:
+        """The issuers create_caa_record() merges into the apex CAA record set."""
+        zone_info = self.find_zone(record.name)
+        if not zone_info:
+            return [record]
+        return [
+            CAARecord(
+                name=zone_info[1],
+                flags=record.flags,
+                tag=record.tag,
+                value=issuer,
+                ttl=record.ttl,
+            )
+            for issuer in self.CAA_ISSUERS
+        ]
+
+    def apply_changes(self, changes: List[RecordChange]) -> bool:
+        """Apply changes with one ChangeBatch per hosted zone.
+
+        Route53 identifies record sets by name and type, so creations and
+        upserts of the same name and type are merged into one record set, which
+        replaces the existing one. CAA changes are merged into the apex record
+        set as in create_caa_record(). Deletions go first in the ChangeBatch, so
+        a record set may replace one of another type (e.g. an A record a CNAME).
+        """
+        zones = self._changes_by_zone(changes)
+        if zones is None:
+            return False
+
+        success = True
+        for (hosted_zone_id, zone_name), zone_changes in zones.items():
+            record_sets: Dict[tuple, Dict] = {}
+            deletes: List[tuple] = []
+            caa_record: Optional[CAARecord] = None
+
+            for change in zone_changes:
+                record = change.record
+                if change.action == ChangeAction.DELETE:
+                    name, record_type = change.record_id.split(":", 1)
+                    deletes.append((name, record_type))
+                elif isinstance(record, CAARecord):
+                    caa_record = caa_record or record
+                    if change.record_id:
+                        # Stale unless it is the apex record set written below
+                        deletes.append(tuple(change.record_id.split(":", 1)))
+                else:
+                    name = self._normalize_record_name(record.name)
+                    record_set = record_sets.setdefault(
+                        (name.lower(), record.type.value),
+                        {
+                            "Name": name,
+                            "Type": record.type.value,
+                            "TTL": record.ttl,
+                            "ResourceRecords": [],
+                        },
+                    )
+                    value = {"Value": self._record_value(record)}
+                    if value not in record_set["ResourceRecords"]:
+                        record_set["ResourceRecords"].append(value)
+
+            if caa_record:
+                apex_caa = self._apex_caa_record_set(hosted_zone_id, zone_name, caa_record)
+                if not apex_caa:
+                    success = False
+                    continue
+                record_sets[(apex_caa["Name"].lower(), "CAA")] = apex_caa
+
+            batch = []
+            try:
+                # Several records of a record set share its ID
+                for name, record_type in dict.fromkeys(deletes):
+                    key = (self._normalize_record_name(name).lower(), record_type)
+                    if key in record_sets:
+                        continue  # Replaced by an upsert of the same record set
+                    # A DELETE must match the record set exactly
+                    for record_set in self._list_record_sets(
+                        hosted_zone_id, name, record_type
+                    )[:1]:
+                        batch.append({"Action": "DELETE", "ResourceRecordSet": record_set})
+            except Exception as e:
+                print(f"Error looking up records to delete: {e}", file=sys.stderr)
+                success = False
+                continue
+            batch += [
+                {"Action": "UPSERT", "ResourceRecordSet": record_set}
+                for record_set in record_sets.values()
+            ]
+
+            for start in range(0, len(batch), self.BATCH_SIZE):
+                success = (
+                    self._change_record_sets(
+                        hosted_zone_id, zone_name, batch[start:start + self.BATCH_SIZE]
+                    )
+                    and success
+                )
+
+        return success
+
+    def _change_record_sets(
+        self, hosted_zone_id: str, zone_name: str, changes: List[Dict]
+    ) -> bool:
+        """Submit a ChangeBatch."""
+        try:
+            print(f"Applying {len(changes)} record set changes in zone {zone_name}")
+            response = self._zone_call(
+                self.client.change_resource_record_sets,
+                HostedZoneId=hosted_zone_id,
+                ChangeBatch={"Changes": changes},
+            )
+
+            change_info = response.get("ChangeInfo", {})
+            if change_info.get("Status") in ["PENDING", "INSYNC"]:
+                return True
+            else:
+                print(
+                    f"Unexpected change status: {change_info.get('Status')}",
+                    file=sys.stderr,
+                )
+                return False
+
+        except Exception as e:
+            print(f"Error applying DNS changes: {e}", file=sys.stderr)
+            return False
+
     def delete_dns_record(self, record_id: str, domain: str) -> bool:
         """Delete a DNS record.
 
@@ -301,19 +507,10 @@ class Route53DNSProvider(DNSProvider):
 
         try:
             # First, get the current record to know its full details
-            paginator = self.client.get_paginator("list_resource_record_sets")
-            record_set_to_delete = None
-
-            for page in paginator.paginate(HostedZoneId=hosted_zone_id):
-                for record_set in page["ResourceRecordSets"]:
-                    if (
-                        record_set["Name"] == record_name
-                        and record_set["Type"] == record_type
-                    ):
-                        record_set_to_delete = record_set
-                        break
-                if record_set_to_delete:
-                    break
+            record_sets = self._list_record_sets(
+                hosted_zone_id, record_name, record_type
+            )
+            record_set_to_delete = record_sets[0] if record_sets else None
 
             if not record_set_to_delete:
                 print(f"Record not found: {record_id}", file=sys.stderr)
@@ -327,8 +524,10 @@ class Route53DNSProvider(DNSProvider):
             }
 
             print(f"Deleting record: {record_id}")
-            response = self.client.change_resource_record_sets(
-                HostedZoneId=hosted_zone_id, ChangeBatch=change_batch
+            response = self._zone_call(
+                self.client.change_resource_record_sets,
+                HostedZoneId=hosted_zone_id,
+                ChangeBatch=change_batch,
             )
 
             change_info = response.get("ChangeInfo", {})
@@ -367,41 +566,61 @@ class Route53DNSProvider(DNSProvider):
             return False
 
         apex_name = self.hosted_zone_name  # apex of the zone
-        normalized_name = self._normalize_record_name(apex_name)
+        record_set = self._apex_caa_record_set(hosted_zone_id, apex_name, caa_record)
+        if not record_set:
+            return False
 
-        # Hard-coded issuers for this bridge (Let's Encrypt + AWS ACM)
-        required_issuers = [
-            "letsencrypt.org",
-            "amazon.com",
-            "amazontrust.com",
-            "awstrust.com",
-            "amazonaws.com",
-        ]
+        # Prepare change batch with the merged RRSet
+        change_batch = {"Changes": [{"Action": "UPSERT", "ResourceRecordSet": record_set}]}
+
+        try:
+            print(
+                f"Setting merged CAA record set for apex {apex_name}: "
+                f"{', '.join(rr['Value'] for rr in record_set['ResourceRecords'])}"
+            )
+            response = self._zone_call(
+                self.client.change_resource_record_sets,
+                HostedZoneId=hosted_zone_id,
+                ChangeBatch=change_batch,
+            )
+
+            change_info = response.get("ChangeInfo", {})
+            if change_info.get("Status") in ["PENDING", "INSYNC"]:
+                return True
+            else:
+                print(
+                    f"Unexpected change status for CAA apex update: "
+                    f"{change_info.get('Status')}",
+                    file=sys.stderr,
+                )
+                return False
+
+        except Exception as e:
+            print(f"Error creating/merging apex CAA record: {e}", file=sys.stderr)
+            return False
+
+    def _apex_caa_record_set(
+        self, hosted_zone_id: str, apex_name: str, caa_record: CAARecord
+    ) -> Optional[Dict]:
+        """Build the apex CAA record set: the existing values plus the required issuers."""
+        normalized_name = self._normalize_record_name(apex_name)
 
         # Build the desired CAA "issue" values from the issuers
         required_values = [
             f'{caa_record.flags} {caa_record.tag} "{issuer}"'
-            for issuer in required_issuers
+            for issuer in self.CAA_ISSUERS
         ]
 
         # Look up any existing CAA RRSet on the apex
-        paginator = self.client.get_paginator("list_resource_record_sets")
         existing_rrset = None
 
         try:
-            for page in paginator.paginate(HostedZoneId=hosted_zone_id):
-                for record_set in page["ResourceRecordSets"]:
-                    if (
-                        record_set["Name"] == normalized_name
-                        and record_set["Type"] == "CAA"
-                    ):
-                        existing_rrset = record_set
-                        break
-                if existing_rrset:
-                    break
+            record_sets = self._list_record_sets(hosted_zone_id, apex_name, "CAA")
+            if record_sets:
+                existing_rrset = record_sets[0]
         except Exception as e:
             print(f"Error listing existing CAA records: {e}", file=sys.stderr)
-            return False
+            return None
 
         existing_values: List[str] = []
         ttl = caa_record.ttl
@@ -426,43 +645,11 @@ class Route53DNSProvider(DNSProvider):
 
         if not merged_values:
             print("No CAA values to set on apex after merge; aborting", file=sys.stderr)
-            return False
+            return None
 
-        # Prepare change batch with the merged RRSet
-        change_batch = {
-            "Changes": [
-                {
-                    "Action": "UPSERT",
-                    "ResourceRecordSet": {
-                        "Name": normalized_name,
-                        "Type": "CAA",
-                        "TTL": ttl,
-                        "ResourceRecords": [{"Value": v} for v in merged_values],
-                    },
-                }
-            ]
+        return {
+            "Name": normalized_name,
+            "Type": "CAA",
+            "TTL": ttl,
+            "ResourceRecords": [{"Value": v} for v in merged_values],
         }
-
-        try:
-            print(
-                f"Setting merged CAA record set for apex {apex_name}: "
-                f"{', '.join(merged_values)}"
-            )
-            response = self.client.change_resource_record_sets(
-                HostedZoneId=hosted_zone_id, ChangeBatch=change_batch
-            )
-
-            change_info = response.get("ChangeInfo", {})
-            if change_info.get("Status") in ["PENDING", "INSYNC"]:
-                return True
-            else:
-                print(
-                    f"Unexpected change status for CAA apex update: "
-                    f"{change_info.get('Status')}",
-                    file=sys.stderr,
-                )
-                return False
-
-        except Exception as e:
-            print(f"Error creating/merging apex CAA record: {e}", file=sys.stderr)
-            return False
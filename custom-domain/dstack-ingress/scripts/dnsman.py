@@ -1,40 +1,229 @@
 #!/usr/bin/env python3
 
-from dns_providers import DNSProviderFactory
+from dns_providers import (
+    DNSProviderFactory,
+    DNSReconciler,
+    CAARecord,
+    DNSRecord,
+    RecordType,
+)
 import argparse
+import contextlib
+import json
 import os
 import sys
+from typing import Any, Dict, Iterator, List, TextIO
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 
+def read_domains(path: str) -> List[str]:
+    """Read one domain per line, skipping blank lines and comments."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    domains = [line.strip() for line in lines]
+    return [d for d in domains if d and not d.startswith("#")]
+
+
+def reconcile(provider, args):
+    """Bring the alias, TXT and CAA records of all domains to their desired state."""
+    domains = read_domains(args.domains_file)
+    if not domains:
+        print("Error: No domains to reconcile", file=sys.stderr)
+        sys.exit(1)
+    if args.txt_content and not args.txt_prefix:
+        print("Error: --txt-prefix is required with --txt-content", file=sys.stderr)
+        sys.exit(1)
+    if bool(args.caa_tag) != bool(args.caa_value):
+        print("Error: --caa-tag and --caa-value go together", file=sys.stderr)
+        sys.exit(1)
+
+    desired = []
+    for domain in domains:
+        if args.alias_target:
+            desired.append(provider.alias_record(domain, args.alias_target))
+        if args.txt_content:
+            desired.append(
+                DNSRecord(
+                    id=None,
+                    name=f"{args.txt_prefix}.{domain}",
+                    type=RecordType.TXT,
+                    content=args.txt_content,
+                )
+            )
+        if args.caa_tag:
+            desired.extend(
+                provider.caa_records(
+                    CAARecord(
+                        name=domain, flags=0, tag=args.caa_tag, value=args.caa_value
+                    )
+                )
+            )
+    if not desired:
+        print("Error: Nothing to reconcile", file=sys.stderr)
+        sys.exit(1)
+
+    reconciler = DNSReconciler(provider)
+    changes = reconciler.plan(desired)
+    if changes is None:
+        print("Error: Could not fetch the current DNS records", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Plan: {len(changes)} changes for {len(desired)} records")
+    for change in changes:
+        print(f"  {reconciler.describe(change)}")
+    if args.dry_run or not changes:
+        return
+
+    if not reconciler.apply(changes):
+        print("Failed to apply the DNS plan", file=sys.stderr)
+        sys.exit(1)
+    print("Successfully applied the DNS plan")
+
+
+CAA_TAGS = ["issue", "issuewild", "iodef"]
+
+
+def read_operations(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    """Read batch operations: a JSON list, or one JSON object per line.
+
+    JSON lines are processed as they arrive, so operations can be streamed
+    to a long-running dnsman.py through a pipe.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("["):
+            yield from json.loads(line + stream.read())
+            return
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"error": f"Invalid JSON: {e}"}
+
+
+def run_operation(provider, op: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one batch operation and return its result."""
+    action = op.get("action")
+    domain = op.get("domain")
+    result = {"action": action, "domain": domain}
+    try:
+        if "error" in op:
+            raise ValueError(op["error"])
+        if not domain:
+            raise ValueError("domain is required")
+
+        if action in ("set_cname", "set_alias"):
+            if not op.get("content"):
+                raise ValueError("content is required for alias records")
+            success = provider.set_alias_record(domain, op["content"])
+        elif action == "set_txt":
+            if not op.get("content"):
+                raise ValueError("content is required for TXT records")
+            success = provider.set_txt_record(domain, op["content"])
+        elif action == "set_caa":
+            if op.get("caa_tag") not in CAA_TAGS or not op.get("caa_value"):
+                raise ValueError(
+                    f"caa_tag ({', '.join(CAA_TAGS)}) and caa_value are required for CAA records"
+                )
+            success = provider.set_caa_record(domain, op["caa_tag"], op["caa_value"])
+        else:
+            raise ValueError(f"Unknown action: {action}")
+
+        result["success"] = bool(success)
+    except Exception as e:
+        result["success"] = False
+        result["error"] = str(e)
+    return result
+
+
+def batch(provider, args):
+    """Run operations from a file or stdin with one provider, print one JSON result per line."""
+    stream = sys.stdin if args.file == "-" else open(args.file)
+    failed = 0
+    try:
+        for op in read_operations(stream):
+            # Provider progress messages go to stderr, keeping stdout valid JSON lines
+            with contextlib.redirect_stdout(sys.stderr):
+                result = run_operation(provider, op)
+            failed += not result["success"]
+            print(json.dumps(result), flush=True)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if failed:
+        sys.exit(1)
+
+
+def report_http_stats(provider):
+    """Print the provider's API throttling and retry counters to stderr, if any."""
+    stats = getattr(provider, "http_stats", None)
+    if stats and (stats["throttled"] or stats["retries"]):
+        print(
+            f"DNS API: {stats['requests']} requests, {stats['throttled']} throttled, "
+            f"{stats['retries']} retries, {stats['wait_seconds']:.1f}s waited",
+            file=sys.stderr,
+        )
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Manage DNS records across multiple providers"
     )
     parser.add_argument(
         "action",
-        choices=["set_cname", "set_alias", "set_txt", "set_caa"],
+        choices=["set_cname", "set_alias", "set_txt", "set_caa", "reconcile", "batch"],
         help="Action to perform",
     )
-    parser.add_argument("--domain", required=True, help="Domain name")
+    parser.add_argument("--domain", help="Domain name")
     parser.add_argument("--provider", help="DNS provider (cloudflare, linode)")
     # Zone ID is now handled internally by each provider
     parser.add_argument(
         "--content", help="Record content (target for alias/CNAME, value for TXT/CAA)"
     )
     parser.add_argument(
-        "--caa-tag", choices=["issue", "issuewild", "iodef"], help="CAA record tag"
+        "--caa-tag", choices=CAA_TAGS, help="CAA record tag"
     )
     parser.add_argument("--caa-value", help="CAA record value")
+    parser.add_argument(
+        "--domains-file",
+        default="-",
+        help="File with one domain per line for reconcile (default: stdin)",
+    )
+    parser.add_argument("--alias-target", help="Alias target of every domain (reconcile)")
+    parser.add_argument("--txt-prefix", help="Label of the TXT record of every domain (reconcile)")
+    parser.add_argument("--txt-content", help="TXT record content of every domain (reconcile)")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only print the plan (reconcile)"
+    )
+
+    parser.add_argument(
+        "--file",
+        default="-",
+        help="Operations for batch, as a JSON list or JSON lines (default: stdin)",
+    )
 
     args = parser.parse_args()
 
+    if args.action not in ("reconcile", "batch") and not args.domain:
+        parser.error("--domain is required")
+
+    provider = None
     try:
         # Create DNS provider instance
         provider = DNSProviderFactory.create_provider(args.provider)
 
-        if args.action == "set_cname":
+        if args.action == "reconcile":
+            reconcile(provider, args)
+
+        elif args.action == "batch":
+            batch(provider, args)
+
+        elif args.action == "set_cname":
             if not args.content:
                 print("Error: --content is required for CNAME records", file=sys.stderr)
                 sys.exit(1)
@@ -87,6 +276,9 @@ def main():
     except Exception as e:
         print(f"Unexpected error: {str(e)}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if provider is not None:
+            report_http_stats(provider)
 
 
 if __name__ == "__main__":
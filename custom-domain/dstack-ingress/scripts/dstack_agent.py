@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import stat
+import sys
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+DSTACK_SOCKET = "/var/run/dstack.sock"
+TAPPD_SOCKET = "/var/run/tappd.sock"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP/1.1 connection over a Unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def _is_socket(path: str) -> bool:
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+class GuestAgentClient:
+    """Client for the dstack guest agent, falling back to the legacy tappd API.
+
+    A single keep-alive connection is reused for all requests, and responses of
+    immutable calls (Info) are cached for the lifetime of the client.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 30):
+        """Connect to the given socket, or to the dstack socket if present, else tappd."""
+        if socket_path is None:
+            if _is_socket(DSTACK_SOCKET):
+                socket_path = DSTACK_SOCKET
+            elif _is_socket(TAPPD_SOCKET):
+                socket_path = TAPPD_SOCKET
+            else:
+                raise FileNotFoundError(
+                    f"No guest agent socket found at {DSTACK_SOCKET} or {TAPPD_SOCKET}"
+                )
+        self.socket_path = socket_path
+        self.legacy = os.path.basename(socket_path) == os.path.basename(TAPPD_SOCKET)
+        self.conn = UnixHTTPConnection(socket_path, timeout)
+        self._info: Optional[Dict[str, Any]] = None
+
+    def _get(self, path: str) -> Dict[str, Any]:
+        """GET a JSON response, reconnecting once if the kept-alive connection was closed."""
+        for attempt in range(2):
+            try:
+                self.conn.request("GET", path)
+                response = self.conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.conn.close()
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(
+                f"Guest agent request {path} failed: {response.status} {body.decode(errors='replace')}"
+            )
+        return json.loads(body)
+
+    def info(self) -> Dict[str, Any]:
+        """Get the CVM info (app ID, instance ID, TCB info, ...). Cached after the first call."""
+        if self._info is None:
+            self._info = self._get("/prpc/Tappd.Info" if self.legacy else "/Info")
+        return self._info
+
+    def get_quote(self, report_data: str) -> Dict[str, Any]:
+        """Get a TDX quote over the hex-encoded report data (up to 64 bytes)."""
+        query = urlencode({"report_data": report_data})
+        if self.legacy:
+            return self._get(f"/prpc/Tappd.RawQuote?{query}")
+        return self._get(f"/GetQuote?{query}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> "GuestAgentClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the dstack guest agent")
+    parser.add_argument("action", choices=["info", "quote"], help="Action to perform")
+    parser.add_argument("--socket", help="Guest agent socket (default: dstack, then tappd)")
+    parser.add_argument("--field", help="Print only this field of the info response")
+    parser.add_argument("--report-data", help="Hex-encoded report data for the quote")
+    args = parser.parse_args()
+
+    try:
+        with GuestAgentClient(args.socket) as client:
+            if args.action == "info":
+                info = client.info()
+                if args.field:
+                    value = info.get(args.field)
+                    print(value if isinstance(value, str) else json.dumps(value), end="")
+                else:
+                    print(json.dumps(info))
+            else:
+                if not args.report_data:
+                    print("Error: --report-data is required for quotes", file=sys.stderr)
+                    sys.exit(1)
+                print(json.dumps(client.get_quote(args.report_data)))
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
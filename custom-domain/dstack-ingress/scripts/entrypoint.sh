@@ -177,45 +177,29 @@ ${proxy_connect_timeout_conf}
 EOF
 }
 
-set_alias_record() {
-    local domain="$1"
-    echo "Setting alias record for $domain"
-    dnsman.py set_alias \
-        --domain "$domain" \
-        --content "$GATEWAY_DOMAIN"
-
-    if [ $? -ne 0 ]; then
-        echo "Error: Failed to set alias record for $domain"
-        exit 1
-    fi
-    echo "Alias record set for $domain"
-}
-
-set_txt_record() {
-    local domain="$1"
+reconcile_dns_records() {
+    local all_domains="$1"
     local APP_ID
 
-    if [[ -S /var/run/dstack.sock ]]; then
-        DSTACK_APP_ID=$(curl -s --unix-socket /var/run/dstack.sock http://localhost/Info | jq -j .app_id)
-        export DSTACK_APP_ID
-    else
-        DSTACK_APP_ID=$(curl -s --unix-socket /var/run/tappd.sock http://localhost/prpc/Tappd.Info | jq -j .app_id)
+    # The app ID never changes, so the guest agent is only asked once
+    if [ -z "$DSTACK_APP_ID" ]; then
+        DSTACK_APP_ID=$(dstack_agent.py info --field app_id)
         export DSTACK_APP_ID
     fi
     APP_ID=${APP_ID:-"$DSTACK_APP_ID"}
 
-    dnsman.py set_txt \
-        --domain "${TXT_PREFIX}.${domain}" \
-        --content "$APP_ID:$PORT"
-
-    if [ $? -ne 0 ]; then
-        echo "Error: Failed to set TXT record for $domain"
+    echo "Setting alias and TXT records for all domains"
+    if ! dnsman.py reconcile \
+        --alias-target "$GATEWAY_DOMAIN" \
+        --txt-prefix "$TXT_PREFIX" \
+        --txt-content "$APP_ID:$PORT" <<<"$all_domains"; then
+        echo "Error: Failed to set alias and TXT records"
         exit 1
     fi
 }
 
-set_caa_record() {
-    local domain="$1"
+reconcile_caa_records() {
+    local all_domains="$1"
     if [ "$SET_CAA" != "true" ]; then
         echo "Skipping CAA record setup"
         return
@@ -231,30 +215,16 @@ set_caa_record() {
     fi
 
     ACCOUNT_URI=$(jq -j '.uri' "$account_file")
-    echo "Adding CAA record for $domain, accounturi=$ACCOUNT_URI"
-    dnsman.py set_caa \
-        --domain "$domain" \
+    echo "Adding CAA records for all domains, accounturi=$ACCOUNT_URI"
+    if ! dnsman.py reconcile \
         --caa-tag "issue" \
-        --caa-value "letsencrypt.org;validationmethods=dns-01;accounturi=$ACCOUNT_URI"
-
-    if [ $? -ne 0 ]; then
-        echo "Warning: Failed to set CAA record for $domain"
+        --caa-value "letsencrypt.org;validationmethods=dns-01;accounturi=$ACCOUNT_URI" <<<"$all_domains"; then
+        echo "Warning: Failed to set CAA records"
         echo "This is not critical - certificates can still be issued without CAA records"
         echo "Consider disabling CAA records by setting SET_CAA=false if this continues to fail"
     fi
 }
 
-process_domain() {
-    local domain="$1"
-    echo "Processing domain: $domain"
-
-    set_alias_record "$domain"
-    set_txt_record "$domain"
-    renew-certificate.sh "$domain" || echo "First certificate renewal failed for $domain, will retry after set CAA record"
-    set_caa_record "$domain"
-    renew-certificate.sh "$domain"
-}
-
 bootstrap() {
     echo "Bootstrap: Setting up domains"
 
@@ -269,9 +239,20 @@ bootstrap() {
     echo "Found domains:"
     echo "$all_domains"
 
+    # DNS records of all domains are reconciled at once, with batched changes
+    reconcile_dns_records "$all_domains"
+
+    while IFS= read -r domain; do
+        [[ -n "$domain" ]] || continue
+        echo "Processing domain: $domain"
+        renew-certificate.sh "$domain" || echo "First certificate renewal failed for $domain, will retry after set CAA record"
+    done <<<"$all_domains"
+
+    reconcile_caa_records "$all_domains"
+
     while IFS= read -r domain; do
         [[ -n "$domain" ]] || continue
-        process_domain "$domain"
+        renew-certificate.sh "$domain"
     done <<<"$all_domains"
 
     # Generate evidences after all certificates are obtained
@@ -45,12 +45,7 @@ while [ ${#PADDED_HASH} -lt 128 ]; do
 done
 QUOTED_HASH="${PADDED_HASH}"
 
-if [[ -S /var/run/dstack.sock ]]; then
-    curl -s --unix-socket /var/run/dstack.sock "http://localhost/GetQuote?report_data=${QUOTED_HASH}" > quote.json
-else
-    curl -s --unix-socket /var/run/tappd.sock "http://localhost/prpc/Tappd.RawQuote?report_data=${QUOTED_HASH}" > quote.json
-fi
-if [ $? -ne 0 ]; then
+if ! dstack_agent.py quote --report-data "${QUOTED_HASH}" > quote.json; then
     echo "Error: Failed to generate evidences"
     exit 1
 fi
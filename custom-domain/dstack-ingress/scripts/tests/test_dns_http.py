@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+# Tests of the DNS providers' HTTP pacing and retries, on a fake clock.
+# Run from the scripts directory: python3 -m unittest discover -s tests
+
+import importlib.util
+import os
+import sys
+import unittest
+from email.utils import formatdate
+from typing import List
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dns_providers import base  # noqa: E402
+from dns_providers.base import (  # noqa: E402
+    DNSProvider,
+    RateLimiter,
+    _quota_exhausted,
+    _retry_after,
+)
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock instantly."""
+
+    EPOCH = 1_700_000_000.0
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps: List[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.EPOCH + self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Returns (or raises) the queued outcomes in order, and logs the requests."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.requests: List[tuple] = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class HTTPProvider(DNSProvider):
+    """Provider with only an HTTP client, to exercise DNSProvider._send()."""
+
+    def get_dns_records(self, name, record_type=None):
+        return []
+
+    def create_dns_record(self, record):
+        return False
+
+    def delete_dns_record(self, record_id, domain):
+        return False
+
+    def create_caa_record(self, caa_record):
+        return False
+
+
+class PacedProvider(HTTPProvider):
+    RATE_LIMIT = 2.0
+    RATE_BURST = 1
+
+
+class FakeClockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for patcher in (
+            mock.patch.object(base, "time", self.clock),
+            mock.patch.object(base.random, "uniform", lambda low, high: high),
+            mock.patch.object(base, "HTTP_MAX_RETRIES", 3),
+            mock.patch.object(base, "HTTP_BACKOFF_BASE", 0.5),
+            mock.patch.object(base, "HTTP_BACKOFF_MAX", 60.0),
+            mock.patch.dict(base._rate_limiters, clear=True),
+            mock.patch.dict(os.environ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        os.environ.pop("DNS_HTTP_RATE", None)
+
+
+class RateLimiterTest(FakeClockTestCase):
+    def test_burst_then_paced(self):
+        limiter = RateLimiter(rate=4.0, burst=2)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.25)
+        self.assertEqual(self.clock.sleeps, [0.25])
+
+    def test_tokens_refill_up_to_the_burst(self):
+        limiter = RateLimiter(rate=4.0, burst=2)
+        limiter.acquire()
+        limiter.acquire()
+        self.clock.now += 10
+        for _ in range(2):
+            self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.25)
+
+    def test_partial_refill(self):
+        limiter = RateLimiter(rate=4.0, burst=1)
+        limiter.acquire()
+        self.clock.now += 0.125
+        self.assertAlmostEqual(limiter.acquire(), 0.125)
+
+    def test_pause(self):
+        limiter = RateLimiter(rate=4.0, burst=2)
+        limiter.pause(5)
+        self.assertEqual(limiter.acquire(), 5.0)
+        # The bucket refilled during the pause
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.25)
+
+    def test_pause_never_shortens_a_longer_pause(self):
+        limiter = RateLimiter(rate=1.0, burst=1)
+        limiter.pause(10)
+        limiter.pause(2)
+        self.assertEqual(limiter.acquire(), 10.0)
+
+
+class RetryAfterTest(FakeClockTestCase):
+    def test_retry_after_seconds(self):
+        self.assertEqual(_retry_after(FakeResponse(429, {"Retry-After": "7"})), 7.0)
+        self.assertEqual(_retry_after(FakeResponse(429, {"Retry-After": "-3"})), 0.0)
+
+    def test_retry_after_http_date(self):
+        date = formatdate(self.clock.time() + 30, usegmt=True)
+        self.assertEqual(_retry_after(FakeResponse(429, {"Retry-After": date})), 30.0)
+        past = formatdate(self.clock.time() - 30, usegmt=True)
+        self.assertEqual(_retry_after(FakeResponse(429, {"Retry-After": past})), 0.0)
+
+    def test_invalid_retry_after_falls_back_to_reset_headers(self):
+        response = FakeResponse(
+            429, {"Retry-After": "soon", "X-RateLimit-Reset": "12"}
+        )
+        self.assertEqual(_retry_after(response), 12.0)
+        self.assertIsNone(_retry_after(FakeResponse(429, {"Retry-After": "soon"})))
+
+    def test_ratelimit_headers(self):
+        response = FakeResponse(429, {"RateLimit": '"default";r=0;t=30'})
+        self.assertEqual(_retry_after(response), 30.0)
+        self.assertEqual(_retry_after(FakeResponse(429, {"RateLimit-Reset": "9"})), 9.0)
+
+    def test_x_ratelimit_reset_epoch_or_delay(self):
+        epoch = str(int(self.clock.time()) + 42)
+        response = FakeResponse(429, {"X-RateLimit-Reset": epoch})
+        self.assertAlmostEqual(_retry_after(response), 42.0)
+        response = FakeResponse(429, {"X-RateLimit-Reset": "5"})
+        self.assertEqual(_retry_after(response), 5.0)
+        self.assertIsNone(_retry_after(FakeResponse(429, {"X-RateLimit-Reset": "x"})))
+
+    def test_no_headers(self):
+        self.assertIsNone(_retry_after(FakeResponse(429)))
+
+
+class QuotaExhaustedTest(unittest.TestCase):
+    def test_remaining_headers(self):
+        exhausted = FakeResponse(200, {"X-RateLimit-Remaining": "0"})
+        self.assertTrue(_quota_exhausted(exhausted))
+        exhausted = FakeResponse(200, {"RateLimit-Remaining": " 0"})
+        self.assertTrue(_quota_exhausted(exhausted))
+        remaining = FakeResponse(200, {"X-RateLimit-Remaining": "5"})
+        self.assertFalse(_quota_exhausted(remaining))
+
+    def test_ratelimit_header(self):
+        response = FakeResponse(200, {"RateLimit": '"default";r=0;t=30'})
+        self.assertTrue(_quota_exhausted(response))
+        response = FakeResponse(200, {"RateLimit": '"default";r=12;t=30'})
+        self.assertFalse(_quota_exhausted(response))
+
+    def test_no_headers(self):
+        self.assertFalse(_quota_exhausted(FakeResponse(200)))
+
+
+@unittest.skipUnless(importlib.util.find_spec("requests"), "requests is not installed")
+class SendTest(FakeClockTestCase):
+    def provider(self, outcomes, cls=HTTPProvider):
+        provider = cls()
+        provider._session = FakeSession(outcomes)
+        return provider
+
+    def test_server_errors_of_idempotent_requests_are_retried(self):
+        provider = self.provider(
+            [FakeResponse(502), FakeResponse(503), FakeResponse(200)]
+        )
+        response = provider._send("GET", "https://api.example/zones")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(provider.session.requests), 3)
+        # Full jitter is pinned to its upper bound: 0.5 * 2**attempt
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0])
+        self.assertEqual(provider.http_stats["retries"], 2)
+
+    def test_retries_are_bounded(self):
+        provider = self.provider([FakeResponse(500) for _ in range(4)])
+        response = provider._send("PUT", "https://api.example/records/1")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(provider.session.requests), 4)
+
+    def test_non_idempotent_requests_are_not_retried(self):
+        provider = self.provider([FakeResponse(502)])
+        response = provider._send("POST", "https://api.example/records")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(len(provider.session.requests), 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_non_idempotent_connection_errors_are_raised(self):
+        import requests
+
+        provider = self.provider([requests.exceptions.ConnectionError("reset")])
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            provider._send("PATCH", "https://api.example/records/1")
+        self.assertEqual(len(provider.session.requests), 1)
+
+    def test_idempotent_override(self):
+        import requests
+
+        provider = self.provider(
+            [requests.exceptions.Timeout("slow"), FakeResponse(200)]
+        )
+        response = provider._send("POST", "https://api.example/batch", idempotent=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(provider.session.requests), 2)
+
+    def test_throttled_requests_are_retried_after_the_announced_delay(self):
+        provider = self.provider(
+            [FakeResponse(429, {"Retry-After": "4"}), FakeResponse(201)]
+        )
+        response = provider._send("POST", "https://api.example/records")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.clock.sleeps, [4.0])
+        self.assertEqual(provider.http_stats["throttled"], 1)
+
+    def test_throttling_pauses_the_shared_rate_limiter(self):
+        provider = self.provider(
+            [FakeResponse(429, {"Retry-After": "4"}), FakeResponse(200)], PacedProvider
+        )
+        throttled_at = self.clock.now
+        provider._send("GET", "https://api.example/zones")
+        self.assertEqual(self.clock.sleeps, [4.0])
+        limiter = base._rate_limiters["PacedProvider"]
+        self.assertEqual(limiter.paused_until, throttled_at + 4.0)
+
+    def test_exhausted_quota_pauses_the_rate_limiter(self):
+        headers = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "10"}
+        provider = self.provider(
+            [FakeResponse(200, headers), FakeResponse(200)], PacedProvider
+        )
+        provider._send("GET", "https://api.example/zones")
+        self.assertEqual(self.clock.sleeps, [])
+        provider._send("GET", "https://api.example/zones")
+        self.assertEqual(self.clock.sleeps, [10.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+
+# Tests of DNSReconciler and apply_changes() against an in-memory provider.
+# Run from the scripts directory: python3 -m unittest discover -s tests
+
+import importlib.util
+import os
+import sys
+import threading
+import time
+import unittest
+from typing import Dict, List, Optional
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dns_providers import base  # noqa: E402
+from dns_providers.base import (  # noqa: E402
+    DNSProvider,
+    DNSRecord,
+    CAARecord,
+    RecordType,
+    ChangeAction,
+    RecordChange,
+)
+from dns_providers.reconcile import DNSReconciler  # noqa: E402
+
+
+class FakeProvider(DNSProvider):
+    """Provider keeping records in memory and logging the calls made to it."""
+
+    def __init__(self, records: Optional[List[DNSRecord]] = None):
+        super().__init__()
+        self.records: Dict[str, DNSRecord] = {r.id: r for r in records or []}
+        self.calls: List[tuple] = []
+        self._next_id = 0
+
+    def _list_zones(self) -> Optional[Dict[str, str]]:
+        return {"example.com": "zone-1"}
+
+    def _store(self, record: DNSRecord) -> bool:
+        self._next_id += 1
+        record.id = f"id-{self._next_id}"
+        self.records[record.id] = record
+        return True
+
+    def get_dns_records(
+        self, name: str, record_type: Optional[RecordType] = None
+    ) -> List[DNSRecord]:
+        return [
+            r
+            for r in self.records.values()
+            if r.name == name.lower() and record_type in (None, r.type)
+        ]
+
+    def create_dns_record(self, record: DNSRecord) -> bool:
+        self.calls.append(("create", record.name, record.type.value, record.content))
+        name = record.name.lower()
+        return self._store(
+            DNSRecord(None, name, record.type, record.content, record.ttl)
+        )
+
+    def delete_dns_record(self, record_id: str, domain: str) -> bool:
+        self.calls.append(("delete", record_id))
+        return self.records.pop(record_id, None) is not None
+
+    def create_caa_record(self, caa_record: CAARecord) -> bool:
+        self.calls.append(("create", caa_record.name, "CAA", caa_record.value))
+        data = {
+            "flags": caa_record.flags,
+            "tag": caa_record.tag,
+            "value": caa_record.value,
+        }
+        return self._store(
+            DNSRecord(
+                None,
+                caa_record.name.lower(),
+                RecordType.CAA,
+                f'{caa_record.flags} {caa_record.tag} "{caa_record.value}"',
+                caa_record.ttl,
+                data=data,
+            )
+        )
+
+
+class UpsertProvider(FakeProvider):
+    SUPPORTS_UPSERT = True
+
+    def upsert_record(self, record, record_id=None) -> bool:
+        self.calls.append(("upsert", record.name, record_id))
+        if record_id:
+            self.records.pop(record_id, None)
+        if isinstance(record, CAARecord):
+            return self.create_caa_record(record)
+        return self.create_dns_record(record)
+
+
+def cname(record_id, name, content):
+    return DNSRecord(record_id, name, RecordType.CNAME, content)
+
+
+def caa(record_id, name, tag, value):
+    data = {"flags": 0, "tag": tag, "value": value}
+    return DNSRecord(record_id, name, RecordType.CAA, f'0 {tag} "{value}"', data=data)
+
+
+class DNSReconcilerTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(base, "ZONE_CACHE_TTL", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_creates_missing_records_then_is_idempotent(self):
+        provider = FakeProvider()
+        reconciler = DNSReconciler(provider)
+        desired = [
+            cname(None, "app.example.com", "gw.example.net"),
+            DNSRecord(None, "_tapp.app.example.com", RecordType.TXT, "id:443"),
+            CAARecord("app.example.com", 0, "issue", "letsencrypt.org"),
+        ]
+
+        changes = reconciler.plan(desired)
+        self.assertEqual(
+            [(c.action, c.record_id) for c in changes],
+            [(ChangeAction.UPSERT, None)] * 3,
+        )
+        self.assertTrue(reconciler.apply(changes))
+        self.assertEqual(len(provider.records), 3)
+
+        provider.calls.clear()
+        self.assertEqual(reconciler.plan(desired), [])
+        self.assertTrue(reconciler.apply([]))
+        self.assertEqual(provider.calls, [])
+
+    def test_replaces_stale_records_in_place_before_deleting_the_rest(self):
+        provider = FakeProvider(
+            [
+                cname("old-1", "app.example.com", "old1.example.net"),
+                cname("old-2", "app.example.com", "old2.example.net"),
+            ]
+        )
+        changes = DNSReconciler(provider).plan(
+            [cname(None, "app.example.com", "gw.example.net")]
+        )
+        self.assertEqual(
+            [(c.action, c.record_id) for c in changes],
+            [(ChangeAction.UPSERT, "old-1"), (ChangeAction.DELETE, "old-2")],
+        )
+
+    def test_values_are_compared_normalized(self):
+        provider = FakeProvider(
+            [
+                cname("c", "app.example.com", "GW.example.net."),
+                DNSRecord("t", "_tapp.app.example.com", RecordType.TXT, '"id:443"'),
+            ]
+        )
+        changes = DNSReconciler(provider).plan(
+            [
+                cname(None, "App.Example.com", "gw.example.net"),
+                DNSRecord(None, "_tapp.app.example.com", RecordType.TXT, "id:443"),
+            ]
+        )
+        self.assertEqual(changes, [])
+
+    def test_duplicate_desired_records_are_planned_once(self):
+        provider = FakeProvider()
+        record = cname(None, "app.example.com", "gw.example.net")
+        changes = DNSReconciler(provider).plan([record, record])
+        self.assertEqual(len(changes), 1)
+
+    def test_alias_a_record_replaces_cname(self):
+        provider = FakeProvider([cname("c", "app.example.com", "gw.example.net")])
+        changes = DNSReconciler(provider).plan(
+            [DNSRecord(None, "app.example.com", RecordType.A, "192.0.2.1")]
+        )
+        self.assertEqual(
+            sorted((c.action.value, c.record.type.value) for c in changes),
+            [("DELETE", "CNAME"), ("UPSERT", "A")],
+        )
+
+    def test_other_names_types_and_caa_tags_are_left_alone(self):
+        provider = FakeProvider(
+            [
+                cname("other", "other.example.com", "old.example.net"),
+                DNSRecord("txt", "app.example.com", RecordType.TXT, "keep"),
+                caa("iodef", "app.example.com", "iodef", "mailto:ops@example.com"),
+                caa("issue", "app.example.com", "issue", "old-ca.example"),
+            ]
+        )
+        changes = DNSReconciler(provider).plan(
+            [
+                cname(None, "app.example.com", "gw.example.net"),
+                CAARecord("app.example.com", 0, "issue", "letsencrypt.org"),
+            ]
+        )
+        self.assertEqual(
+            [(c.action, c.record_id) for c in changes],
+            [(ChangeAction.UPSERT, None), (ChangeAction.UPSERT, "issue")],
+        )
+
+    def test_merged_caa_values_are_never_stale(self):
+        provider = FakeProvider(
+            [caa("apex", "example.com", "issue", "other-ca.example")]
+        )
+        provider.MERGES_CAA = True
+        changes = DNSReconciler(provider).plan(
+            [CAARecord("example.com", 0, "issue", "letsencrypt.org")]
+        )
+        self.assertEqual(
+            [(c.action, c.record_id) for c in changes], [(ChangeAction.UPSERT, None)]
+        )
+
+    def test_plan_fails_when_records_cannot_be_fetched(self):
+        provider = FakeProvider()
+        with mock.patch.object(provider, "get_records_by_name", return_value=None):
+            changes = DNSReconciler(provider).plan([cname(None, "a.example.com", "b")])
+        self.assertIsNone(changes)
+
+    def test_describe(self):
+        provider = FakeProvider([cname("old", "app.example.com", "old.example.net")])
+        reconciler = DNSReconciler(provider)
+        [change] = reconciler.plan([cname(None, "app.example.com", "gw.example.net")])
+        self.assertEqual(
+            reconciler.describe(change),
+            "~ CNAME app.example.com old.example.net -> gw.example.net",
+        )
+        delete = RecordChange(ChangeAction.DELETE, provider.records["old"], "old")
+        self.assertEqual(
+            reconciler.describe(delete), "- CNAME app.example.com old.example.net"
+        )
+
+
+class ApplyChangesTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(base, "ZONE_CACHE_TTL", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_upsert_without_native_upserts_deletes_then_creates(self):
+        provider = FakeProvider([cname("old", "app.example.com", "old.example.net")])
+        change = RecordChange(
+            ChangeAction.UPSERT, cname(None, "app.example.com", "gw.example.net"), "old"
+        )
+        self.assertTrue(provider.apply_changes([change]))
+        self.assertEqual(
+            provider.calls,
+            [
+                ("delete", "old"),
+                ("create", "app.example.com", "CNAME", "gw.example.net"),
+            ],
+        )
+
+    def test_default_upsert_record_deletes_then_creates(self):
+        provider = FakeProvider([cname("old", "app.example.com", "old.example.net")])
+        record = cname(None, "app.example.com", "gw.example.net")
+        self.assertTrue(provider.upsert_record(record, "old"))
+        caa = CAARecord("app.example.com", 0, "issue", "letsencrypt.org")
+        self.assertTrue(provider.upsert_record(caa))
+        self.assertEqual(
+            provider.calls,
+            [
+                ("delete", "old"),
+                ("create", "app.example.com", "CNAME", "gw.example.net"),
+                ("create", "app.example.com", "CAA", "letsencrypt.org"),
+            ],
+        )
+
+    def test_upsert_with_native_upserts(self):
+        provider = UpsertProvider([cname("old", "app.example.com", "old.example.net")])
+        change = RecordChange(
+            ChangeAction.UPSERT, cname(None, "app.example.com", "gw.example.net"), "old"
+        )
+        self.assertTrue(provider.apply_changes([change]))
+        self.assertEqual(provider.calls[0], ("upsert", "app.example.com", "old"))
+        self.assertNotIn("old", provider.records)
+
+    def test_changes_are_applied_in_order(self):
+        provider = FakeProvider([cname("old", "app.example.com", "old.example.net")])
+        changes = [
+            RecordChange(
+                ChangeAction.CREATE, CAARecord("app.example.com", 0, "issue", "ca")
+            ),
+            RecordChange(ChangeAction.DELETE, provider.records["old"], "old"),
+            RecordChange(
+                ChangeAction.CREATE,
+                DNSRecord(None, "app.example.com", RecordType.A, "192.0.2.1"),
+            ),
+        ]
+        self.assertTrue(provider.apply_changes(changes))
+        self.assertEqual(
+            [call[0] for call in provider.calls], ["create", "delete", "create"]
+        )
+
+    def test_failure_is_reported_after_applying_the_rest(self):
+        provider = FakeProvider()
+        changes = [
+            RecordChange(
+                ChangeAction.DELETE, cname("missing", "a.example.com", "x"), "missing"
+            ),
+            RecordChange(ChangeAction.CREATE, cname(None, "b.example.com", "x")),
+        ]
+        self.assertFalse(provider.apply_changes(changes))
+        self.assertEqual(len(provider.records), 1)
+
+    def test_replace_records_deletes_a_record_set_once(self):
+        # Providers list a record set of several values as one record per value
+        provider = UpsertProvider()
+        stale = [caa("set", "app.example.com", "issue", v) for v in ("a", "b")]
+        record = CAARecord("app.example.com", 0, "issue", "c")
+        with mock.patch.object(provider, "delete_dns_record") as delete:
+            self.assertTrue(provider._replace_records(record, stale))
+        self.assertEqual(provider.calls[0], ("upsert", "app.example.com", "set"))
+        delete.assert_not_called()
+
+
+@unittest.skipUnless(importlib.util.find_spec("requests"), "requests is not installed")
+class LinodeApplyChangesTest(unittest.TestCase):
+    def test_deletes_finish_before_writes_start(self):
+        from dns_providers.linode import LinodeDNSProvider
+
+        with mock.patch.dict(os.environ, {"LINODE_API_TOKEN": "token"}):
+            provider = LinodeDNSProvider()
+        events = []
+        lock = threading.Lock()
+
+        def apply_change(change):
+            with lock:
+                events.append(("start", change.action))
+            if change.action == ChangeAction.DELETE:
+                time.sleep(0.05)
+            with lock:
+                events.append(("end", change.action))
+            return True
+
+        changes = [
+            RecordChange(ChangeAction.UPSERT, cname(None, "a.example.com", "x")),
+            RecordChange(ChangeAction.DELETE, cname("1", "b.example.com", "x"), "1"),
+            RecordChange(ChangeAction.CREATE, cname(None, "c.example.com", "x")),
+            RecordChange(ChangeAction.DELETE, cname("2", "d.example.com", "x"), "2"),
+        ]
+        with mock.patch.object(provider, "_changes_by_zone", return_value={}):
+            with mock.patch.object(provider, "_apply_change", side_effect=apply_change):
+                self.assertTrue(provider.apply_changes(changes))
+
+        last_delete_end = max(
+            i for i, e in enumerate(events) if e == ("end", ChangeAction.DELETE)
+        )
+        first_write_start = min(
+            i
+            for i, e in enumerate(events)
+            if e[0] == "start" and e[1] != ChangeAction.DELETE
+        )
+        self.assertLess(last_delete_end, first_write_start)
+
+
+class FakeRoute53Client:
+    """Route53 client holding the record sets of one hosted zone."""
+
+    def __init__(self, record_sets: List[Dict]):
+        self.record_sets = record_sets
+        self.batches: List[List[Dict]] = []
+
+    def list_resource_record_sets(
+        self, HostedZoneId, StartRecordName, StartRecordType=None
+    ):
+        matching = [
+            rs
+            for rs in self.record_sets
+            if rs["Name"] == StartRecordName and StartRecordType in (None, rs["Type"])
+        ]
+        return {"ResourceRecordSets": matching, "IsTruncated": False}
+
+    def change_resource_record_sets(self, HostedZoneId, ChangeBatch):
+        self.batches.append(ChangeBatch["Changes"])
+        for change in ChangeBatch["Changes"]:
+            record_set = change["ResourceRecordSet"]
+            self.record_sets = [
+                rs
+                for rs in self.record_sets
+                if (rs["Name"], rs["Type"]) != (record_set["Name"], record_set["Type"])
+            ]
+            if change["Action"] == "UPSERT":
+                self.record_sets.append(record_set)
+        return {"ChangeInfo": {"Status": "PENDING"}}
+
+
+@unittest.skipUnless(importlib.util.find_spec("boto3"), "boto3 is not installed")
+class Route53ApplyChangesTest(unittest.TestCase):
+    def setUp(self):
+        from dns_providers.route53 import Route53DNSProvider
+
+        patcher = mock.patch.object(base, "ZONE_CACHE_TTL", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.provider = Route53DNSProvider()
+        self.provider.client = FakeRoute53Client(
+            [
+                {
+                    "Name": "app.example.com.",
+                    "Type": "CNAME",
+                    "TTL": 60,
+                    "ResourceRecords": [{"Value": "old.example.net"}],
+                },
+                {
+                    "Name": "example.com.",
+                    "Type": "CAA",
+                    "TTL": 60,
+                    "ResourceRecords": [{"Value": '0 issue "other-ca.example"'}],
+                },
+            ]
+        )
+        self.provider._list_zones = lambda: {"example.com": "Z1"}
+
+    def test_deletes_go_first_in_the_change_batch(self):
+        changes = [
+            RecordChange(
+                ChangeAction.CREATE,
+                DNSRecord(None, "app.example.com", RecordType.A, "192.0.2.1"),
+            ),
+            RecordChange(
+                ChangeAction.DELETE,
+                cname("app.example.com.:CNAME", "app.example.com", "old.example.net"),
+                "app.example.com.:CNAME",
+            ),
+        ]
+        self.assertTrue(self.provider.apply_changes(changes))
+        [batch] = self.provider.client.batches
+        self.assertEqual(
+            [(c["Action"], c["ResourceRecordSet"]["Type"]) for c in batch],
+            [("DELETE", "CNAME"), ("UPSERT", "A")],
+        )
+
+    def test_caa_reconciliation_is_idempotent(self):
+        reconciler = DNSReconciler(self.provider)
+        desired = self.provider.caa_records(
+            CAARecord("app.example.com", 0, "issue", "letsencrypt.org")
+        )
+        self.assertEqual({r.name for r in desired}, {"example.com"})
+
+        changes = reconciler.plan(desired)
+        self.assertTrue(changes)
+        self.assertNotIn(ChangeAction.DELETE, [c.action for c in changes])
+        self.assertTrue(reconciler.apply(changes))
+
+        [apex] = [rs for rs in self.provider.client.record_sets if rs["Type"] == "CAA"]
+        self.assertIn({"Value": '0 issue "other-ca.example"'}, apex["ResourceRecords"])
+        self.assertEqual(reconciler.plan(desired), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
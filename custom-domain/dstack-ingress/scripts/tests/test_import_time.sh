@@ -0,0 +1,47 @@
+#!/bin/bash
+
+# Checks that the DNS CLIs start fast: importing dnsman.py and certman.py must
+# not pull in any DNS provider module, requests, boto3 or pkg_resources, and
+# must stay within a time budget (python -X importtime, cumulative).
+
+set -euo pipefail
+
+THIS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+SCRIPTS_DIR="$(cd "${THIS_DIR}/.." && pwd)"
+PYTHON="${PYTHON:-python3}"
+IMPORT_TIME_BUDGET_MS="${IMPORT_TIME_BUDGET_MS:-150}"
+
+failures=0
+
+for module in dnsman certman; do
+    importtime="$(cd "$SCRIPTS_DIR" && "$PYTHON" -X importtime -c "import ${module}" 2>&1 >/dev/null)"
+
+    for heavy in dns_providers.cloudflare dns_providers.linode dns_providers.namecheap \
+        dns_providers.route53 requests boto3 pkg_resources; do
+        if grep -Eq "\|[[:space:]]+${heavy//./\\.}\$" <<<"$importtime"; then
+            echo "FAIL: importing ${module} imports ${heavy}" >&2
+            failures=$((failures + 1))
+        else
+            echo "PASS: importing ${module} does not import ${heavy}"
+        fi
+    done
+
+    # Cumulative microseconds of the module itself, on its top-level line
+    cumulative_us="$(awk -F'|' -v m="$module" '$3 ~ "^ " m "$" { gsub(/ /, "", $2); print $2 }' <<<"$importtime")"
+    if [[ -z "$cumulative_us" ]]; then
+        echo "FAIL: no import time reported for ${module}" >&2
+        failures=$((failures + 1))
+    elif ((cumulative_us > IMPORT_TIME_BUDGET_MS * 1000)); then
+        echo "FAIL: importing ${module} took $((cumulative_us / 1000)) ms (budget ${IMPORT_TIME_BUDGET_MS} ms)" >&2
+        failures=$((failures + 1))
+    else
+        echo "PASS: importing ${module} took $((cumulative_us / 1000)) ms (budget ${IMPORT_TIME_BUDGET_MS} ms)"
+    fi
+done
+
+if [[ $failures -eq 0 ]]; then
+    echo "All import time tests passed"
+else
+    echo "$failures import time tests failed" >&2
+    exit 1
+fi
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# Tests of the zone index and its on-disk cache.
+# Run from the scripts directory: python3 -m unittest discover -s tests
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dns_providers.base import ZoneIndex  # noqa: E402
+
+
+class ZoneIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ZoneIndex(
+            {"example.com": "z1", "sub.example.com": "z2", "example.org": "z3"}
+        )
+
+    def test_longest_match(self):
+        match = self.index.longest_match
+        self.assertEqual(match("example.com"), ("z1", "example.com"))
+        self.assertEqual(match("a.example.com"), ("z1", "example.com"))
+        self.assertEqual(match("a.b.sub.example.com"), ("z2", "sub.example.com"))
+        self.assertEqual(match("sub.example.org"), ("z3", "example.org"))
+
+    def test_match_ignores_case_and_trailing_dot(self):
+        self.assertEqual(
+            self.index.longest_match("A.Sub.Example.COM."), ("z2", "sub.example.com")
+        )
+
+    def test_no_match(self):
+        self.assertIsNone(self.index.longest_match("example.net"))
+        self.assertIsNone(self.index.longest_match("com"))
+        self.assertIsNone(self.index.longest_match("notexample.com"))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "zones.json")
+            self.index.save(path)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+            loaded = ZoneIndex.load(path, ttl=60)
+            self.assertEqual(loaded.zones, self.index.zones)
+            self.assertEqual(
+                loaded.longest_match("x.sub.example.com"), ("z2", "sub.example.com")
+            )
+
+    def test_load_rejects_expired_other_versions_and_garbage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "zones.json")
+            self.assertIsNone(ZoneIndex.load(path, ttl=60))
+
+            ZoneIndex({"example.com": "z1"}, fetched_at=time.time() - 120).save(path)
+            self.assertIsNone(ZoneIndex.load(path, ttl=60))
+
+            with open(path, "w") as f:
+                version = ZoneIndex.VERSION + 1
+                json.dump({"version": version, "fetched_at": time.time()}, f)
+            self.assertIsNone(ZoneIndex.load(path, ttl=60))
+
+            with open(path, "w") as f:
+                f.write("{")
+            self.assertIsNone(ZoneIndex.load(path, ttl=60))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,29 +7,136 @@ This demonstrates end-to-end verification:
 2. OS: dstack-mr calculates expected measurements from OS image
 3. Compose: Compare compose hash from quote against expected manifest
 
+Pass --policy PATH to decide with an attestation policy (see
+attestation/rtmr3-based/policy.py) instead: its TCB statuses and advisories
+replace the default TCB check, its OS allowlist replaces dstack-mr and its
+compose hashes replace the expected manifest.
+
+The three stages are independent until the final comparison, so they run
+concurrently; the first hard failure cancels the others. Every quote in
+app_certificates is verified, each in its own concurrent dcap-qvl run, so a
+multi-instance bundle takes about as long as a single quote. Pass --report PATH
+('-' for stderr) to get the combined per-certificate verdicts as JSON.
+
+Pass --timings PATH ('-' for stderr) to get per-stage wall/CPU times as JSON,
+and --profile PATH to dump cProfile stats merged across all stages.
+
 Prerequisites:
   CFLAGS="-g0" cargo install dcap-qvl-cli
   CGO_CFLAGS="-g0" go install github.com/kvinwang/dstack-mr@latest
   phala cvms attestation <app> --json > attestation.json
 """
+import atexit
+import functools
 import hashlib
 import json
 import os
 import shutil
+import signal
 import subprocess
 import sys
 import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# The measurement index, attestation policy and stage timer are shared with the RTMR3-based verifier
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', 'attestation', 'rtmr3-based'))
+from measurement_index import MeasurementIndex  # noqa: E402
+from policy import CompiledPolicy  # noqa: E402
+from timing import StageTimer  # noqa: E402
+
+_running_tools = set()
+_tools_lock = threading.Lock()
+_cancelled = threading.Event()
+
+class StageError(Exception):
+    """A verification stage failed."""
+    def __init__(self, stage: str, cause: Exception):
+        super().__init__(str(cause))
+        self.stage = stage
+        self.cause = cause
+
+def run_tool(args: list, **kwargs) -> subprocess.CompletedProcess:
+    """Run an external tool, terminating it if another stage fails meanwhile."""
+    with _tools_lock:
+        if _cancelled.is_set():
+            raise RuntimeError("cancelled")
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                start_new_session=True, **kwargs)
+        _running_tools.add(proc)
+    try:
+        stdout, stderr = proc.communicate()
+    finally:
+        with _tools_lock:
+            _running_tools.discard(proc)
+    return subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
+
+def cancel_tools():
+    """Terminate all running tools and prevent new ones from starting."""
+    with _tools_lock:
+        _cancelled.set()
+        for proc in _running_tools:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+def run_stages(stages: dict, timings: StageTimer = None) -> dict:
+    """Run verification stages concurrently, respecting their dependencies.
+
+    stages maps a name to (function, [dependency names]); a function receives the
+    results of its dependencies as positional arguments. Returns the results by
+    stage name. On the first failure, pending stages are cancelled, running tools
+    are terminated and StageError is raised. Stage timings go to timings if given.
+    """
+    results = {}
+    pending = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=len(stages)) as pool:
+        while pending or running:
+            for name, (func, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    del pending[name]
+                    args = [results[dep] for dep in deps]
+                    if timings:
+                        future = pool.submit(timings.run, name, func, *args)
+                    else:
+                        future = pool.submit(func, *args)
+                    running[future] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    cancel_tools()
+                    for other in running:
+                        other.cancel()
+                    raise StageError(name, e)
+    return results
 
 def verify_quote(quote_hex: str) -> dict:
-    """Verify TDX quote with dcap-qvl, return parsed result."""
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.hex', delete=False) as f:
-        f.write(quote_hex)
-        quote_path = f.name
-
-    result = subprocess.run(
-        ['dcap-qvl', 'verify', '--hex', quote_path],
-        capture_output=True, text=True
-    )
+    """Verify TDX quote with dcap-qvl, return parsed result.
+
+    On Linux the quote is handed over through an anonymous memfd instead of a
+    temporary file on disk.
+    """
+    if hasattr(os, 'memfd_create'):
+        fd = os.memfd_create('quote')
+        try:
+            os.write(fd, quote_hex.encode())
+            result = run_tool(['dcap-qvl', 'verify', '--hex', f'/dev/fd/{fd}'], pass_fds=(fd,))
+        finally:
+            os.close(fd)
+    else:
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.hex', delete=False) as f:
+            f.write(quote_hex)
+            quote_path = f.name
+        try:
+            result = run_tool(['dcap-qvl', 'verify', '--hex', quote_path])
+        finally:
+            os.unlink(quote_path)
     if result.returncode != 0:
         raise ValueError(f"dcap-qvl failed: {result.stderr}")
 
@@ -51,51 +158,39 @@ def calculate_os_measurements(image_folder: str) -> dict:
     if not dstack_mr:
         raise FileNotFoundError("dstack-mr not found")
     metadata_path = os.path.join(image_folder, 'metadata.json')
-    result = subprocess.run(
-        [dstack_mr, '-metadata', metadata_path, '-json'],
-        capture_output=True, text=True
-    )
+    result = run_tool([dstack_mr, '-metadata', metadata_path, '-json'])
     if result.returncode != 0:
         raise ValueError(f"dstack-mr failed: {result.stderr}")
     return json.loads(result.stdout)
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python verify_full.py <attestation.json> [--image-folder PATH] [expected-manifest.json]")
-        print("\nGet attestation.json with: phala cvms attestation <app> --json > attestation.json")
-        print("Download dstack image: curl -L https://github.com/Dstack-TEE/meta-dstack/releases/download/v0.5.5/dstack-0.5.5.tar.gz | tar xz")
-        sys.exit(1)
+def verify_certificate(result: dict, policy: CompiledPolicy, os_result, expected_hash: str,
+                       index_path: str, image_folder: str, manifest_path: str) -> dict:
+    """Check one certificate's dcap-qvl result against the policy and the OS and compose stages.
 
-    attestation_path = sys.argv[1]
-    image_folder = None
-    manifest_path = None
-    i = 2
-    while i < len(sys.argv):
-        if sys.argv[i] == '--image-folder' and i + 1 < len(sys.argv):
-            image_folder = sys.argv[i + 1]
-            i += 2
-        else:
-            manifest_path = sys.argv[i]
-            i += 1
-
-    with open(attestation_path) as f:
-        data = json.load(f)
-
-    # Extract quote
-    quote = data['app_certificates'][0]['quote']
+    Prints steps 1-4 and returns a verdict; the certificate failed if its
+    'errors' list is not empty.
+    """
+    verdict = {'errors': []}
 
     print("=== Step 1: Hardware Verification (dcap-qvl) ===")
-    result = verify_quote(quote)
+    if 'error' in result:
+        print(f"  ✗ FAIL: {result['error']}")
+        verdict['errors'].append(result['error'])
+        return verdict
 
     status = result['status']
     advisories = result.get('advisory_ids', [])
+    verdict['tcb_status'] = status
+    verdict['advisory_ids'] = advisories
     print(f"  TCB Status: {status}")
     if advisories:
         print(f"  Advisories: {advisories}")
-
-    if status not in ['UpToDate', 'SWHardeningNeeded']:
-        print(f"  ✗ FAIL: TCB status {status} is not acceptable")
-        sys.exit(1)
+    violations = policy.tcb_violations(result)
+    if violations:
+        for violation in violations:
+            print(f"  ✗ FAIL: {violation}")
+        verdict['errors'].extend(violations)
+        return verdict
     print("  ✓ Hardware verification passed")
 
     # Extract measurements
@@ -110,29 +205,51 @@ def main():
     config_id = report['mr_config_id']
     if not config_id.startswith('01'):
         print(f"  ✗ Unknown config ID format: {config_id[:4]}...")
-        sys.exit(1)
+        verdict['errors'].append(f"Unknown config ID format: {config_id[:4]}")
+        return verdict
 
     verified_hash = config_id[2:66]
+    verdict['compose_hash'] = verified_hash
     print(f"  Compose hash (from quote): {verified_hash}")
 
     # OS verification (optional - requires dstack-mr and image folder)
     print()
     print("=== Step 3: OS Verification (dstack-mr) ===")
-    if not image_folder:
+    if policy.has_os_allowlist():
+        matched = policy.match_os(report)
+        if matched is None:
+            print("  ✗ MRTD/RTMR0-2 are not allowed by the policy")
+            verdict['errors'].append("MRTD/RTMR0-2 are not allowed by the policy")
+            return verdict
+        if matched:
+            verdict['os_image'] = matched['image']
+            print(f"  ✓ MRTD/RTMR0-2 match {matched['image']} ({matched['vcpus']} vCPU, {matched['memory']})")
+        else:
+            print("  ✓ MRTD/RTMR0-2 are in the policy's os_measurements")
+    elif index_path:
+        matched = os_result.lookup(report)
+        if not matched:
+            print("  ✗ MRTD/RTMR0-2 not found in measurement index")
+            verdict['errors'].append("MRTD/RTMR0-2 not found in measurement index")
+            return verdict
+        verdict['os_image'] = matched['image']
+        print(f"  ✓ MRTD/RTMR0-2 match {matched['image']} ({matched['vcpus']} vCPU, {matched['memory']})")
+    elif not image_folder:
         print("  (skipped - no --image-folder provided)")
         print("  To verify OS: download dstack image matching your app's version")
     elif not find_dstack_mr():
         print("  (skipped - dstack-mr not installed)")
         print("  Install: CGO_CFLAGS=\"-g0\" go install github.com/kvinwang/dstack-mr@latest")
     else:
-        expected = calculate_os_measurements(image_folder)
+        expected = os_result
         print(f"  Expected MRTD: {expected['mrtd'][:32]}...")
         print(f"  Actual MRTD:   {report['mr_td'][:32]}...")
         if expected['mrtd'] == report['mr_td']:
             print("  ✓ MRTD matches - kernel/initramfs verified")
         else:
             print("  ✗ MRTD mismatch - OS image may be different version")
-            sys.exit(1)
+            verdict['errors'].append("MRTD mismatch")
+            return verdict
         # Note: RTMR0-2 require dstack-mr-cli (Rust) with QEMU for accurate comparison
         print("  (RTMR0-2 verification requires dstack-mr-cli with QEMU)")
 
@@ -140,32 +257,193 @@ def main():
     print()
     print("=== Step 4: Compose Hash Verification ===")
 
-    if manifest_path:
-        with open(manifest_path, 'rb') as f:
-            expected_hash = hashlib.sha256(f.read()).hexdigest()
-        print(f"  Expected (from file): {expected_hash}")
+    if policy.compose_hashes:
+        print(f"  Expected (from policy): one of {len(policy.compose_hashes)} allowed compose hashes")
+        matched = policy.allows_compose_hash(verified_hash)
     else:
-        # Use manifest from attestation API response
-        manifest = data['tcb_info']['app_compose']
-        expected_hash = hashlib.sha256(manifest.encode()).hexdigest()
-        print(f"  Expected (from API): {expected_hash}")
+        if manifest_path:
+            print(f"  Expected (from file): {expected_hash}")
+        else:
+            print(f"  Expected (from API): {expected_hash}")
+        matched = verified_hash == expected_hash
 
-    if verified_hash == expected_hash:
+    if matched:
         print("  ✓ MATCH - Compose hash verified!")
     else:
         print("  ✗ MISMATCH")
         print(f"    Verified: {verified_hash}")
-        print(f"    Expected: {expected_hash}")
+        if not policy.compose_hashes:
+            print(f"    Expected: {expected_hash}")
+        verdict['errors'].append("Compose hash mismatch")
+    return verdict
+
+def write_report(path: str, verdicts: list):
+    """Write the combined per-certificate verdicts as JSON to path, or to stderr if path is '-'."""
+    data = json.dumps({
+        'verified': not any(verdict['errors'] for verdict in verdicts),
+        'certificates': verdicts,
+    }, indent=2)
+    if path == '-':
+        print(data, file=sys.stderr)
+    else:
+        with open(path, 'w') as f:
+            f.write(data + '\n')
+
+def report_timings(timings: StageTimer, timings_path: str, profile_path: str):
+    """Emit the collected timings and profile, if requested."""
+    if timings_path:
+        timings.write(timings_path)
+    if profile_path:
+        timings.dump_profile(profile_path)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python verify_full.py <attestation.json> [--image-folder PATH] [--measurement-index PATH]"
+              " [--policy PATH] [--timings PATH] [--profile PATH] [--report PATH] [expected-manifest.json]")
+        print("\nGet attestation.json with: phala cvms attestation <app> --json > attestation.json")
+        print("Download dstack image: curl -L https://github.com/Dstack-TEE/meta-dstack/releases/download/v0.5.5/dstack-0.5.5.tar.gz | tar xz")
         sys.exit(1)
 
-    print()
+    attestation_path = sys.argv[1]
+    image_folder = None
+    index_path = None
+    policy_path = None
+    timings_path = None
+    profile_path = None
+    report_path = None
+    manifest_path = None
+    i = 2
+    while i < len(sys.argv):
+        if sys.argv[i] == '--image-folder' and i + 1 < len(sys.argv):
+            image_folder = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--measurement-index' and i + 1 < len(sys.argv):
+            index_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--policy' and i + 1 < len(sys.argv):
+            policy_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--timings' and i + 1 < len(sys.argv):
+            timings_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--profile' and i + 1 < len(sys.argv):
+            profile_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--report' and i + 1 < len(sys.argv):
+            report_path = sys.argv[i + 1]
+            i += 2
+        else:
+            manifest_path = sys.argv[i]
+            i += 1
+
+    timings = StageTimer(profile=profile_path is not None)
+    # Also report timings when verification fails and exits early
+    atexit.register(report_timings, timings, timings_path, profile_path)
+
+    def load_attestation():
+        with open(attestation_path) as f:
+            return json.load(f)
+
+    data = timings.run('load_attestation', load_attestation)
+
+    # Every certificate carries its own quote; identical quotes are verified once
+    certificates = [(i, cert['quote']) for i, cert in enumerate(data.get('app_certificates', []))
+                    if cert.get('quote')]
+    if not certificates:
+        print("  ✗ No quotes found in app_certificates")
+        sys.exit(1)
+    unique_quotes = list(dict.fromkeys(quote.lower() for _, quote in certificates))
+
+    def hardware_stage(quote):
+        # A bad quote fails its own certificates without cancelling the others
+        try:
+            return verify_quote(quote)
+        except ValueError as e:
+            return {'error': str(e)}
+
+    def policy_stage():
+        # Without --policy the defaults apply: UpToDate or SWHardeningNeeded, no other allowlists
+        policy = CompiledPolicy.load(policy_path) if policy_path else CompiledPolicy({})
+        if policy.app_ids or policy.key_providers:
+            raise ValueError("app_ids and key_providers need RTMR3 event log replay,"
+                             " use attestation/rtmr3-based/verify.py")
+        return policy
+
+    def os_stage(policy):
+        if policy.has_os_allowlist():
+            return None
+        if index_path:
+            return MeasurementIndex.load(index_path)
+        if image_folder and find_dstack_mr():
+            return calculate_os_measurements(image_folder)
+        return None
+
+    def compose_stage():
+        if manifest_path:
+            with open(manifest_path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        # Use manifest from attestation API response
+        return hashlib.sha256(data['tcb_info']['app_compose'].encode()).hexdigest()
+
+    # All dcap-qvl runs and the OS/compose stages run at the same time
+    stages = {
+        f'hardware:{n}': (functools.partial(hardware_stage, quote), [])
+        for n, quote in enumerate(unique_quotes)
+    }
+    stages['policy'] = (policy_stage, [])
+    stages['os'] = (os_stage, ['policy'])
+    stages['compose'] = (compose_stage, [])
+    try:
+        results = run_stages(stages, timings)
+    except StageError as e:
+        step = {
+            'hardware': "Step 1: Hardware Verification (dcap-qvl)",
+            'policy': "Attestation Policy",
+            'os': "Step 3: OS Verification (dstack-mr)",
+            'compose': "Step 4: Compose Hash Verification",
+        }[e.stage.split(':')[0]]
+        print(f"=== {step} ===")
+        print(f"  ✗ FAIL: {e}")
+        sys.exit(1)
+
+    verdicts = []
+    for index, quote in certificates:
+        if len(certificates) > 1:
+            print(f"##### Certificate {index} #####")
+            print()
+        result = results[f'hardware:{unique_quotes.index(quote.lower())}']
+        verdict = verify_certificate(result, results['policy'], results['os'], results['compose'],
+                                     index_path, image_folder, manifest_path)
+        verdict['certificate'] = index
+        verdicts.append(verdict)
+        print()
+
+    failed = [verdict for verdict in verdicts if verdict['errors']]
+    if report_path:
+        write_report(report_path, verdicts)
+
     print("=== Verification Complete ===")
+    if len(verdicts) > 1:
+        print(f"  {len(verdicts) - len(failed)}/{len(verdicts)} certificates verified"
+              f" ({len(unique_quotes)} unique quotes)")
+        for verdict in failed:
+            print(f"  ✗ Certificate {verdict['certificate']}: {verdict['errors'][0]}")
+    if failed:
+        sys.exit(1)
+    policy = results['policy']
     print("  ✓ Hardware: Genuine Intel TDX")
-    if image_folder and find_dstack_mr():
+    if policy.has_os_allowlist():
+        print("  ✓ OS: MRTD/RTMR0-2 allowed by the policy")
+    elif index_path:
+        print("  ✓ OS: MRTD/RTMR0-2 match a known-good image")
+    elif image_folder and find_dstack_mr():
         print("  ✓ OS: MRTD matches expected (kernel/initramfs)")
     else:
         print("  - OS: (skipped)")
-    print("  ✓ Compose: Matches expected manifest")
+    if policy.compose_hashes:
+        print("  ✓ Compose: Allowed by the policy")
+    else:
+        print("  ✓ Compose: Matches expected manifest")
     print()
     print("  Security claim: This TEE is running the expected code")
     print("  on genuine Intel TDX hardware.")